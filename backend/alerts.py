@@ -0,0 +1,391 @@
+"""
+COMPONENT: Alert Pipeline
+
+Takes alert bookkeeping off the ingest request path. store_vitals() still
+flags each reading (a cached rule lookup) but only hands the abnormal ones to
+this pipeline; a background worker thread turns them into alerts:
+
+-   Dedup: an abnormal reading joins the user's open alert for that vital
+    type if that alert was last seen within ALERT_DEDUP_WINDOW_SECONDS
+    (occurrences, last_seen_at and message are updated) instead of adding a
+    row per sample.
+-   Escalation: severity follows how far the reading is past its limit
+    (medium; high from ALERT_HIGH_EXCESS, critical from ALERT_CRITICAL_EXCESS,
+    as fractions of the limit) and rises one level for every
+    ALERT_ESCALATE_AFTER_SECONDS the episode lasts. It never drops within an
+    episode.
+-   Resolution: an open alert is resolved (resolved, resolved_at) once the
+    latest reading of its type in latest_vitals is normal and newer than the
+    alert.
+
+Queue backends (ALERT_QUEUE):
+-   memory (default): an in-process queue, filled after the ingest commit.
+    Events still queued are lost if the process dies.
+-   database: the alert_events table, written in the ingest transaction and
+    deleted in the worker's, so no event is lost or applied twice. A local
+    stand-in for an external broker. With several workers only the cluster
+    leader (cluster.py) takes events from it.
+-   inline: no queue; alerts are written inside the ingest transaction and
+    the worker only resolves recovered alerts.
+With several workers (cluster.shared) only the database queue is allowed,
+and is the default: with the others two workers could each open an alert
+for the same episode.
+
+The resolution sweep runs on the cluster leader only; the other workers'
+threads just drain their own memory queue.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import and_, false, func, insert
+from sqlalchemy.orm import Session
+import database
+from cluster import cluster
+from database import Alert, AlertEvent, LatestVital
+from thresholds import threshold_engine
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("low", "medium", "high", "critical")
+
+DEDUP_WINDOW = timedelta(seconds=float(os.getenv("ALERT_DEDUP_WINDOW_SECONDS", "900")))
+ESCALATE_AFTER = float(os.getenv("ALERT_ESCALATE_AFTER_SECONDS", "600"))  # 0 disables
+HIGH_EXCESS = float(os.getenv("ALERT_HIGH_EXCESS", "0.15"))
+CRITICAL_EXCESS = float(os.getenv("ALERT_CRITICAL_EXCESS", "0.30"))
+RESOLVE_INTERVAL = float(os.getenv("ALERT_RESOLVE_INTERVAL_SECONDS", "5"))
+
+# One abnormal reading, as queued by ingest
+PendingAlert = namedtuple("PendingAlert", ["user_id", "vital_type", "value", "timestamp", "message"])
+
+
+# --- Alert rules ---
+def excess(rule, value: float) -> float:
+    """How far past its limit a reading is, as a fraction of the limit."""
+    if rule is None:
+        return 0.0
+    if rule.max_value is not None and value > rule.max_value:
+        return (value - rule.max_value) / abs(rule.max_value) if rule.max_value else float("inf")
+    if rule.min_value is not None and value < rule.min_value:
+        return (rule.min_value - value) / abs(rule.min_value) if rule.min_value else float("inf")
+    return 0.0
+
+
+def severity_for(rule, value: float, started_at: datetime, seen_at: datetime, current: str = None) -> str:
+    over = excess(rule, value)
+    level = 3 if over >= CRITICAL_EXCESS else 2 if over >= HIGH_EXCESS else 1
+    if ESCALATE_AFTER > 0:
+        level = max(level, 1 + int((seen_at - started_at).total_seconds() // ESCALATE_AFTER))
+    if current in SEVERITIES:
+        level = max(level, SEVERITIES.index(current))
+    return SEVERITIES[min(level, len(SEVERITIES) - 1)]
+
+
+def alert_payload(alert: Alert) -> dict:
+    """An alert as the dashboard and its live deltas show it (UTC with 'Z')."""
+    def utc(value):
+        return value.isoformat() + 'Z' if value else None
+    return {
+        "id": alert.id,
+        "user_id": alert.user_id,
+        "vital_type": alert.vital_type,
+        "message": alert.message,
+        "severity": alert.severity,
+        "created_at": utc(alert.created_at),
+        "last_seen_at": utc(alert.last_seen_at or alert.created_at),
+        "occurrences": alert.occurrences or 1,
+        "resolved": alert.resolved,
+        "resolved_at": utc(alert.resolved_at),
+    }
+
+
+# alert_payload's fields as columns, for reads that skip the ORM (the
+# dashboard); timestamps stay datetimes for serialization.dumps
+ALERT_PAYLOAD_COLUMNS = (
+    Alert.id, Alert.user_id, Alert.vital_type, Alert.message, Alert.severity, Alert.created_at,
+    func.coalesce(Alert.last_seen_at, Alert.created_at).label("last_seen_at"),
+    func.coalesce(Alert.occurrences, 1).label("occurrences"),
+    Alert.resolved, Alert.resolved_at,
+)
+
+
+def apply_events(db: Session, events) -> list:
+    """Fold abnormal readings into open alerts (or new ones). Flushes but
+    does not commit. Returns the payloads of the alerts that changed."""
+    events = sorted(events, key=lambda event: event.timestamp)
+    user_ids = {event.user_id for event in events}
+    rules = threshold_engine.preload(db, user_ids)
+
+    open_alerts = {}
+    candidates = db.query(Alert).filter(
+        Alert.user_id.in_(user_ids),
+        Alert.vital_type.in_({event.vital_type for event in events}),
+        Alert.resolved == false(),
+    ).order_by(Alert.created_at)
+    for alert in candidates:
+        open_alerts[(alert.user_id, alert.vital_type)] = alert  # newest wins
+
+    changed = {}
+    for event in events:
+        key = (event.user_id, event.vital_type)
+        rule = rules[event.user_id].get(event.vital_type)
+        alert = open_alerts.get(key)
+        last_seen = (alert.last_seen_at or alert.created_at) if alert is not None else None
+        if alert is not None and event.timestamp - last_seen <= DEDUP_WINDOW:
+            alert.occurrences = (alert.occurrences or 1) + 1
+            if event.timestamp >= last_seen:
+                alert.last_seen_at = event.timestamp
+                alert.message = event.message
+            alert.severity = severity_for(rule, event.value, alert.created_at,
+                                          alert.last_seen_at or alert.created_at, alert.severity)
+        else:
+            alert = Alert(
+                user_id=event.user_id, vital_type=event.vital_type, message=event.message,
+                created_at=event.timestamp, last_seen_at=event.timestamp, occurrences=1,
+                severity=severity_for(rule, event.value, event.timestamp, event.timestamp),
+                resolved=False,
+            )
+            db.add(alert)
+            open_alerts[key] = alert
+        changed[id(alert)] = alert
+    db.flush()
+    return [alert_payload(alert) for alert in changed.values()]
+
+
+def resolve_recovered(db: Session) -> list:
+    """Resolve open alerts whose vital type is back to normal. Reads open
+    alerts through the partial index ix_alerts_open. Does not commit."""
+    rows = (
+        db.query(Alert, LatestVital.timestamp)
+        .join(LatestVital, and_(LatestVital.user_id == Alert.user_id, LatestVital.type == Alert.vital_type))
+        .filter(
+            Alert.resolved == false(),
+            Alert.vital_type.is_not(None),
+            LatestVital.is_abnormal == false(),
+            LatestVital.timestamp > func.coalesce(Alert.last_seen_at, Alert.created_at),
+        )
+        .all()
+    )
+    for alert, recovered_at in rows:
+        alert.resolved = True
+        alert.resolved_at = recovered_at
+    db.flush()
+    return [alert_payload(alert) for alert, _ in rows]
+
+
+# --- Queue backends ---
+class MemoryQueue:
+    def __init__(self, max_size: int):
+        self._queue = queue.Queue(max_size)
+
+    def stage(self, db: Session, events: list):
+        return events
+
+    def committed(self, events: list):
+        for event in events:
+            self._queue.put(event)  # blocks when full: back-pressure on ingest
+
+    def take(self, db: Session, max_items: int, timeout: float, linger: float) -> list:
+        try:
+            events = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + linger
+        while len(events) < max_items:
+            try:
+                events.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return events
+
+    def ack(self, db: Session, events: list):
+        pass
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+
+class DatabaseQueue:
+    def __init__(self):
+        self._wake = threading.Event()
+
+    def stage(self, db: Session, events: list):
+        db.execute(insert(AlertEvent), [event._asdict() for event in events])
+
+    def committed(self, staged):
+        self._wake.set()
+
+    def take(self, db: Session, max_items: int, timeout: float, linger: float) -> list:
+        events = db.query(AlertEvent).order_by(AlertEvent.id).limit(max_items).all()
+        if not events:
+            db.rollback()  # end the read transaction while idle
+            if self._wake.wait(timeout):
+                time.sleep(linger)  # let a burst accumulate
+            self._wake.clear()
+        return events
+
+    def ack(self, db: Session, events: list):
+        # Exactly the taken ids: on PostgreSQL a lower id can commit after
+        # a higher one and must stay queued for the next take
+        db.query(AlertEvent).filter(AlertEvent.id.in_([event.id for event in events])) \
+            .delete(synchronize_session=False)
+
+    def pending(self) -> int:
+        return -1  # not tracked in-process
+
+
+class InlineQueue:
+    """Nothing is queued (ingest applies alerts itself); the worker only
+    runs the resolution sweep."""
+    def __init__(self):
+        self._wake = threading.Event()
+
+    def take(self, db: Session, max_items: int, timeout: float, linger: float) -> list:
+        self._wake.wait(timeout)
+        return []
+
+    def ack(self, db: Session, events: list):
+        pass
+
+    def pending(self) -> int:
+        return 0
+
+
+class AlertPipeline:
+    def __init__(self, backend: str = None, max_queue: int = 100000, batch_size: int = 500,
+                 poll_seconds: float = 0.5, linger_seconds: float = 0.2, shared: bool = False):
+        backend = backend or ("database" if shared else "memory")
+        if backend not in ("memory", "database", "inline"):
+            raise ValueError(f"Unknown ALERT_QUEUE {backend!r}; expected memory, database or inline")
+        if shared and backend != "database":
+            # Each worker would open its own alert for the same episode
+            raise ValueError(f"ALERT_QUEUE={backend} cannot be used with several workers "
+                             f"(CLUSTER_BACKEND=database); use ALERT_QUEUE=database")
+        self.backend = backend
+        self.queue = {"memory": lambda: MemoryQueue(max_queue), "database": DatabaseQueue,
+                      "inline": InlineQueue}[backend]()
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        # Wait this long after the first event so one commit covers a burst
+        self.linger_seconds = linger_seconds
+        self._thread = None
+        self._stopping = threading.Event()
+        self.leading = True  # see set_leading()
+        self.processed = 0
+        self.resolved = 0
+        self.errors = 0
+
+    # --- Ingest side ---
+    def stage(self, db: Session, events: list):
+        """Call inside the ingest transaction, before commit. Returns a
+        callback for committed()."""
+        if not events:
+            return None
+        # Nothing would drain an in-memory queue in a process without the
+        # worker (scripts, benchmarks), so those apply alerts inline
+        if self.backend == "inline" or (self.backend == "memory" and not self.running):
+            payloads = apply_events(db, events)
+            return lambda: _publish(payloads)
+        staged = self.queue.stage(db, events)
+        return lambda: self.queue.committed(staged)
+
+    def committed(self, callback):
+        """Call after the ingest transaction committed."""
+        if callback is not None:
+            callback()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- Worker ---
+    def set_leading(self, leading: bool):
+        """Called by cluster.py. Only the leader sweeps for recovered alerts
+        and takes events from the shared database queue."""
+        self.leading = leading
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="alert-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Process what is already queued, then stop."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        next_sweep = 0.0
+        while True:
+            sweep = time.monotonic() >= next_sweep
+            idle = self.run_once(sweep)
+            if sweep:
+                next_sweep = time.monotonic() + RESOLVE_INTERVAL
+            if idle is None:
+                time.sleep(1.0)  # database error: back off
+            elif idle and self._stopping.is_set():
+                return
+
+    def run_once(self, sweep: bool = True):
+        """Process one batch (and resolve recovered alerts when `sweep`).
+        Returns True if there was nothing to do, None on error."""
+        db = database.SessionLocal()
+        try:
+            stopping = self._stopping.is_set()
+            leading = self.leading
+            if self.backend == "database" and not leading:
+                events = []  # the leader drains the shared queue
+                self._stopping.wait(0 if stopping else self.poll_seconds)
+            else:
+                events = self.queue.take(db, self.batch_size, 0 if stopping else self.poll_seconds,
+                                         0 if stopping else self.linger_seconds)
+            changed = apply_events(db, events) if events else []
+            if events:
+                self.queue.ack(db, events)
+            resolved = resolve_recovered(db) if sweep and leading else []
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.errors += 1
+            logger.error("Alert worker error: %s", e)  # memory events of this batch are dropped
+            return None
+        finally:
+            db.close()
+        self.processed += len(events)
+        self.resolved += len(resolved)
+        _publish(changed + resolved)
+        return not events
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "running": self.running,
+            "pending": self.queue.pending(),
+            "processed": self.processed,
+            "resolved": self.resolved,
+            "errors": self.errors,
+        }
+
+
+def _publish(alerts: list):
+    if alerts:
+        from ingest import publish_deltas  # ingest imports this module
+        publish_deltas([], alerts)
+
+
+# Singleton instance
+alert_pipeline = AlertPipeline(
+    backend=os.getenv("ALERT_QUEUE"),
+    shared=cluster.shared,
+    max_queue=int(os.getenv("ALERT_QUEUE_SIZE", "100000")),
+    linger_seconds=float(os.getenv("ALERT_BATCH_LINGER_SECONDS", "0.2")),
+)
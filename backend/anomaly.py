@@ -0,0 +1,555 @@
+"""
+COMPONENT: Streaming Anomaly Detector
+
+The threshold rules (thresholds.py) compare each reading with fixed
+population limits. This detector learns each patient's own baseline per
+vital type and flags readings that are unusual *for them*, including slow
+trends that never cross a limit (SpO2 drifting from 98% to 95.5%).
+
+State per (user, vital type) is a few floats held in memory:
+
+-   Welford count/mean/M2: the baseline mean and variance. Past
+    ANOMALY_MAX_SAMPLES readings the count is held there (M2 scaled to
+    match), so older history slowly loses weight.
+-   EWMA (ANOMALY_EWMA_ALPHA): the recent level.
+-   Last value and time: for the rate-of-change check.
+
+Each reading is scored in O(1) before it updates the state:
+
+-   spike: more than ANOMALY_SPIKE_SIGMAS baseline deviations from the mean
+-   trend: the EWMA has moved more than ANOMALY_TREND_SIGMAS deviations away
+    from the mean
+-   rate: changed faster than the vital type's plausible rate per minute
+spike and trend need ANOMALY_MIN_SAMPLES readings of baseline first.
+
+Dirty states are checkpointed to the anomaly_state table in an ingest
+transaction every ANOMALY_CHECKPOINT_SECONDS and on shutdown. On startup the
+checkpoints are loaded and newer vitals (at most ANOMALY_BACKFILL_DAYS old)
+are replayed with backfill(), which folds whole arrays into the state with
+NumPy (Chan's parallel variance merge and a closed-form EWMA) instead of one
+reading at a time. NumPy is optional; without it backfill() replays through
+the per-reading path.
+
+With several workers (cluster.shared) each worker's state only holds the
+readings that worker ingested, so no worker checkpoints its own state.
+The leader runs MergedCheckpoints instead: a replica detector that replays
+the shared vitals table (every worker's readings) in ingest order
+(vitals.ingested_at, so late uploads with old device timestamps still
+count) and checkpoints that. Every worker then rebuilds its own state from
+those checkpoints.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+import database
+from cluster import cluster
+from database import AnomalyState, Vital, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# numpy is optional (backfill falls back to the per-reading path) and is
+# only imported when a replay runs
+np = None
+
+
+def _load_numpy() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.05"))
+SPIKE_SIGMAS = float(os.getenv("ANOMALY_SPIKE_SIGMAS", "4"))
+TREND_SIGMAS = float(os.getenv("ANOMALY_TREND_SIGMAS", "2"))
+MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES", "30"))
+MAX_SAMPLES = int(os.getenv("ANOMALY_MAX_SAMPLES", "2000"))
+CHECKPOINT_INTERVAL = float(os.getenv("ANOMALY_CHECKPOINT_SECONDS", "60"))
+BACKFILL_DAYS = float(os.getenv("ANOMALY_BACKFILL_DAYS", "7"))  # 0 disables the startup replay
+BACKFILL_CHUNK = 200000
+# The leader's replica leaves readings this recent for its next pass, so
+# ingest transactions still open on other workers are not skipped
+SETTLE_SECONDS = float(os.getenv("ANOMALY_SETTLE_SECONDS", "10"))
+
+# min_std: floor for the baseline deviation (about the sensor's resolution),
+# so a very steady baseline does not flag every small wobble.
+# max_rate: largest plausible change per minute; None disables the check.
+Profile = namedtuple("Profile", ["min_std", "max_rate"])
+PROFILES = {
+    "heart_rate": Profile(2.0, 40.0),
+    "blood_pressure_sys": Profile(3.0, 40.0),
+    "blood_pressure_dia": Profile(2.0, 30.0),
+    "spo2": Profile(0.5, 4.0),
+    "glucose": Profile(5.0, 5.0),
+    "temperature": Profile(0.2, 1.0),
+}
+DEFAULT_PROFILE = Profile(1e-9, None)
+# Changes closer together than this are rated as if a minute apart
+MIN_RATE_INTERVAL = 60.0
+
+EPOCH = datetime(1970, 1, 1)
+NO_FLAGS = ()
+
+
+def epoch_seconds(timestamp: datetime) -> float:
+    """Naive UTC datetime -> seconds since the epoch."""
+    return (timestamp - EPOCH).total_seconds()
+
+
+class VitalStats:
+    __slots__ = ("count", "mean", "m2", "ewma", "last_value", "last_time")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, ewma=0.0, last_value=0.0, last_time=float("-inf")):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.last_value = last_value
+        self.last_time = last_time
+
+    def std(self, profile: Profile) -> float:
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        return max(math.sqrt(variance), profile.min_std)
+
+    def merge(self, count: int, mean: float, m2: float):
+        """Fold in another (count, mean, M2) summary, capped at MAX_SAMPLES."""
+        if self.count == 0:
+            self.count, self.mean, self.m2 = count, mean, m2
+        else:  # Chan et al.: merge two (count, mean, M2) summaries
+            total = self.count + count
+            delta = mean - self.mean
+            self.mean += delta * count / total
+            self.m2 += m2 + delta * delta * self.count * count / total
+            self.count = total
+        if self.count > MAX_SAMPLES:
+            self.m2 *= MAX_SAMPLES / self.count
+            self.count = MAX_SAMPLES
+
+
+class AnomalyDetector:
+    def __init__(self, shared: bool = False):
+        self._lock = threading.Lock()
+        self._states = {}   # (user_id, vital_type) -> VitalStats
+        self._dirty = set()
+        self._last_checkpoint = time.monotonic()
+        # Other workers ingest too: checkpoints come from the leader's replica
+        self.merged = MergedCheckpoints(self) if shared else None
+        self.scored = 0
+        self.backfilled = 0
+        self.flagged = {"spike": 0, "trend": 0, "rate": 0}
+
+    # --- Online scoring ---
+    def observe(self, user_id: int, vital_type: str, value: float, at: float) -> tuple:
+        """Score one reading (`at` in epoch seconds), then fold it into the
+        state. Returns the flags that fired, usually (). Caller holds the lock."""
+        key = (user_id, vital_type)
+        stats = self._states.get(key)
+        if stats is None:
+            stats = self._states[key] = VitalStats()
+        self._dirty.add(key)
+        if stats.count == 0:
+            stats.count, stats.mean, stats.m2 = 1, value, 0.0
+            stats.ewma, stats.last_value, stats.last_time = value, value, at
+            return NO_FLAGS
+
+        profile = PROFILES.get(vital_type, DEFAULT_PROFILE)
+        in_order = at >= stats.last_time
+        flags = NO_FLAGS
+        if in_order:
+            stats.ewma += EWMA_ALPHA * (value - stats.ewma)
+        if stats.count >= MIN_SAMPLES:
+            std = stats.std(profile)
+            if abs(value - stats.mean) > SPIKE_SIGMAS * std:
+                flags += ("spike",)
+            if abs(stats.ewma - stats.mean) > TREND_SIGMAS * std:
+                flags += ("trend",)
+        if in_order:
+            if profile.max_rate is not None and \
+               abs(value - stats.last_value) * 60.0 / max(at - stats.last_time, MIN_RATE_INTERVAL) > profile.max_rate:
+                flags += ("rate",)
+            stats.last_value, stats.last_time = value, at
+
+        # Welford update; older readings lose weight past MAX_SAMPLES
+        count = stats.count + 1
+        delta = value - stats.mean
+        stats.mean += delta / count
+        stats.m2 += delta * (value - stats.mean)
+        if count > MAX_SAMPLES:
+            stats.m2 *= MAX_SAMPLES / count
+            count = MAX_SAMPLES
+        stats.count = count
+        return flags
+
+    def score_batch(self, vital_rows: list) -> list:
+        """Flags for each vital row (dicts as inserted by ingest), in order."""
+        results = []
+        with self._lock:
+            for row in vital_rows:
+                flags = self.observe(row["user_id"], row["type"], row["value"], epoch_seconds(row["timestamp"]))
+                for flag in flags:
+                    self.flagged[flag] += 1
+                results.append(flags)
+            self.scored += len(vital_rows)
+        return results
+
+    # --- Bulk replay ---
+    def backfill(self, user_ids, vital_types, values, times, include_late: bool = False) -> int:
+        """Fold parallel sequences of readings (times in epoch seconds, any
+        order) into the state without scoring them. Readings at or before a
+        key's last seen time are skipped, so overlapping replays are safe;
+        with include_late (a replay that sees each reading once) they only
+        update the mean and variance, as in observe().
+        Matches reading-by-reading updates exactly until a key reaches
+        MAX_SAMPLES; past that, a long replay is capped once at the end.
+        Returns the number of readings applied."""
+        if not _load_numpy():
+            return self._backfill_loop(user_ids, vital_types, values, times, include_late)
+        n = len(values)
+        if n == 0:
+            return 0
+        names = sorted(set(vital_types))
+        codes = {name: code for code, name in enumerate(names)}
+        keys = np.asarray(user_ids, dtype=np.int64) * len(names) + \
+            np.fromiter((codes[name] for name in vital_types), np.int64, n)
+        x = np.asarray(values, dtype=np.float64)
+        t = np.asarray(times, dtype=np.float64)
+        order = np.lexsort((t, keys))
+        keys, x, t = keys[order], x[order], t[order]
+
+        with self._lock:
+            # Drop what each key has already seen
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            group_keys = [(int(k) // len(names), names[int(k) % len(names)]) for k in keys[starts]]
+            seen = np.array([self._states[k].last_time if k in self._states else -np.inf for k in group_keys])
+            counts = np.diff(np.r_[starts, n])
+            keep = t > np.repeat(seen, counts)
+            late = 0
+            if not keep.all():
+                if include_late:
+                    late = self._fold_late(names, keys[~keep], x[~keep])
+                    self.backfilled += late
+                keys, x, t = keys[keep], x[keep], t[keep]
+                n = len(x)
+                if n == 0:
+                    return late
+                starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+                group_keys = [(int(k) // len(names), names[int(k) % len(names)]) for k in keys[starts]]
+                counts = np.diff(np.r_[starts, n])
+            ends = starts + counts - 1
+            group = np.repeat(np.arange(len(starts)), counts)
+
+            means = np.add.reduceat(x, starts) / counts
+            m2s = np.add.reduceat((x - means[group]) ** 2, starts)
+            # EWMA after the group: seed * decay**count + sum(alpha * decay**(readings after) * x)
+            decay = 1.0 - EWMA_ALPHA
+            weighted = np.add.reduceat(x * (EWMA_ALPHA * decay ** (ends[group] - np.arange(n))), starts)
+            seed_weights = decay ** counts
+
+            for key, count, mean, m2, weighted_sum, seed_weight, first, last_value, last_time in zip(
+                    group_keys, counts.tolist(), means.tolist(), m2s.tolist(), weighted.tolist(),
+                    seed_weights.tolist(), x[starts].tolist(), x[ends].tolist(), t[ends].tolist()):
+                stats = self._states.get(key)
+                if stats is None:
+                    stats = self._states[key] = VitalStats()
+                seed = stats.ewma if stats.count else first
+                stats.merge(count, mean, m2)
+                stats.ewma = seed * seed_weight + weighted_sum
+                stats.last_value, stats.last_time = last_value, last_time
+                self._dirty.add(key)
+            self.backfilled += n
+        return n + late
+
+    def _fold_late(self, names: list, keys, x) -> int:
+        """Merge readings older than their key's last one into its mean and
+        variance (keys sorted, every key already in the state). Caller holds
+        the lock."""
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(x)])
+        means = np.add.reduceat(x, starts) / counts
+        m2s = np.add.reduceat((x - np.repeat(means, counts)) ** 2, starts)
+        for code, count, mean, m2 in zip(keys[starts].tolist(), counts.tolist(), means.tolist(), m2s.tolist()):
+            key = (code // len(names), names[code % len(names)])
+            self._states[key].merge(count, mean, m2)
+            self._dirty.add(key)
+        return len(x)
+
+    def _backfill_loop(self, user_ids, vital_types, values, times, include_late: bool = False) -> int:
+        applied = 0
+        with self._lock:
+            for user_id, vital_type, value, at in sorted(zip(user_ids, vital_types, values, times),
+                                                         key=lambda reading: reading[3]):
+                stats = self._states.get((user_id, vital_type))
+                if include_late or stats is None or at > stats.last_time:
+                    self.observe(user_id, vital_type, value, at)
+                    applied += 1
+            self.backfilled += applied
+        return applied
+
+    # --- Checkpoints ---
+    def checkpoint_due(self) -> bool:
+        return self.merged is None and bool(self._dirty) and \
+            time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL
+
+    def checkpoint(self, db: Session, ingested_through: datetime = None):
+        """Upsert every state changed since the last checkpoint. Does not
+        commit; the caller owns the transaction. A shared detector's state is
+        partial and is never checkpointed. `ingested_through` marks merged
+        checkpoints: they hold every vital ingested up to then, and never
+        replace a row that is further along."""
+        if self.merged is not None:
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self._last_checkpoint = time.monotonic()
+            now = datetime.utcnow()
+            rows = [
+                {"user_id": user_id, "vital_type": vital_type, "count": stats.count, "mean": stats.mean,
+                 "m2": stats.m2, "ewma": stats.ewma, "last_value": stats.last_value,
+                 "last_timestamp": EPOCH + timedelta(seconds=stats.last_time), "updated_at": now,
+                 "ingested_through": ingested_through}
+                for (user_id, vital_type), stats in ((key, self._states[key]) for key in dirty)
+            ]
+        if not rows:
+            return
+        stmt = dialect_insert(db)(AnomalyState)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AnomalyState.user_id, AnomalyState.vital_type],
+            set_={name: stmt.excluded[name] for name in rows[0] if name not in ("user_id", "vital_type")},
+            where=None if ingested_through is None else or_(
+                AnomalyState.ingested_through.is_(None),
+                AnomalyState.ingested_through <= stmt.excluded.ingested_through),
+        )
+        db.execute(stmt, rows)
+
+    def load(self, db: Session) -> int:
+        """Replace the in-memory state with the checkpoints."""
+        states = {
+            (row.user_id, row.vital_type): VitalStats(row.count, row.mean, row.m2, row.ewma, row.last_value,
+                                                      epoch_seconds(row.last_timestamp))
+            for row in db.execute(select(AnomalyState)).scalars()
+        }
+        with self._lock:
+            self._states = states
+            self._dirty = set()
+        return len(states)
+
+    def warm(self, db: Session, days: float = BACKFILL_DAYS, ingested_through: datetime = None) -> int:
+        """Load the checkpoints, then replay the vitals they miss through
+        backfill(): after merged checkpoints, every vital ingested since
+        (`days` does not apply); otherwise those stamped since the oldest
+        checkpoint, at most `days` back. Returns readings applied."""
+        loaded = self.load(db)
+        merged = merged_through(db)
+        if merged is not None:
+            return self.replay(db, ingested_after=merged, ingested_through=ingested_through)
+        if days <= 0:
+            return 0
+        since = datetime.utcnow() - timedelta(days=days)
+        if loaded:
+            oldest = db.execute(select(func.min(AnomalyState.last_timestamp))).scalar()
+            since = max(since, oldest)
+        return self.replay(db, since=since, ingested_through=ingested_through)
+
+    def replay(self, db: Session, since: datetime = None, ingested_after: datetime = None,
+               ingested_through: datetime = None) -> int:
+        """backfill() the vitals stamped after `since`, or those ingested
+        after `ingested_after` (each once, however old its timestamp), up to
+        those ingested at `ingested_through`. Returns readings applied."""
+        query = (
+            select(Vital.user_id, Vital.type, Vital.value, Vital.timestamp)
+            .where(Vital.user_id.is_not(None), Vital.type.is_not(None), Vital.value.is_not(None))
+            .order_by(Vital.timestamp)  # chunks arrive in time order
+            .execution_options(yield_per=BACKFILL_CHUNK)
+        )
+        if since is not None:
+            query = query.where(Vital.timestamp > since)
+        if ingested_after is not None:
+            query = query.where(Vital.ingested_at > ingested_after)
+        if ingested_through is not None:  # rows from before ingested_at existed have none
+            query = query.where(or_(Vital.ingested_at.is_(None), Vital.ingested_at <= ingested_through))
+        rows = db.execute(query)
+        applied = 0
+        for chunk in rows.partitions():
+            user_ids, vital_types, values, timestamps = zip(*chunk)
+            if _load_numpy():
+                times = np.array(timestamps, dtype="datetime64[us]").astype(np.int64) / 1e6
+            else:
+                times = [epoch_seconds(timestamp) for timestamp in timestamps]
+            applied += self.backfill(user_ids, vital_types, values, times, include_late=ingested_after is not None)
+        return applied
+
+    def adopt(self, other: "AnomalyDetector"):
+        """Take over another detector's states (a rebuilt baseline)."""
+        with self._lock:
+            self._states = other._states
+            self._dirty = set()
+
+    # --- Reads ---
+    def baseline(self, user_id: int) -> dict:
+        """{vital_type: summary} of one user's current state."""
+        with self._lock:
+            states = [(vital_type, stats) for (uid, vital_type), stats in self._states.items() if uid == user_id]
+            summary = {}
+            for vital_type, stats in states:
+                std = stats.std(PROFILES.get(vital_type, DEFAULT_PROFILE))
+                summary[vital_type] = {
+                    "samples": stats.count,
+                    "mean": round(stats.mean, 3),
+                    "std": round(std, 3),
+                    "ewma": round(stats.ewma, 3),
+                    "trend_sigmas": round((stats.ewma - stats.mean) / std, 2),
+                    "trending": stats.count >= MIN_SAMPLES and abs(stats.ewma - stats.mean) > TREND_SIGMAS * std,
+                    "last_value": stats.last_value,
+                    "last_timestamp": (EPOCH + timedelta(seconds=stats.last_time)).isoformat() + 'Z',
+                }
+        return summary
+
+    # --- Several workers ---
+    def set_leading(self, leading: bool):
+        """Called on every leadership change (cluster.on_leadership); starts
+        a shared detector's MergedCheckpoints on the first call."""
+        if self.merged is not None:
+            self.merged.leading = leading
+            self.merged.start()
+
+    def stop(self):
+        if self.merged is not None:
+            self.merged.stop()
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._states),
+            "dirty": len(self._dirty),
+            "scored": self.scored,
+            "backfilled": self.backfilled,
+            "flagged": dict(self.flagged),
+            "numpy": _load_numpy(),
+            "checkpoints": "local" if self.merged is None else self.merged.stats(),
+        }
+
+
+def merged_through(db: Session):
+    """How far the merged checkpoints have read (vitals.ingested_at), or None
+    if there are none."""
+    return db.execute(select(func.max(AnomalyState.ingested_through))).scalar()
+
+
+class MergedCheckpoints:
+    """Checkpoints and baselines for several workers. Every worker runs a
+    pass each ANOMALY_CHECKPOINT_SECONDS:
+
+    -   the leader folds the vitals ingested since its previous pass (by any
+        worker, whatever their device timestamps) into a replica detector and
+        checkpoints it with ingested_through. Vitals ingested in the last
+        SETTLE_SECONDS wait for the next pass, so transactions still open on
+        other workers are not skipped;
+    -   then every worker rebuilds its own detector from the checkpoints and
+        the vitals ingested after them, so its baseline covers all workers
+        again. Readings it scores while rebuilding are picked up by the next
+        rebuild.
+
+    The replica is dropped when this worker stops leading; the next term
+    starts again from the checkpoints."""
+
+    def __init__(self, detector: AnomalyDetector, interval_seconds: float = CHECKPOINT_INTERVAL,
+                 settle_seconds: float = SETTLE_SECONDS):
+        self.detector = detector
+        self.interval_seconds = interval_seconds
+        self.settle_seconds = settle_seconds
+        self.leading = False
+        self._replica = None
+        self._through = None  # the replica holds every vital ingested up to here
+        self._thread = None
+        self._stopping = threading.Event()
+        self.runs = 0
+        self.replayed = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="anomaly-checkpoints", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop after the current pass."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                self._replica = None  # may be half updated: rebuilt from the checkpoints
+                self.errors += 1
+                logger.error("Anomaly checkpoint pass failed: %s", e)
+
+    def run_once(self) -> int:
+        """One pass; returns the readings the replica folded in."""
+        applied = 0
+        with database.SessionLocal() as db:
+            if not self.leading:
+                self._replica = None
+            else:
+                applied = self._advance(db, datetime.utcnow() - timedelta(seconds=self.settle_seconds))
+                db.commit()
+            self.reload(db)
+        self.runs += 1
+        self.replayed += applied
+        return applied
+
+    def _advance(self, db: Session, through: datetime) -> int:
+        applied = 0
+        if self._replica is None:
+            replica = AnomalyDetector()
+            merged = merged_through(db)
+            applied = replica.warm(db, ingested_through=through)
+            self._replica, self._through = replica, max(merged, through) if merged else through
+        elif through > self._through:
+            applied = self._replica.replay(db, ingested_after=self._through, ingested_through=through)
+            self._through = through
+        self._replica.checkpoint(db, ingested_through=self._through)
+        return applied
+
+    def reload(self, db: Session) -> int:
+        """Rebuild this worker's detector from the merged checkpoints and the
+        vitals ingested after them. Returns readings replayed."""
+        merged = merged_through(db)
+        if merged is None:
+            return 0
+        rebuilt = AnomalyDetector()
+        rebuilt.load(db)
+        applied = rebuilt.replay(db, ingested_after=merged)
+        self.detector.adopt(rebuilt)
+        self.reloads += 1
+        return applied
+
+    def stats(self) -> dict:
+        return {
+            "leader": self.leading,
+            "runs": self.runs,
+            "replayed": self.replayed,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "ingested_through": self._through.isoformat() + 'Z' if self._through else None,
+        }
+
+
+# Singleton instance
+anomaly_detector = AnomalyDetector(shared=cluster.shared)
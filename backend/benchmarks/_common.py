@@ -0,0 +1,43 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark runs offline against an in-process app instance backed by a
+throwaway SQLite database, so results do not depend on network or on the
+developer's /tmp/test.db.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_temp_database(name: str = "bench") -> str:
+    """Point DATABASE_URL at a fresh SQLite file. Call before importing the app."""
+    path = os.path.join(tempfile.mkdtemp(prefix="hc-bench-"), f"{name}.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+
+def load_app():
+    """Import the FastAPI app the same way uvicorn does (cwd = backend/)."""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)  # StaticFiles is mounted with a relative path
+    import main
+    return main
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def report(name: str, **fields):
+    """Print one machine-readable result line."""
+    print(json.dumps({"benchmark": name, **fields}))
@@ -0,0 +1,110 @@
+"""
+Benchmark: ingest latency and alert volume for each alert pipeline mode.
+
+    cd backend && python benchmarks/bench_alerts.py --readings 2000
+
+One patient per mode posts --readings single ingests (10 s apart) with a
+sustained high heart rate: about --abnormal of them are out of range, in
+long runs. Modes:
+  - legacy: one Alert row per abnormal reading, inserted in the request
+    (the old behaviour, reproduced here)
+  - inline: dedup/escalation applied in the request (ALERT_QUEUE=inline)
+  - memory / database: queued for the background worker (ALERT_QUEUE=...)
+Reports ingest p50/p99 (and p50 of the abnormal readings alone), how long
+the worker took to catch up after the last request, and how many alert rows
+were written.
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from _common import use_temp_database, load_app, percentile, report
+
+
+class LegacyAlerts:
+    """The previous request-path behaviour: insert every abnormal reading."""
+    backend = "legacy"
+    processed = 0
+
+    def stage(self, db, events):
+        from sqlalchemy import insert
+        from database import Alert
+        if events:
+            db.execute(insert(Alert), [{"user_id": e.user_id, "created_at": e.timestamp, "severity": "medium",
+                                        "message": e.message, "resolved": False} for e in events])
+        return None
+
+    def committed(self, callback):
+        pass
+
+    def stop(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readings", type=int, default=2000)
+    parser.add_argument("--abnormal", type=float, default=0.7)
+    args = parser.parse_args()
+
+    use_temp_database("alerts")
+    app_module = load_app()
+    from fastapi.testclient import TestClient
+    import database
+    import ingest
+    from alerts import AlertPipeline
+    from passwords import hash_password
+
+    # Long runs of high readings with normal stretches in between
+    rng = random.Random(7)
+    values, high = [], True
+    for _ in range(args.readings):
+        if rng.random() < 0.02:
+            high = rng.random() < args.abnormal
+        values.append(rng.uniform(105, 140) if high else rng.uniform(60, 90))
+    abnormal = sum(1 for v in values if v > 100)
+
+    with TestClient(app_module.app) as client:
+        app_module.alert_pipeline.stop()  # each mode installs its own below
+        for mode in ("legacy", "inline", "memory", "database"):
+            username = f"patient_{mode}"
+            with database.SessionLocal() as db:
+                db.add(database.User(username=username, password_hash=hash_password("x"), role="elderly",
+                                     full_name=username))
+                db.commit()
+            pipeline = LegacyAlerts() if mode == "legacy" else AlertPipeline(mode)
+            ingest.alert_pipeline = pipeline
+            if mode != "legacy":
+                pipeline.start()
+
+            start_at = datetime(2026, 1, 1)
+            latencies = []
+            for i, value in enumerate(values):
+                body = {"username": username, "type": "heart_rate", "value": round(value, 1), "unit": "bpm",
+                        "timestamp": (start_at + timedelta(seconds=10 * i)).isoformat()}
+                sent = time.perf_counter()
+                client.post("/api/v1/ingest", json=body).raise_for_status()
+                latencies.append((time.perf_counter() - sent) * 1000)
+
+            done = time.perf_counter()
+            if mode in ("memory", "database"):
+                while pipeline.processed < abnormal:
+                    time.sleep(0.01)
+            catch_up = time.perf_counter() - done
+            pipeline.stop()
+
+            with database.SessionLocal() as db:
+                user_id = db.query(database.User.id).filter(database.User.username == username).scalar()
+                rows = db.query(database.Alert).filter(database.Alert.user_id == user_id).count()
+            flagged = [ms for ms, value in zip(latencies, values) if value > 100]
+            report("alert_pipeline", mode=mode, readings=args.readings, abnormal=abnormal,
+                   ingest_p50_ms=round(percentile(latencies, 50), 3),
+                   ingest_p99_ms=round(percentile(latencies, 99), 3),
+                   abnormal_ingest_p50_ms=round(percentile(flagged, 50), 3),
+                   worker_catch_up_ms=round(catch_up * 1000, 1), alert_rows=rows)
+
+
+if __name__ == "__main__":
+    main()
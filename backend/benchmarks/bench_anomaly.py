@@ -0,0 +1,125 @@
+"""
+Benchmark: anomaly detector throughput and early warning.
+
+    cd backend && python benchmarks/bench_anomaly.py --readings 2000000
+
+Reports:
+  - online: readings/sec through score_batch() (the per-request path)
+  - backfill: readings/sec through the NumPy backfill(), as arrays of
+    --readings readings over --users users and six vital types
+  - warm_from_db: readings/sec for a startup replay of --db-readings vitals
+    from SQLite (query + backfill)
+  - early_warning: a patient with a steady SpO2 baseline that then drifts
+    down 0.01%/min; minutes between the first trend flag and the first
+    reading under the 95% threshold
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from _common import use_temp_database, load_app, report
+
+TYPES = {"heart_rate": (75, 6), "blood_pressure_sys": (125, 8), "blood_pressure_dia": (80, 5),
+         "spo2": (97, 0.7), "glucose": (110, 12), "temperature": (98.2, 0.3)}
+
+
+def synthetic(count: int, users: int, seed: int = 1):
+    """Readings one minute apart per user and type, in arrival order."""
+    rng = np.random.default_rng(seed)
+    names = list(TYPES)
+    slots = np.arange(count)
+    user_ids = (slots % users) + 1
+    type_index = (slots // users) % len(names)
+    means = np.array([TYPES[name][0] for name in names])[type_index]
+    stds = np.array([TYPES[name][1] for name in names])[type_index]
+    values = rng.normal(means, stds)
+    times = 1.7e9 + (slots // (users * len(names))) * 60.0
+    return user_ids, [names[i] for i in type_index], values, times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readings", type=int, default=2000000)
+    parser.add_argument("--online-readings", type=int, default=200000)
+    parser.add_argument("--db-readings", type=int, default=300000)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    use_temp_database("anomaly")
+    load_app()
+    import database
+    from anomaly import AnomalyDetector, EPOCH
+    from sqlalchemy import insert
+    from passwords import hash_password
+
+    # Online path
+    user_ids, vital_types, values, times = synthetic(args.online_readings, args.users)
+    rows = [{"user_id": int(u), "type": t, "value": float(v), "timestamp": EPOCH + timedelta(seconds=float(s))}
+            for u, t, v, s in zip(user_ids, vital_types, values, times)]
+    detector = AnomalyDetector()
+    start = time.perf_counter()
+    for offset in range(0, len(rows), 100):  # batches of 100, like /ingest/batch
+        detector.score_batch(rows[offset:offset + 100])
+    elapsed = time.perf_counter() - start
+    report("anomaly_detector", mode="online", readings=len(rows),
+           readings_per_sec=round(len(rows) / elapsed), us_per_reading=round(elapsed / len(rows) * 1e6, 2))
+
+    # Backfill from arrays
+    user_ids, vital_types, values, times = synthetic(args.readings, args.users)
+    detector = AnomalyDetector()
+    start = time.perf_counter()
+    applied = detector.backfill(user_ids, vital_types, values, times)
+    elapsed = time.perf_counter() - start
+    report("anomaly_detector", mode="backfill", readings=applied, keys=detector.stats()["keys"],
+           seconds=round(elapsed, 3), readings_per_sec=round(applied / elapsed))
+
+    # Startup replay from the database
+    database.init_db()
+    user_ids, vital_types, values, times = synthetic(args.db_readings, args.users)
+    with database.SessionLocal() as db:
+        password_hash = hash_password("x")
+        db.add_all([database.User(id=i, username=f"patient_{i}", password_hash=password_hash, role="elderly",
+                                  full_name=f"Patient {i}") for i in range(1, args.users + 1)])
+        db.flush()
+        now = datetime.utcnow()
+        offset = now - (EPOCH + timedelta(seconds=float(times[-1]))) - timedelta(minutes=1)
+        db.execute(insert(database.Vital), [
+            {"user_id": int(u), "type": t, "value": float(v), "unit": "",
+             "timestamp": EPOCH + timedelta(seconds=float(s)) + offset, "is_abnormal": False}
+            for u, t, v, s in zip(user_ids, vital_types, values, times)])
+        db.commit()
+        detector = AnomalyDetector()
+        start = time.perf_counter()
+        applied = detector.warm(db)
+        elapsed = time.perf_counter() - start
+    report("anomaly_detector", mode="warm_from_db", readings=applied,
+           seconds=round(elapsed, 3), readings_per_sec=round(applied / elapsed))
+
+    # Early warning on a slow SpO2 decline
+    rng = random.Random(3)
+    detector = AnomalyDetector()
+    first_trend = first_threshold = None
+    baseline_flags = 0
+    for minute in range(3000):
+        value = round(97.5 + rng.gauss(0, 0.4) - max(0, minute - 1440) * 0.01, 1)
+        flags = detector.score_batch([{"user_id": 1, "type": "spo2", "value": value,
+                                       "timestamp": EPOCH + timedelta(minutes=minute)}])[0]
+        if minute < 1440:
+            baseline_flags += bool(flags)
+        else:
+            if first_trend is None and "trend" in flags:
+                first_trend = minute
+            if first_threshold is None and value < 95:
+                first_threshold = minute
+    report("anomaly_detector", mode="early_warning", baseline_minutes=1440,
+           trend_flag_minute=first_trend - 1440, threshold_minute=first_threshold - 1440,
+           minutes_earlier=first_threshold - first_trend,
+           flagged_during_baseline=baseline_flags)
+
+
+if __name__ == "__main__":
+    main()
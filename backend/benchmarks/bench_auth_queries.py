@@ -0,0 +1,75 @@
+"""
+Benchmark: database queries per request with and without the identity cache.
+
+    cd backend && python benchmarks/bench_auth_queries.py --requests 200
+
+Every statement sent to the database is counted with a SQLAlchemy
+before_cursor_execute hook. Authenticated requests (Bearer token from
+/api/v1/auth/login) are replayed against the dashboard, ingest, series and
+chat endpoints, first with the identity cache disabled (every request
+resolves its user from the users table, as before) and then with it on.
+"""
+
+import argparse
+import time
+
+from _common import use_temp_database, load_app, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    use_temp_database("auth_queries")
+    app_module = load_app()
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    import database
+    from identity import identity_cache
+
+    counts = {"all": 0, "users": 0}
+
+    @event.listens_for(database.engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counts["all"] += 1
+        if "FROM users" in statement:
+            counts["users"] += 1
+
+    requests = {
+        "dashboard": lambda c, h: c.get("/api/v1/dashboard/grandpa_joe", headers=h),
+        "ingest": lambda c, h: c.post("/api/v1/ingest", headers=h, json={
+            "username": "grandpa_joe", "type": "heart_rate", "value": 72, "unit": "bpm"}),
+        "series": lambda c, h: c.get("/api/v1/vitals/grandpa_joe/series", headers=h,
+                                     params={"type": "heart_rate", "bucket": "1h"}),
+        "chat": lambda c, h: c.post("/api/v1/chat", headers=h, json={
+            "username": "grandpa_joe", "message": "what is my heart rate"}),
+    }
+
+    with TestClient(app_module.app) as client:
+        token = client.post("/api/v1/auth/login", json={
+            "username": "grandpa_joe", "password": "password123"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        # Enough history that every dashboard returns its full 50 rows
+        client.post("/api/v1/ingest/batch", json=[
+            {"username": "grandpa_joe", "type": "heart_rate", "value": 70 + i % 10, "unit": "bpm"}
+            for i in range(100)]).raise_for_status()
+
+        for label, cache_size in (("no_cache", 0), ("cached", 10000)):
+            identity_cache.max_users = cache_size
+            identity_cache.invalidate()
+            for name, send in requests.items():
+                send(client, headers).raise_for_status()  # warm-up
+                counts["all"] = counts["users"] = 0
+                start = time.perf_counter()
+                for _ in range(args.requests):
+                    send(client, headers).raise_for_status()
+                elapsed = time.perf_counter() - start
+                report("auth_queries", identity_cache=label, endpoint=name,
+                       queries_per_request=round(counts["all"] / args.requests, 2),
+                       users_queries_per_request=round(counts["users"] / args.requests, 2),
+                       ms_per_request=round(elapsed / args.requests * 1000, 3))
+
+
+if __name__ == "__main__":
+    main()
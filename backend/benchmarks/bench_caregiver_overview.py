@@ -0,0 +1,92 @@
+"""
+Benchmark: a caregiver's view of all assigned patients.
+
+    cd backend && python benchmarks/bench_caregiver_overview.py --patients 40
+
+Assigns --patients patients (each with --readings vitals, a few abnormal) to
+nurse_sarah, then compares, in statements sent to the database and wall
+time per full view:
+  - per_patient_dashboards: GET /api/v1/dashboard/{patient} for every patient
+  - overview: GET /api/v1/caregiver/nurse_sarah/overview (one page)
+  - overview_304: the same request with If-None-Match of the last ETag
+"""
+
+import argparse
+import time
+
+from _common import use_temp_database, load_app, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=40)
+    parser.add_argument("--readings", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    use_temp_database("caregiver_overview")
+    app_module = load_app()
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    import database
+    from passwords import hash_password
+
+    counts = {"queries": 0}
+
+    @event.listens_for(database.engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counts["queries"] += 1
+
+    with TestClient(app_module.app) as client:
+        password_hash = hash_password("password123")
+        names = [f"resident_{i:03d}" for i in range(args.patients)]
+        with database.SessionLocal() as db:
+            db.add_all([database.User(username=name, password_hash=password_hash, role="elderly",
+                                      full_name=name.title()) for name in names])
+            db.commit()
+        for name in names:
+            client.put(f"/api/v1/caregiver/nurse_sarah/patients/{name}").raise_for_status()
+            # Normal readings; every 50th is 150, an open alert unless the type allows it
+            client.post("/api/v1/ingest/batch", json=[
+                {"username": name, "type": vital_type, "value": 150 if i % 50 == 0 else normal, "unit": unit}
+                for i, (vital_type, normal, unit) in enumerate(
+                    ([("heart_rate", 72, "bpm"), ("spo2", 97, "%"), ("glucose", 100, "mg/dL")] * args.readings)
+                    [:args.readings])]).raise_for_status()
+
+        def per_patient():
+            for name in names:
+                client.get(f"/api/v1/dashboard/{name}").raise_for_status()
+
+        def overview():
+            resp = client.get("/api/v1/caregiver/nurse_sarah/overview", params={"limit": args.patients})
+            resp.raise_for_status()
+            return resp
+
+        # Alerts are written by the pipeline's worker: wait until the page settles
+        etag, deadline = None, time.monotonic() + 30
+        while time.monotonic() < deadline:
+            previous, etag = etag, overview().headers["ETag"]
+            if etag == previous and app_module.alert_pipeline.queue.pending() == 0:
+                break
+            time.sleep(0.5)
+
+        def revalidate():
+            resp = client.get("/api/v1/caregiver/nurse_sarah/overview", params={"limit": args.patients},
+                              headers={"If-None-Match": etag})
+            assert resp.status_code == 304, resp.status_code
+
+        for label, view in (("per_patient_dashboards", per_patient), ("overview", overview),
+                            ("overview_304", revalidate)):
+            view()  # warm-up
+            counts["queries"] = 0
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                view()
+            elapsed = time.perf_counter() - start
+            report("caregiver_view", mode=label, patients=args.patients,
+                   queries_per_view=round(counts["queries"] / args.repeat, 2),
+                   ms_per_view=round(elapsed / args.repeat * 1000, 2))
+
+
+if __name__ == "__main__":
+    main()
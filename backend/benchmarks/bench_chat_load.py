@@ -0,0 +1,159 @@
+"""
+Load test: ingest latency while many chats are in flight.
+
+    cd backend && python benchmarks/bench_chat_load.py --chats 100
+
+Gemini is replaced by a stub that takes --llm-latency seconds per call, and
+the app is served by a real uvicorn server on localhost. The script measures
+ingest p50/p99 latency with no chats, with --chats concurrent requests on the
+async /api/v1/chat endpoint, and with the same load on a sync handler that
+calls the blocking HealthAgent.chat (the old behaviour, mounted only here).
+It also compares time-to-first-byte of /api/v1/chat and /api/v1/chat/stream.
+"""
+
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+
+from _common import use_temp_database, load_app, percentile, report
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Stands in for genai.GenerativeModel with a fixed latency."""
+
+    def __init__(self, latency: float, chunks: int = 10):
+        self.latency = latency
+        self.chunks = chunks
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return _Chunk("stub response")
+
+    async def generate_content_async(self, prompt, stream=False):
+        if not stream:
+            await asyncio.sleep(self.latency)
+            return _Chunk("stub response")
+        return self._stream()
+
+    async def _stream(self):
+        for i in range(self.chunks):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield _Chunk(f"chunk {i} ")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def measure_ingest(client, seconds: float) -> list:
+    """Sequential ingest requests for `seconds`; failed requests count as 30 s."""
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            resp = await client.post("/api/v1/ingest", json={
+                "username": "grandpa_joe", "type": "heart_rate", "value": 72, "unit": "bpm"}, timeout=30)
+            resp.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError:
+            latencies.append(30000.0)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def ingest_under_chat_load(client, chat_path: str, chats: int, seconds: float) -> list:
+    async def one_chat():
+        try:
+            resp = await client.post(chat_path, json={"username": "grandpa_joe", "message": "How is my heart rate?"})
+            return resp.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    chat_tasks = [asyncio.create_task(one_chat()) for _ in range(chats)]
+    await asyncio.sleep(0.2)  # let the chats get in flight first
+    latencies = await measure_ingest(client, seconds)
+    ok = await asyncio.gather(*chat_tasks)
+    return latencies, chats - sum(ok)
+
+
+async def time_to_first_byte(client, path: str) -> float:
+    start = time.perf_counter()
+    async with client.stream("POST", path, json={"username": "grandpa_joe", "message": "hello"}) as resp:
+        async for _ in resp.aiter_bytes():
+            return (time.perf_counter() - start) * 1000
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(args, base_url: str):
+    limits = httpx.Limits(max_connections=args.chats + 20)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        baseline = await measure_ingest(client, args.seconds)
+        report("ingest_idle", p50_ms=round(percentile(baseline, 50), 2),
+               p99_ms=round(percentile(baseline, 99), 2), samples=len(baseline))
+
+        async_load, failed = await ingest_under_chat_load(client, "/api/v1/chat", args.chats, args.seconds)
+        report("ingest_during_async_chats", chats=args.chats, failed_chats=failed,
+               p50_ms=round(percentile(async_load, 50), 2),
+               p99_ms=round(percentile(async_load, 99), 2), samples=len(async_load))
+
+        sync_load, failed = await ingest_under_chat_load(client, "/bench/chat_sync", args.chats, args.seconds)
+        report("ingest_during_sync_chats", chats=args.chats, failed_chats=failed,
+               p50_ms=round(percentile(sync_load, 50), 2),
+               p99_ms=round(percentile(sync_load, 99), 2), samples=len(sync_load))
+
+        report("chat_ttfb",
+               full_response_ms=round(await time_to_first_byte(client, "/api/v1/chat"), 1),
+               streamed_ms=round(await time_to_first_byte(client, "/api/v1/chat/stream"), 1))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=5.0)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    # Measure only while every chat is still waiting on the LLM
+    args.seconds = min(args.seconds, args.llm_latency - 1.0)
+
+    use_temp_database("chat_load")
+    app_module = load_app()
+    import uvicorn
+
+    agent = app_module.agent
+    agent.model = StubModel(args.llm_latency)
+    agent.use_gemini = True
+    agent.max_concurrency = args.chats
+
+    # The old blocking handler, for comparison only
+    @app_module.app.post("/bench/chat_sync")
+    def chat_sync(request: app_module.ChatRequest):
+        return {"response": agent.chat(request.message, request.username)}
+    app_module.app.router.routes.insert(0, app_module.app.router.routes.pop())
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark: several workers sharing one database (CLUSTER_BACKEND=database).
+
+    cd backend && python benchmarks/bench_cluster.py --workers 3
+
+Starts --workers uvicorn processes on consecutive ports against one fresh
+database (a SQLite file, or --database-url), like instances behind a load
+balancer, and checks what cluster.py promises:
+  - cluster_start: every worker came up, the demo data was seeded exactly
+    once and exactly one worker is the leader
+  - threshold_invalidation: after a rule change on worker 0, how long until
+    every other worker's cached rules use it (ingest flags change)
+  - stream_relay: a reading ingested on worker 0 reaches a dashboard stream
+    open on worker 1 (latency per delta)
+  - failover: seconds until another worker leads after the leader shuts
+    down cleanly (lease released) and after it is killed (lease expires)
+Each check prints one JSON line; the script exits non-zero if one fails.
+"""
+
+import argparse
+import os
+import queue
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+from _common import BACKEND_DIR, percentile, report
+
+
+def start_workers(count: int, port: int, env: dict) -> list:
+    return [subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port + i),
+                              "--log-level", "warning", "--timeout-graceful-shutdown", "5"],
+                             cwd=BACKEND_DIR, env=env)
+            for i in range(count)]
+
+
+def wait_ready(urls: list, timeout: float = 60.0) -> float:
+    start = time.perf_counter()
+    pending = list(urls)
+    while pending:
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError(f"Workers did not start: {pending}")
+        try:
+            httpx.get(pending[0] + "/api/v1/cluster/metrics", timeout=1.0).raise_for_status()
+            pending.pop(0)
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    return time.perf_counter() - start
+
+
+def cluster_state(urls: list) -> list:
+    states = []
+    for url in urls:
+        try:
+            states.append(httpx.get(url + "/api/v1/cluster/metrics", timeout=1.0).json())
+        except httpx.HTTPError:
+            states.append(None)
+    return states
+
+
+def wait_for(condition, timeout: float, interval: float = 0.02) -> float:
+    """Seconds until condition() is true, or None after `timeout`."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if condition():
+            return time.perf_counter() - start
+        time.sleep(interval)
+    return None
+
+
+def ingest(url: str, value: float) -> dict:
+    response = httpx.post(url + "/api/v1/ingest", timeout=5.0,
+                          json={"username": "grandpa_joe", "type": "heart_rate", "value": value, "unit": "bpm"})
+    response.raise_for_status()
+    return response.json()
+
+
+def read_stream(client: httpx.Client, url: str, events: queue.Queue):
+    try:
+        with client.stream("GET", url + "/api/v1/dashboard/grandpa_joe/events") as response:
+            for line in response.iter_lines():
+                if line.startswith("event: "):
+                    events.put((line[len("event: "):], time.perf_counter()))
+    except (httpx.HTTPError, RuntimeError):
+        pass  # closed by main()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8310)
+    parser.add_argument("--database-url", help="an empty database; default: a fresh SQLite file")
+    parser.add_argument("--lease-seconds", type=float, default=3.0)
+    parser.add_argument("--deltas", type=int, default=20)
+    args = parser.parse_args()
+
+    database_url = args.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='hc-bench-'), 'cluster.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, CLUSTER_BACKEND="database",
+               CLUSTER_LEASE_SECONDS=str(args.lease_seconds), SESSION_SECRET="bench-cluster-secret",
+               REQUIRE_AUTH="false", LOG_LEVEL="WARNING")
+    env.pop("GEMINI_API_KEY", None)
+    env.pop("PUBSUB_BACKEND", None)
+    urls = [f"http://127.0.0.1:{args.port + i}" for i in range(args.workers)]
+    workers = start_workers(args.workers, args.port, env)
+    failures = []
+
+    def check(name: str, ok: bool, **fields):
+        report(name, ok=ok, **fields)
+        if not ok:
+            failures.append(name)
+
+    try:
+        started = wait_ready(urls)
+        leader_seen = wait_for(lambda: sum(bool(s and s["leader"]) for s in cluster_state(urls)) == 1, 10)
+        sys.path.insert(0, BACKEND_DIR)
+        from sqlalchemy import create_engine, text
+        engine = create_engine(database_url)
+        with engine.connect() as conn:
+            users = conn.execute(text("SELECT count(*) FROM users")).scalar()
+            assignments = conn.execute(text("SELECT count(*) FROM caregiver_patients")).scalar()
+            # Threshold routes need an admin; signup cannot create one
+            admin_id = conn.execute(text("INSERT INTO users (username, password_hash, role, full_name) "
+                                         "VALUES ('bench_admin', '', 'admin', 'Bench Admin') RETURNING id")).scalar()
+            conn.commit()
+        engine.dispose()
+        states = cluster_state(urls)
+        check("cluster_start", leader_seen is not None and users == 2 and assignments == 1,
+              workers=args.workers, seconds=round(started, 2), users=users, assignments=assignments,
+              leaders=sum(bool(s and s["leader"]) for s in states))
+
+        os.environ["SESSION_SECRET"] = env["SESSION_SECRET"]
+        from tokens import issue_token
+        admin = {"Authorization": f"Bearer {issue_token(admin_id, 'bench_admin', 'admin')}"}
+        rule = {"vital_type": "heart_rate", "min_value": 50, "max_value": 130}
+        # Every worker caches the default rule (max 100): 120 is abnormal
+        warm = [ingest(url, 120)["abnormal"] for url in urls]
+        anonymous = httpx.post(urls[0] + "/api/v1/admin/thresholds", timeout=5.0, json=rule).status_code
+        httpx.post(urls[0] + "/api/v1/admin/thresholds", timeout=5.0, json=rule, headers=admin).raise_for_status()
+        delays = [wait_for(lambda url=url: not ingest(url, 120)["abnormal"], 10) for url in urls[1:]]
+        check("threshold_invalidation", all(warm) and None not in delays and anonymous == 401,
+              anonymous_status=anonymous, max_ms=round(max(delays) * 1000, 1) if None not in delays else None)
+
+        if args.workers > 1:
+            events, stream_client = queue.Queue(), httpx.Client(timeout=None)
+            threading.Thread(target=read_stream, args=(stream_client, urls[1], events), daemon=True).start()
+            ready = events.get(timeout=10)[0] == "ready"
+            time.sleep(1.0)  # worker 0 hears that worker 1 has a stream
+            latencies = []
+            for _ in range(args.deltas):
+                time.sleep(random.uniform(0, 0.5))  # not in step with the workers' poll interval
+                while not events.empty():  # e.g. alert deltas from earlier readings
+                    events.get_nowait()
+                sent = time.perf_counter()
+                ingest(urls[0], 72)
+                while True:
+                    name, at = events.get(timeout=10)
+                    if name == "delta":
+                        latencies.append((at - sent) * 1000)
+                        break
+            stream_client.close()  # an open stream would hold up the worker's shutdown
+            check("stream_relay", ready and len(latencies) == args.deltas, deltas=len(latencies),
+                  p50_ms=round(percentile(latencies, 50), 1), max_ms=round(max(latencies), 1))
+
+            for how in ("shutdown", "kill"):
+                leader = next(i for i, state in enumerate(cluster_state(urls)) if state and state["leader"])
+                stopped = time.perf_counter()
+                workers[leader].send_signal(signal.SIGTERM if how == "shutdown" else signal.SIGKILL)
+                workers[leader].wait(15)
+                alive = [url for i, url in enumerate(urls) if workers[i].poll() is None]
+                took = wait_for(lambda: sum(bool(s and s["leader"]) for s in cluster_state(alive)) == 1,
+                                args.lease_seconds * 3, interval=0.05)
+                check("failover", took is not None and bool(alive), after=how, workers_left=len(alive),
+                      seconds=round(time.perf_counter() - stopped, 2) if took is not None else None)
+                if len(alive) < 2:
+                    break
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.terminate()
+        for worker in workers:
+            try:
+                worker.wait(15)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
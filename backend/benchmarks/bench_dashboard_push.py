@@ -0,0 +1,201 @@
+"""
+Load test: live dashboard subscribers on one worker.
+
+    cd backend && python benchmarks/bench_dashboard_push.py --subscribers 5000
+
+Starts one uvicorn worker in a child process, opens --subscribers streams on
+GET /api/v1/dashboard/{username}/events spread over --users patients, then
+runs --rounds batch ingests that each add one reading per patient. For every
+round it records how long each subscriber took to receive its delta, the
+ingest request latency, and the worker's CPU time; the worker's RSS is read
+before and after subscribing. For comparison it also times the dashboard GET
+that clients previously re-fetched after every change.
+
+Subscribers are raw asyncio sockets in this process, so client and server
+share the machine; latencies include the client's own scheduling.
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import httpx
+
+from _common import BACKEND_DIR, use_temp_database, load_app, percentile, report
+from bench_chat_load import free_port
+
+DELTA = b"event: delta"
+CONNECT_CONCURRENCY = 200
+
+
+def proc_rss_mib(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def proc_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class Subscriber:
+    def __init__(self, username: str):
+        self.username = username
+        self.received = []  # arrival time of each delta
+        self.ready = asyncio.Event()
+        self.writer = None
+
+    async def connect(self, port: int):
+        reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        self.writer.write(f"GET /api/v1/dashboard/{self.username}/events HTTP/1.1\r\n"
+                          f"Host: 127.0.0.1\r\n\r\n".encode())
+        await self.writer.drain()
+        await reader.readuntil(b"\r\n\r\n")  # response headers
+        return reader
+
+    async def run(self, reader):
+        buffer = b""
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            now = time.perf_counter()
+            buffer += data
+            if not self.ready.is_set() and b"event: ready" in buffer:
+                self.ready.set()
+            while (index := buffer.find(DELTA)) >= 0:
+                self.received.append(now)
+                buffer = buffer[index + len(DELTA):]
+            buffer = buffer[-len(DELTA):]
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+def seed_users(count: int) -> list:
+    import database
+    from passwords import hash_password
+    database.init_db()
+    password_hash = hash_password("password123")
+    usernames = [f"patient_{i}" for i in range(count)]
+    with database.SessionLocal() as db:
+        db.add_all([database.User(username=name, password_hash=password_hash, role="elderly",
+                                  full_name=f"Patient {i}") for i, name in enumerate(usernames)])
+        db.commit()
+    return usernames
+
+
+async def subscribe_all(subscribers: list, port: int) -> list:
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def start(subscriber):
+        async with gate:
+            reader = await subscriber.connect(port)
+        task = asyncio.create_task(subscriber.run(reader))
+        await subscriber.ready.wait()
+        return task
+
+    return await asyncio.gather(*(start(s) for s in subscribers))
+
+
+async def run(args, port: int, server_pid: int, usernames: list):
+    base_url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await client.get(f"/api/v1/dashboard/{usernames[0]}")
+        poll = []
+        for i in range(200):
+            start = time.perf_counter()
+            (await client.get(f"/api/v1/dashboard/{usernames[i % len(usernames)]}")).raise_for_status()
+            poll.append((time.perf_counter() - start) * 1000)
+        report("dashboard_poll", p50_ms=round(percentile(poll, 50), 2), p99_ms=round(percentile(poll, 99), 2))
+
+        rss_before = proc_rss_mib(server_pid)
+        subscribers = [Subscriber(usernames[i % len(usernames)]) for i in range(args.subscribers)]
+        start = time.perf_counter()
+        tasks = await subscribe_all(subscribers, port)
+        connect_seconds = time.perf_counter() - start
+        rss_after = proc_rss_mib(server_pid)
+        stats = (await client.get("/api/v1/stream/metrics")).json()
+        report("dashboard_subscribe", subscribers=stats["subscribers"], users=len(usernames),
+               connect_seconds=round(connect_seconds, 2), server_rss_mib_before=round(rss_before, 1),
+               server_rss_mib_after=round(rss_after, 1),
+               kib_per_subscriber=round((rss_after - rss_before) * 1024 / args.subscribers, 1))
+
+        batch = [{"username": name, "type": "heart_rate", "value": 72, "unit": "bpm"} for name in usernames]
+        delivery, ingest, cpu = [], [], []
+        for round_index in range(args.rounds):
+            cpu_start = proc_cpu_seconds(server_pid)
+            sent = time.perf_counter()
+            (await client.post("/api/v1/ingest/batch", json=batch)).raise_for_status()
+            ingest.append((time.perf_counter() - sent) * 1000)
+            deadline = sent + 30
+            while any(len(s.received) <= round_index for s in subscribers) and time.perf_counter() < deadline:
+                await asyncio.sleep(0.005)
+            cpu.append((proc_cpu_seconds(server_pid) - cpu_start) * 1000)
+            delivery.extend((s.received[round_index] - sent) * 1000
+                            for s in subscribers if len(s.received) > round_index)
+            await asyncio.sleep(0.2)
+
+        missed = args.subscribers * args.rounds - len(delivery)
+        stats = (await client.get("/api/v1/stream/metrics")).json()
+        report("dashboard_push", subscribers=args.subscribers, rounds=args.rounds,
+               delivery_p50_ms=round(percentile(delivery, 50), 1),
+               delivery_p99_ms=round(percentile(delivery, 99), 1),
+               delivery_max_ms=round(max(delivery, default=0), 1), missed=missed,
+               ingest_p50_ms=round(percentile(ingest, 50), 1),
+               server_cpu_ms_per_round=round(sum(cpu) / len(cpu), 1), dropped=stats["dropped"])
+
+        for subscriber in subscribers:
+            subscriber.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    # Two sockets per subscriber (client and server end) plus headroom
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = args.subscribers * 2 + 1024
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+    use_temp_database("dashboard_push")
+    load_app()
+    usernames = seed_users(args.users)
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--backlog", "4096"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(600):
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/api/v1/stream/metrics").raise_for_status()
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        asyncio.run(run(args, port, server.pid, usernames))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: building and encoding one dashboard payload.
+
+    cd backend && python benchmarks/bench_dashboard_serialization.py --repeat 500
+
+Seeds a patient with 50+ vitals and a few alert episodes, then compares the
+previous handler (ORM objects, FastAPI's jsonable_encoder, json.dumps) with
+the current one (column tuples, serialization.dumps), in microseconds per
+dashboard call:
+  - query: fetching the rows
+  - serialize: turning them into the response body
+  - endpoint: the whole GET through the app (TestClient); the previous
+    handler is mounted on a bench-only route for comparison
+It also checks that both bodies carry the same rows, and reports which
+encoder serialization.py picked (orjson, or the json fallback).
+"""
+
+import argparse
+import json
+import time
+
+from _common import use_temp_database, load_app, percentile, report
+
+
+def timed(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def fields(samples: list) -> dict:
+    return {"p50_us": round(percentile(samples, 50), 1), "p95_us": round(percentile(samples, 95), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--readings", type=int, default=300)
+    args = parser.parse_args()
+
+    use_temp_database("dashboard_serialization")
+    app_module = load_app()
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+    import database
+    import serialization
+    from alerts import alert_payload, ALERT_PAYLOAD_COLUMNS
+    from database import Alert, User, Vital
+
+    def legacy_rows(db, user_id):
+        vitals = db.query(Vital).filter(Vital.user_id == user_id).order_by(Vital.timestamp.desc()).limit(50).all()
+        alerts = db.query(Alert).filter(Alert.user_id == user_id).order_by(Alert.created_at.desc()).limit(5).all()
+        return {"user": "Grandpa Joe", "vitals": vitals, "alerts": [alert_payload(alert) for alert in alerts]}
+
+    def legacy_body(content) -> bytes:
+        return JSONResponse(jsonable_encoder(content)).body
+
+    def column_rows(db, user_id):
+        vitals = db.execute(select(*app_module.DASHBOARD_VITAL_COLUMNS).where(Vital.user_id == user_id)
+                            .order_by(Vital.timestamp.desc()).limit(50))
+        alerts = db.execute(select(*ALERT_PAYLOAD_COLUMNS).where(Alert.user_id == user_id)
+                            .order_by(Alert.created_at.desc()).limit(5))
+        return {"user": "Grandpa Joe", "vitals": [row._asdict() for row in vitals],
+                "alerts": [row._asdict() for row in alerts]}
+
+    @app_module.app.get("/bench/legacy-dashboard/{username}")
+    def legacy_dashboard(username: str):
+        with database.SessionLocal() as db:
+            user = db.query(User).filter(User.username == username).first()
+            return legacy_rows(db, user.id)
+    # Ahead of the static files mounted at "/"
+    app_module.app.router.routes.insert(0, app_module.app.router.routes.pop())
+
+    with TestClient(app_module.app) as client:
+        client.post("/api/v1/ingest/batch", json=[
+            {"username": "grandpa_joe", "type": vital_type, "value": 150 if i % 40 == 0 else normal, "unit": unit}
+            for i, (vital_type, normal, unit) in enumerate(
+                ([("heart_rate", 72, "bpm"), ("spo2", 97, "%"), ("glucose", 100, "mg/dL")] * args.readings)
+                [:args.readings])]).raise_for_status()
+        deadline = time.monotonic() + 10  # alerts are written by the pipeline's worker
+        while time.monotonic() < deadline:
+            with database.SessionLocal() as db:
+                if db.query(Alert.id).first():
+                    break
+            time.sleep(0.1)
+
+        with database.SessionLocal() as db:
+            user_id = db.query(User.id).filter(User.username == "grandpa_joe").scalar()
+            old, new = legacy_rows(db, user_id), column_rows(db, user_id)
+            old_body, new_body = legacy_body(old), serialization.dumps(new)
+            # Same rows; the old vitals lacked the 'Z' on their timestamps
+            old_json, new_json = json.loads(old_body), json.loads(new_body)
+            for row in old_json["vitals"]:
+                row["timestamp"] += "Z"
+            report("dashboard_payload", encoder="orjson" if serialization.orjson else "json",
+                   vitals=len(new_json["vitals"]), alerts=len(new_json["alerts"]),
+                   bytes_before=len(old_body), bytes_after=len(new_body), same_rows=old_json == new_json)
+
+            # Each request has a fresh session: no identity map to reuse objects from
+            timed(lambda: column_rows(db, user_id), args.repeat)  # warm-up
+            query_old = timed(lambda: (legacy_rows(db, user_id), db.expunge_all()), args.repeat)
+            query_new = timed(lambda: column_rows(db, user_id), args.repeat)
+            serialize_old = timed(lambda: legacy_body(old), args.repeat)
+            serialize_new = timed(lambda: serialization.dumps(new), args.repeat)
+        report("dashboard_query", before=fields(query_old), after=fields(query_new))
+        report("dashboard_serialize", before=fields(serialize_old), after=fields(serialize_new),
+               speedup=round(percentile(serialize_old, 50) / percentile(serialize_new, 50), 1))
+
+        client.get("/api/v1/dashboard/grandpa_joe").raise_for_status()
+        client.get("/bench/legacy-dashboard/grandpa_joe").raise_for_status()
+        endpoint_old = timed(lambda: client.get("/bench/legacy-dashboard/grandpa_joe").raise_for_status(),
+                             args.repeat)
+        endpoint_new = timed(lambda: client.get("/api/v1/dashboard/grandpa_joe").raise_for_status(), args.repeat)
+        report("dashboard_endpoint", before=fields(endpoint_old), after=fields(endpoint_new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: concurrent ingest + dashboard throughput, default vs tuned engine.
+
+    cd backend && python benchmarks/bench_db_concurrency.py --writers 4 --readers 8
+
+For each engine configuration a fresh SQLite file is seeded with history,
+then writer threads post single readings through ingest.store_vitals while
+reader threads call the dashboard handler, for --seconds. "default" is the
+old `create_engine(DATABASE_URL)`; "tuned" is database.make_engine().
+Reports operations per second, p99 latency and "database is locked" errors.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from _common import use_temp_database, load_app, percentile, report
+
+USERS = ["grandpa_joe", "grandma_sue", "uncle_bob", "aunt_may"]
+TYPES = [("heart_rate", "bpm", 60, 110), ("spo2", "%", 90, 100), ("glucose", "mg/dL", 80, 160)]
+
+
+def _reading(rng):
+    from main import VitalInput
+    vital_type, unit, low, high = rng.choice(TYPES)
+    return VitalInput(username=rng.choice(USERS), type=vital_type,
+                      value=float(rng.randint(low, high)), unit=unit)
+
+
+def _prepare(database, engine, history: int):
+    from sqlalchemy.orm import sessionmaker
+    from ingest import store_vitals
+    database.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        for username in USERS:
+            db.add(database.User(username=username, password_hash="x", role="elderly", full_name=username))
+        db.commit()
+        rng = random.Random(1)
+        store_vitals(db, [_reading(rng) for _ in range(history)])
+    return Session
+
+
+def run_mix(app_module, Session, writers: int, readers: int, seconds: float) -> dict:
+    from sqlalchemy.exc import OperationalError
+    from ingest import store_vitals
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"ingest": [], "dashboard": [], "locked": 0, "errors": 0}
+
+    def loop(kind, action, seed):
+        rng = random.Random(seed)
+        latencies = []
+        locked = errors = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    action(db, rng)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except OperationalError as e:
+                if "locked" in str(e):
+                    locked += 1
+                else:
+                    errors += 1
+        with lock:
+            stats[kind].extend(latencies)
+            stats["locked"] += locked
+            stats["errors"] += errors
+
+    def ingest(db, rng):
+        store_vitals(db, [_reading(rng)])
+
+    def dashboard(db, rng):
+        app_module.get_dashboard(rng.choice(USERS), db)
+
+    threads = [threading.Thread(target=loop, args=("ingest", ingest, i)) for i in range(writers)]
+    threads += [threading.Thread(target=loop, args=("dashboard", dashboard, 100 + i)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--history", type=int, default=20000)
+    args = parser.parse_args()
+
+    use_temp_database("db_concurrency")
+    app_module = load_app()
+    import database
+    from sqlalchemy import create_engine
+
+    factories = [
+        ("default", lambda url: create_engine(url)),
+        ("tuned", lambda url: database.make_engine(url)),
+    ]
+    for label, factory in factories:
+        path = os.path.join(tempfile.mkdtemp(prefix="hc-bench-"), f"{label}.db")
+        engine = factory(f"sqlite:///{path}")
+        Session = _prepare(database, engine, args.history)
+        stats = run_mix(app_module, Session, args.writers, args.readers, args.seconds)
+        engine.dispose()
+        report("db_concurrency", engine=label, writers=args.writers, readers=args.readers,
+               ingest_per_s=round(len(stats["ingest"]) / args.seconds, 1),
+               ingest_p99_ms=round(percentile(stats["ingest"], 99), 2),
+               dashboard_per_s=round(len(stats["dashboard"]) / args.seconds, 1),
+               dashboard_p99_ms=round(percentile(stats["dashboard"], 99), 2),
+               locked_errors=stats["locked"], other_errors=stats["errors"])
+
+
+if __name__ == "__main__":
+    main()
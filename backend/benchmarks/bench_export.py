@@ -0,0 +1,76 @@
+"""
+Benchmark: peak memory of the vitals export as history grows.
+
+    cd backend && python benchmarks/bench_export.py --rows 5000000
+
+Loads --rows vitals into a fresh SQLite file, then runs the export CLI
+(export.py) in a child process for each format, once over the first tenth
+of the history and once over all of it, and reads the child's peak RSS
+from wait4(). A flat peak across both sizes means memory does not depend
+on history size. For reference, the old approach (load every Vital ORM
+object, then write) is measured on the small slice only.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from _common import BACKEND_DIR, use_temp_database, load_app, report
+from bench_indexes import load
+
+# bench_indexes.load spaces readings 3 seconds apart from this instant
+HISTORY_START = datetime(2024, 1, 1)
+
+ORM_EXPORT = """
+import csv, sys
+from database import SessionLocal, Vital
+with SessionLocal() as db:
+    rows = db.query(Vital).filter(Vital.timestamp < sys.argv[1]).all()
+    writer = csv.writer(open('/dev/null', 'w'))
+    for v in rows:
+        writer.writerow((v.id, v.user_id, v.timestamp, v.type, v.value, v.unit, v.is_abnormal))
+"""
+
+
+def run_child(args) -> tuple:
+    """(seconds, peak RSS in MiB) of a child process."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable] + args, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"{args} exited with {proc.returncode}")
+    return time.perf_counter() - start, usage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--formats", default="csv,ndjson,parquet,arrow")
+    args = parser.parse_args()
+
+    path = use_temp_database("export")
+    load_app()
+    import database
+    database.Base.metadata.create_all(bind=database.engine)
+    load(path, args.rows, args.users)
+
+    small = args.rows // 10
+    cutoff = (HISTORY_START + timedelta(seconds=small * 3)).isoformat()
+    for fmt in args.formats.split(","):
+        for rows, extra in ((small, ["--to", cutoff]), (args.rows, [])):
+            seconds, peak = run_child(["export.py", "--format", fmt, "-o", os.devnull] + extra)
+            report("export_rss", format=fmt, rows=rows, peak_rss_mib=round(peak, 1),
+                   rows_per_sec=round(rows / seconds))
+
+    seconds, peak = run_child(["-c", ORM_EXPORT, cutoff])
+    report("export_rss", format="orm_all_then_csv", rows=small, peak_rss_mib=round(peak, 1),
+           rows_per_sec=round(small / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark: dashboard and "current status" reads before and after the
+composite indexes and the latest_vitals rollup.
+
+    cd backend && python benchmarks/bench_indexes.py --rows 10000000
+
+Loads --rows vitals (and an alert for a tenth of them) into a fresh SQLite
+file without the new indexes, times the dashboard queries and the old
+latest-per-type window query, then runs database.migrate() (index creation
+plus rollup backfill) and times the same reads again. The SQLite query
+plan is printed for each query in both states.
+"""
+
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from _common import use_temp_database, load_app, report
+
+TYPES = [("heart_rate", "bpm"), ("blood_pressure_sys", "mmHg"), ("blood_pressure_dia", "mmHg"),
+         ("spo2", "%"), ("glucose", "mg/dL"), ("temperature", "°F")]
+
+DASHBOARD_VITALS = "SELECT * FROM vitals WHERE user_id = ? ORDER BY timestamp DESC LIMIT 50"
+DASHBOARD_ALERTS = "SELECT * FROM alerts WHERE user_id = ? ORDER BY created_at DESC LIMIT 5"
+LATEST_FROM_VITALS = """
+SELECT type, value, unit, timestamp, is_abnormal FROM (
+    SELECT type, value, unit, timestamp, is_abnormal,
+           row_number() OVER (PARTITION BY type ORDER BY timestamp DESC, id DESC) AS rank
+    FROM vitals WHERE user_id = ?
+) WHERE rank = 1 ORDER BY timestamp DESC
+"""
+LATEST_FROM_ROLLUP = ("SELECT type, value, unit, timestamp, is_abnormal FROM latest_vitals "
+                      "WHERE user_id = ? ORDER BY timestamp DESC")
+
+
+def load(path: str, rows: int, users: int):
+    rng = random.Random(42)
+    start_time = datetime(2024, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany("INSERT INTO users (id, username, password_hash, role, full_name) VALUES (?, ?, 'x', 'elderly', ?)",
+                     [(i, f"user{i}", f"User {i}") for i in range(1, users + 1)])
+    chunk = 200000
+    for offset in range(0, rows, chunk):
+        vitals, alerts = [], []
+        for i in range(offset, min(rows, offset + chunk)):
+            # Interleaved like real traffic: every user reports throughout the period
+            timestamp = (start_time + timedelta(seconds=i * 3)).strftime("%Y-%m-%d %H:%M:%S.%f")
+            user_id = rng.randint(1, users)
+            vital_type, unit = TYPES[rng.randrange(len(TYPES))]
+            abnormal = rng.random() < 0.1
+            vitals.append((user_id, timestamp, vital_type, rng.uniform(50, 150), unit, abnormal))
+            if abnormal:
+                alerts.append((user_id, timestamp, "medium", f"{vital_type} out of range", False))
+        conn.executemany("INSERT INTO vitals (user_id, timestamp, type, value, unit, is_abnormal) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", vitals)
+        conn.executemany("INSERT INTO alerts (user_id, created_at, severity, message, resolved) "
+                         "VALUES (?, ?, ?, ?, ?)", alerts)
+        conn.commit()
+    conn.close()
+
+
+def time_query(conn, sql: str, user_ids) -> float:
+    """Mean milliseconds per execution over the sampled users."""
+    start = time.perf_counter()
+    for user_id in user_ids:
+        conn.execute(sql, (user_id,)).fetchall()
+    return (time.perf_counter() - start) / len(user_ids) * 1000
+
+
+def plan(conn, sql: str) -> str:
+    return " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, (1,)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--samples-before", type=int, default=5)
+    parser.add_argument("--samples-after", type=int, default=200)
+    args = parser.parse_args()
+
+    path = use_temp_database("indexes")
+    load_app()
+    import database
+    from sqlalchemy import text
+
+    database.Base.metadata.create_all(bind=database.engine)
+    with database.engine.begin() as conn:
+        for name in ("ix_vitals_user_timestamp", "ix_vitals_user_type_timestamp", "ix_alerts_user_created_at"):
+            conn.execute(text(f"DROP INDEX {name}"))
+
+    start = time.perf_counter()
+    load(path, args.rows, args.users)
+    report("indexes_load", rows=args.rows, users=args.users, seconds=round(time.perf_counter() - start, 1))
+
+    rng = random.Random(7)
+    queries = [("dashboard_vitals", DASHBOARD_VITALS), ("dashboard_alerts", DASHBOARD_ALERTS),
+               ("latest_per_type", LATEST_FROM_VITALS)]
+
+    conn = sqlite3.connect(path)
+    sample = [rng.randint(1, args.users) for _ in range(args.samples_before)]
+    before = {name: time_query(conn, sql, sample) for name, sql in queries}
+    for name, sql in queries:
+        report("indexes_plan", state="before", query=name, plan=plan(conn, sql))
+    conn.close()
+
+    start = time.perf_counter()
+    database.migrate(database.engine)
+    report("indexes_migrate", seconds=round(time.perf_counter() - start, 1))
+
+    conn = sqlite3.connect(path)
+    conn.execute("ANALYZE")
+    queries[2] = ("latest_per_type", LATEST_FROM_ROLLUP)
+    sample = [rng.randint(1, args.users) for _ in range(args.samples_after)]
+    for name, sql in queries:
+        report("indexes_plan", state="after", query=name, plan=plan(conn, sql))
+        after = time_query(conn, sql, sample)
+        report("indexes_query", query=name, before_ms=round(before[name], 3), after_ms=round(after, 3),
+               speedup=round(before[name] / after, 1))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: single-reading ingest vs batch ingest (JSON array and NDJSON).
+
+    cd backend && python benchmarks/bench_ingest.py --readings 2000
+
+Reports rows/sec for each path and fails if the batch path is not at least
+--min-speedup times faster than POST /api/v1/ingest.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from _common import use_temp_database, load_app, report
+
+VITAL_TYPES = [
+    ("heart_rate", "bpm", 45, 120),
+    ("spo2", "%", 88, 100),
+    ("blood_pressure_sys", "mmHg", 85, 160),
+    ("blood_pressure_dia", "mmHg", 55, 100),
+]
+
+
+def make_readings(count: int, username: str):
+    rng = random.Random(42)
+    readings = []
+    for _ in range(count):
+        vital_type, unit, low, high = rng.choice(VITAL_TYPES)
+        readings.append({"username": username, "type": vital_type,
+                         "value": round(rng.uniform(low, high), 1), "unit": unit})
+    return readings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readings", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    args = parser.parse_args()
+
+    use_temp_database("ingest")
+    app_module = load_app()
+    from fastapi.testclient import TestClient
+
+    readings = make_readings(args.readings, "grandpa_joe")
+    with TestClient(app_module.app) as client:
+        start = time.perf_counter()
+        for reading in readings:
+            client.post("/api/v1/ingest", json=reading).raise_for_status()
+        single_rate = len(readings) / (time.perf_counter() - start)
+        report("ingest_single", rows_per_sec=round(single_rate, 1))
+
+        start = time.perf_counter()
+        for i in range(0, len(readings), args.batch_size):
+            chunk = readings[i:i + args.batch_size]
+            resp = client.post("/api/v1/ingest/batch", json=chunk)
+            resp.raise_for_status()
+            assert resp.json()["recorded"] == len(chunk)
+        batch_rate = len(readings) / (time.perf_counter() - start)
+        report("ingest_batch_json", rows_per_sec=round(batch_rate, 1),
+               speedup=round(batch_rate / single_rate, 1))
+
+        start = time.perf_counter()
+        for i in range(0, len(readings), args.batch_size):
+            body = "\n".join(json.dumps(r) for r in readings[i:i + args.batch_size])
+            resp = client.post("/api/v1/ingest/batch", content=body,
+                               headers={"Content-Type": "application/x-ndjson"})
+            resp.raise_for_status()
+        ndjson_rate = len(readings) / (time.perf_counter() - start)
+        report("ingest_batch_ndjson", rows_per_sec=round(ndjson_rate, 1),
+               speedup=round(ndjson_rate / single_rate, 1))
+
+    if min(batch_rate, ndjson_rate) < args.min_speedup * single_rate:
+        print(f"FAIL: batch ingest is below {args.min_speedup}x the single-reading rate")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Microbenchmark for the fallback intent classifier.
+
+    cd backend && python benchmarks/bench_intents.py
+
+Reports the per-message cost of HealthAgent._fallback_response and of the
+frozen pre-classifier implementation (tests/legacy_fallback.py) over the
+golden-test corpus. tests/test_intents.py checks that both give the same
+replies.
+"""
+
+import os
+import sys
+import time
+
+from _common import BACKEND_DIR, use_temp_database, load_app, report
+
+sys.path.insert(0, os.path.join(BACKEND_DIR, "tests"))
+from intent_corpus import contexts, corpus  # noqa: E402
+from legacy_fallback import legacy_fallback_response  # noqa: E402
+
+
+def main():
+    use_temp_database("intents")
+    agent = load_app().agent
+    messages = corpus()
+    snapshots = contexts()
+
+    # The legacy path received the text report; the new one the snapshot
+    snapshot = snapshots[3]
+    results = {}
+    for label, fn, context in [("legacy", legacy_fallback_response, snapshot.render()),
+                               ("classifier", agent._fallback_response, snapshot)]:
+        start = time.perf_counter()
+        for _ in range(5):
+            for message in messages:
+                fn(message, context, "Joe Smith")
+        results[label] = (time.perf_counter() - start) / (5 * len(messages)) * 1e6
+    report("intents_per_message", legacy_us=round(results["legacy"], 2),
+           classifier_us=round(results["classifier"], 2),
+           speedup=round(results["legacy"] / results["classifier"], 2))
+
+
+if __name__ == "__main__":
+    main()
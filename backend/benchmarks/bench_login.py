@@ -0,0 +1,101 @@
+"""
+Load test: login throughput and ingest latency during a login storm.
+
+    cd backend && python benchmarks/bench_login.py --clients 50 --seconds 10
+
+The app is served by a real uvicorn server on localhost. --clients
+concurrent clients log in back to back for --seconds while one client
+posts single ingest requests and records their latency. This runs twice:
+against the async /api/v1/auth/login (bcrypt in the password process pool)
+and against a sync handler that verifies inline in the request threadpool
+(the old behaviour, mounted only here). Rate limits are lifted for the run.
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+
+from _common import use_temp_database, load_app, percentile, report
+from bench_chat_load import free_port, measure_ingest
+
+
+async def storm(client, path: str, clients: int, seconds: float) -> tuple:
+    deadline = time.perf_counter() + seconds
+    counts = {"ok": 0, "failed": 0}
+
+    async def one_client():
+        while time.perf_counter() < deadline:
+            try:
+                resp = await client.post(path, json={"username": "grandpa_joe", "password": "password123"})
+                counts["ok" if resp.status_code == 200 else "failed"] += 1
+            except httpx.HTTPError:
+                counts["failed"] += 1
+
+    tasks = [asyncio.create_task(one_client()) for _ in range(clients)]
+    await asyncio.sleep(0.5)  # let the storm build up first
+    latencies = await measure_ingest(client, seconds - 1.0)
+    await asyncio.gather(*tasks)
+    return latencies, counts
+
+
+async def run(args, base_url: str):
+    limits = httpx.Limits(max_connections=args.clients + 20)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await client.post("/api/v1/auth/login", json={"username": "grandpa_joe", "password": "password123"})
+
+        baseline = await measure_ingest(client, 3)
+        report("ingest_idle", p50_ms=round(percentile(baseline, 50), 2),
+               p99_ms=round(percentile(baseline, 99), 2), samples=len(baseline))
+
+        for label, path in [("async_pool", "/api/v1/auth/login"), ("sync_inline", "/bench/login_sync")]:
+            started = time.perf_counter()
+            latencies, counts = await storm(client, path, args.clients, args.seconds)
+            elapsed = time.perf_counter() - started
+            report("login_storm", handler=label, clients=args.clients,
+                   logins_per_sec=round(counts["ok"] / elapsed, 2), failed_logins=counts["failed"],
+                   ingest_p50_ms=round(percentile(latencies, 50), 2),
+                   ingest_p99_ms=round(percentile(latencies, 99), 2), ingest_samples=len(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOGIN_USERNAME_LIMIT", "1000000000")
+    os.environ.setdefault("LOGIN_IP_LIMIT", "1000000000")
+    use_temp_database("login")
+    app_module = load_app()
+    import uvicorn
+    from fastapi import Depends, HTTPException
+    from passwords import pwd_context
+
+    # The old blocking handler, for comparison only
+    @app_module.app.post("/bench/login_sync")
+    def login_sync(request: app_module.LoginRequest, db=Depends(app_module.get_db)):
+        user = db.query(app_module.User).filter(app_module.User.username == request.username).first()
+        if not user or not pwd_context.verify(request.password, user.password_hash):
+            raise HTTPException(status_code=401, detail="Invalid username or password")
+        return {"username": user.username}
+    app_module.app.router.routes.insert(0, app_module.app.router.routes.pop())
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
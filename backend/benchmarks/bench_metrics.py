@@ -0,0 +1,74 @@
+"""
+Benchmark: overhead of metrics and tracing on POST /api/v1/ingest.
+
+    cd backend && python benchmarks/bench_metrics.py --rounds 12 --requests 300
+
+Runs --rounds rounds of --requests single-reading ingests in each mode,
+interleaved (off, on, traced, off, on, ...) so drift in the machine or the
+growing database hits every mode alike, and reports the median per-request
+time of each mode:
+  - off: metrics disabled (registry.enabled = False)
+  - on: the production default (counters, histograms, DB events)
+  - traced: on, plus TRACE_REQUESTS (Server-Timing header per request)
+
+Exits with status 1 if "on" costs more than --max-overhead percent.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from _common import use_temp_database, load_app, report
+from bench_ingest import make_readings
+
+MODES = ("off", "on", "traced")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--max-overhead", type=float, default=2.0)
+    args = parser.parse_args()
+
+    use_temp_database("metrics")
+    app_module = load_app()
+    import metrics
+    from fastapi.testclient import TestClient
+
+    readings = make_readings(args.requests, "grandpa_joe")
+    timings = {mode: [] for mode in MODES}
+    with TestClient(app_module.app) as client:
+        for reading in readings[:50]:  # warm caches and the connection pool
+            client.post("/api/v1/ingest", json=reading).raise_for_status()
+        for _ in range(args.rounds):
+            for mode in MODES:
+                metrics.registry.enabled = mode != "off"
+                metrics.TRACE_REQUESTS = mode == "traced"
+                start = time.perf_counter()
+                for reading in readings:
+                    client.post("/api/v1/ingest", json=reading).raise_for_status()
+                timings[mode].append((time.perf_counter() - start) / len(readings))
+        metrics.registry.enabled = metrics.TRACE_REQUESTS = True
+        traced = client.post("/api/v1/ingest", json=readings[0])
+        metrics.TRACE_REQUESTS = False
+        scrape = client.get("/metrics").text
+
+    off = statistics.median(timings["off"])
+    results = {mode: statistics.median(samples) for mode, samples in timings.items()}
+    for mode, seconds in results.items():
+        report("metrics_overhead", mode=mode, rounds=args.rounds, requests=args.requests,
+               us_per_request=round(seconds * 1e6, 1), overhead_pct=round((seconds / off - 1) * 100, 2))
+    report("metrics_scrape", bytes=len(scrape), series=sum(1 for line in scrape.splitlines()
+                                                           if line and not line.startswith("#")),
+           server_timing=traced.headers.get("server-timing"))
+
+    overhead = (results["on"] / off - 1) * 100
+    if overhead > args.max_overhead:
+        print(f"FAIL: metrics add {overhead:.2f}% to ingest (budget {args.max_overhead}%)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: retention pass on a history that outgrew the raw window.
+
+    cd backend && python benchmarks/bench_retention.py --patients 100 --days 40
+
+Generates --days of synthetic history (synthetic.py) so that everything
+older than RETENTION_RAW_DAYS (30) is due, then reports:
+  - ingest_idle: single-reading ingest latency with nothing else running
+  - retention_pass: rows removed, seconds, and ingest latency (p50/p99/max)
+    measured from another thread while the batched pass runs
+  - single_delete: the same while one unbatched DELETE removes the same
+    rows, as a plain cleanup query would (on a second copy of the data)
+  - file size of the SQLite database before and after the pass, and a check
+    that the 1-hour rollups still cover the removed history
+"""
+
+import argparse
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from _common import use_temp_database, load_app, percentile, report
+from synthetic import PROFILES, generate, patient_name
+
+
+def ingest_latencies(store_vitals, session_factory, stop: threading.Event, patients: int) -> list:
+    latencies = []
+    index = 0
+    while not stop.is_set():
+        reading = SimpleNamespace(username=patient_name(index % patients), type="heart_rate",
+                                  value=72.0, unit=PROFILES["heart_rate"][0], timestamp=None)
+        start = time.perf_counter()
+        with session_factory() as db:
+            store_vitals(db, [reading])
+        latencies.append((time.perf_counter() - start) * 1000)
+        index += 1
+        time.sleep(0.005)
+    return latencies
+
+
+def during(work, store_vitals, session_factory, patients: int) -> tuple:
+    """Run `work()` while measuring ingest latency. Returns (result, seconds, latencies)."""
+    stop = threading.Event()
+    box = {}
+    thread = threading.Thread(target=lambda: box.update(
+        latencies=ingest_latencies(store_vitals, session_factory, stop, patients)))
+    thread.start()
+    time.sleep(0.5)
+    start = time.perf_counter()
+    result = work()
+    elapsed = time.perf_counter() - start
+    time.sleep(0.2)
+    stop.set()
+    thread.join()
+    return result, elapsed, box["latencies"]
+
+
+def latency_fields(latencies: list) -> dict:
+    return {"ingest_p50_ms": round(percentile(latencies, 50), 2), "ingest_p99_ms": round(percentile(latencies, 99), 2),
+            "ingest_max_ms": round(max(latencies), 1), "ingest_samples": len(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--days", type=float, default=40)
+    parser.add_argument("--interval-minutes", type=float, default=30)
+    args = parser.parse_args()
+
+    path = use_temp_database("retention")
+    load_app()
+    import database
+    from sqlalchemy import delete, func, select
+    from database import Vital, VitalRollup
+    from ingest import store_vitals
+    from retention import RetentionJob
+
+    database.init_db()
+    with database.SessionLocal() as db:
+        created = generate(db, args.patients, args.days, args.interval_minutes)
+    report("retention_data", **created, raw_days=30)
+    database.engine.dispose()
+    copy = path.replace("retention.db", "retention_copy.db")
+    shutil.copyfile(path, copy)
+    size_before = os.path.getsize(path)
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=30)
+    with database.SessionLocal() as db:
+        hourly_before = db.execute(select(func.sum(VitalRollup.count))
+                                   .where(VitalRollup.bucket == "1h", VitalRollup.bucket_start < cutoff)).scalar()
+
+    _, _, idle = during(lambda: time.sleep(3), store_vitals, database.SessionLocal, args.patients)
+    report("ingest_idle", **latency_fields(idle))
+
+    job = RetentionJob(raw_days=30, rollup_days={"1m": 30, "1h": 730, "1d": 0})
+    result, elapsed, latencies = during(lambda: job.run_once(now), store_vitals, database.SessionLocal,
+                                        args.patients)
+    report("retention_pass", seconds=round(elapsed, 2), vitals_deleted=result["vitals"],
+           rollups_deleted=result["rollups"], pages_released=result["pages_released"],
+           vitals_per_sec=round(result["vitals"] / elapsed), **latency_fields(latencies))
+
+    with database.SessionLocal() as db:
+        remaining = db.execute(select(func.count()).select_from(Vital).where(Vital.timestamp < cutoff)).scalar()
+        hourly_after = db.execute(select(func.sum(VitalRollup.count))
+                                  .where(VitalRollup.bucket == "1h", VitalRollup.bucket_start < cutoff)).scalar()
+    database.engine.dispose()
+    report("retention_result", expired_rows_left=remaining, hourly_rollups_intact=hourly_before == hourly_after,
+           file_mb_before=round(size_before / 1e6, 1), file_mb_after=round(os.path.getsize(path) / 1e6, 1))
+
+    # The same cleanup as one statement, on the untouched copy
+    database.engine = database.make_engine(f"sqlite:///{copy}")
+    database.SessionLocal.configure(bind=database.engine)
+
+    def single_delete():
+        with database.SessionLocal() as db:
+            rows = db.execute(delete(Vital).where(Vital.timestamp < cutoff)).rowcount
+            db.commit()
+        return rows
+
+    rows, elapsed, latencies = during(single_delete, store_vitals, database.SessionLocal, args.patients)
+    report("single_delete", seconds=round(elapsed, 2), vitals_deleted=rows, **latency_fields(latencies))
+
+
+if __name__ == "__main__":
+    main()
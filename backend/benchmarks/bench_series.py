@@ -0,0 +1,96 @@
+"""
+Benchmark: a 90-day trend chart from raw vitals vs the vital_rollups table.
+
+    cd backend && python benchmarks/bench_series.py --days 90 --interval 5
+
+Ingests one heart-rate reading every --interval seconds for --days through
+ingest.store_vitals (so the rollups are maintained exactly as in
+production), then times three ways of drawing a daily chart:
+
+-   fetch_raw: pull every reading in the window (the only option before
+    the series API) and aggregate in Python.
+-   group_raw: GROUP BY day over the raw rows in SQL.
+-   series_1d: GET /api/v1/vitals/{username}/series?bucket=1d.
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from _common import use_temp_database, load_app, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--interval", type=int, default=5, help="seconds between readings")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    use_temp_database("series")
+    app_module = load_app()
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+    import database
+    from database import Vital
+    from ingest import store_vitals
+
+    with TestClient(app_module.app) as client:
+        start = datetime(2026, 1, 1)
+        end = start + timedelta(days=args.days)
+        total = args.days * 86400 // args.interval
+        load_start = time.perf_counter()
+        with database.SessionLocal() as db:
+            for offset in range(0, total, 10000):
+                store_vitals(db, [
+                    app_module.VitalInput(username="grandpa_joe", type="heart_rate", unit="bpm",
+                                          value=60.0 + i % 40, timestamp=start + timedelta(seconds=i * args.interval))
+                    for i in range(offset, min(total, offset + 10000))
+                ])
+        load_seconds = time.perf_counter() - load_start
+        with database.SessionLocal() as db:
+            user_id = db.query(database.User.id).filter(database.User.username == "grandpa_joe").scalar()
+            rollup_rows = db.query(database.VitalRollup).count()
+        report("series_load", readings=total, rollup_rows=rollup_rows,
+               rows_per_sec=round(total / load_seconds, 1))
+
+        def fetch_raw():
+            with database.SessionLocal() as db:
+                days = {}
+                for timestamp, value in db.execute(
+                    select(Vital.timestamp, Vital.value)
+                    .where(Vital.user_id == user_id, Vital.type == "heart_rate",
+                           Vital.timestamp >= start, Vital.timestamp < end)
+                ):
+                    days.setdefault(timestamp.date(), []).append(value)
+                return len(days)
+
+        def group_raw():
+            with database.SessionLocal() as db:
+                day = func.date(Vital.timestamp)
+                return len(db.execute(
+                    select(day, func.min(Vital.value), func.max(Vital.value), func.avg(Vital.value), func.count())
+                    .where(Vital.user_id == user_id, Vital.type == "heart_rate",
+                           Vital.timestamp >= start, Vital.timestamp < end)
+                    .group_by(day)
+                ).all())
+
+        def series_1d():
+            resp = client.get("/api/v1/vitals/grandpa_joe/series", params={
+                "type": "heart_rate", "from": start.isoformat(), "to": end.isoformat(), "bucket": "1d"})
+            resp.raise_for_status()
+            return len(resp.json()["points"])
+
+        results = {}
+        for label, fn in [("fetch_raw", fetch_raw), ("group_raw", group_raw), ("series_1d", series_1d)]:
+            points = fn()
+            began = time.perf_counter()
+            for _ in range(args.repeat):
+                fn()
+            results[label] = (time.perf_counter() - began) / args.repeat * 1000
+            report("series_chart", method=label, days=args.days, points=points, ms=round(results[label], 2),
+                   speedup_vs_fetch_raw=round(results["fetch_raw"] / results[label], 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark and budget check: cold start of the API.
+
+    cd backend && python benchmarks/bench_startup.py --budget-ms 900
+
+For --runs fresh interpreters it measures:
+  - import: `python -X importtime -c "import main"`, the cumulative time of
+    main and the slowest modules it pulls in directly
+  - first_response: launching uvicorn until GET /api/v1/stream/metrics
+    answers (import + startup hook + first request), on an empty database
+
+Medians are reported. The script exits with status 1 if the median import
+time is over --budget-ms, or if `import main` loads any module that must
+stay lazy (the Gemini SDK and friends, pyarrow, numpy), so it can gate CI.
+tests/test_startup.py checks the lazy modules alone, without timing.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from _common import BACKEND_DIR, report
+from bench_chat_load import free_port
+
+# Imported on first use only; `import main` must not load these
+LAZY_MODULES = ("google.generativeai", "google.cloud.aiplatform", "litellm", "pyarrow", "numpy")
+
+
+def fresh_env() -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="hc-bench-"), "startup.db")
+    return env
+
+
+def import_profile() -> tuple:
+    """(cumulative ms of main, {module: cumulative ms} for its direct imports, all imported modules)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+                            env=fresh_env(), capture_output=True, text=True, check=True)
+    total, children, modules = None, {}, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        module = name.strip()
+        modules.add(module)
+        depth = (len(name) - len(name.lstrip())) // 2
+        if module == "main" and depth == 0:
+            total = int(cumulative) / 1000
+        elif depth == 1:
+            children[module] = int(cumulative) / 1000
+    return total, children, modules
+
+
+def first_response_seconds() -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=fresh_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/api/v1/stream/metrics", timeout=5).raise_for_status()
+                return time.perf_counter() - started
+            except httpx.HTTPError:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=900)
+    args = parser.parse_args()
+
+    import_profile()  # compile bytecode once so later runs measure imports only
+    totals, slowest, loaded = [], {}, set()
+    for _ in range(args.runs):
+        total, children, modules = import_profile()
+        totals.append(total)
+        loaded |= modules
+        for module, ms in children.items():
+            slowest.setdefault(module, []).append(ms)
+    top = sorted(((statistics.median(ms), module) for module, ms in slowest.items()), reverse=True)[:8]
+    eager = sorted(name for name in LAZY_MODULES if name in loaded)
+    import_ms = statistics.median(totals)
+    report("startup_import", runs=args.runs, import_main_ms=round(import_ms, 1),
+           slowest={module: round(ms, 1) for ms, module in top}, eagerly_imported=eager)
+
+    first = [first_response_seconds() for _ in range(args.runs)]
+    report("startup_first_response", runs=args.runs, first_response_ms=round(statistics.median(first) * 1000, 1))
+
+    within_budget = import_ms <= args.budget_ms and not eager
+    report("startup_budget", budget_ms=args.budget_ms, import_main_ms=round(import_ms, 1), ok=within_budget)
+    if not within_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Synthetic patients, caregivers and vital histories for the benchmark suite.
+
+    cd backend && python benchmarks/synthetic.py --patients 200 --days 7
+
+Each patient gets a personal baseline per vital type and a reading every
+--interval-minutes for the last --days days, with occasional excursions so
+a few percent of readings cross the default thresholds. Vitals are
+bulk-inserted, then latest_vitals and vital_rollups are built the way
+ingest maintains them, and open/resolved alert episodes are derived from
+the abnormal readings. Every account uses seed.DEMO_PASSWORD.
+
+Generation is deterministic for a given --seed and works on any database
+the app supports (DATABASE_URL); the target must not have users yet.
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from _common import BACKEND_DIR, report
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# type -> (unit, population mean, spread of personal means, reading noise, decimals)
+PROFILES = {
+    "heart_rate": ("bpm", 74, 7, 5, 0),
+    "blood_pressure_sys": ("mmHg", 124, 8, 6, 0),
+    "blood_pressure_dia": ("mmHg", 79, 5, 4, 0),
+    "spo2": ("%", 97, 0.8, 0.6, 1),
+    "glucose": ("mg/dL", 104, 8, 8, 0),
+    "temperature": ("°F", 98.2, 0.3, 0.25, 1),
+}
+EXCURSION_RATE = 0.01  # share of readings that start a short excursion
+EXCURSION_READINGS = 4
+PATIENTS_PER_CAREGIVER = 25
+INSERT_CHUNK = 20000
+
+# name -> (patients, days); --patients / --days override
+SCALES = {
+    "small": (50, 2),
+    "medium": (200, 7),
+    "large": (1000, 14),
+}
+
+
+def patient_name(index: int) -> str:
+    return f"patient_{index:05d}"
+
+
+def caregiver_name(index: int) -> str:
+    return f"caregiver_{index:04d}"
+
+
+def vital_series(rng: random.Random, vital_type: str, start: datetime, count: int, interval: timedelta):
+    """(timestamp, value) pairs for one patient and type."""
+    unit, mean, spread, noise, decimals = PROFILES[vital_type]
+    personal = rng.gauss(mean, spread)
+    excursion_left, excursion_shift = 0, 0.0
+    for step in range(count):
+        if excursion_left == 0 and rng.random() < EXCURSION_RATE:
+            direction = -1 if vital_type == "spo2" else rng.choice((-1, 1, 1))
+            excursion_left, excursion_shift = EXCURSION_READINGS, direction * 4 * (spread + noise)
+        shift = excursion_shift if excursion_left else 0.0
+        excursion_left = max(0, excursion_left - 1)
+        value = personal + shift + rng.gauss(0, noise)
+        if vital_type == "spo2":
+            value = min(100.0, value)
+        yield start + step * interval, round(value, decimals)
+
+
+def generate(db, patients: int, days: float, interval_minutes: float = 15, seed: int = 7,
+             vital_types=tuple(PROFILES)) -> dict:
+    """Fill an empty database. Returns counts of what was created."""
+    from sqlalchemy import insert
+    from database import Alert, CaregiverPatient, User, Vital
+    from rollups import backfill_vital_rollups, upsert_latest_vitals
+    from seed import DEMO_PASSWORD_HASH
+    from thresholds import threshold_engine
+
+    if db.query(User.id).first() is not None:
+        raise RuntimeError("the target database already has users")
+    rng = random.Random(seed)
+    caregivers = max(1, -(-patients // PATIENTS_PER_CAREGIVER))
+    db.execute(insert(User), [
+        {"username": patient_name(i), "password_hash": DEMO_PASSWORD_HASH, "role": "elderly",
+         "full_name": f"Patient {i}"} for i in range(patients)] + [
+        {"username": caregiver_name(i), "password_hash": DEMO_PASSWORD_HASH, "role": "caregiver",
+         "full_name": f"Caregiver {i}"} for i in range(caregivers)])
+    ids = dict(db.query(User.username, User.id))
+    patient_ids = [ids[patient_name(i)] for i in range(patients)]
+    db.execute(insert(CaregiverPatient), [
+        {"caregiver_id": ids[caregiver_name(i // PATIENTS_PER_CAREGIVER)], "patient_id": patient_id}
+        for i, patient_id in enumerate(patient_ids)])
+
+    interval = timedelta(minutes=interval_minutes)
+    count = int(days * 24 * 60 / interval_minutes)
+    start = datetime.utcnow().replace(microsecond=0) - count * interval
+    vitals = 0
+    alerts = []
+    for user_id in patient_ids:
+        rows = []
+        for vital_type in vital_types:
+            unit = PROFILES[vital_type][0]
+            rows.extend({"user_id": user_id, "type": vital_type, "value": value, "unit": unit,
+                         "timestamp": timestamp}
+                        for timestamp, value in vital_series(rng, vital_type, start, count, interval))
+        checks = threshold_engine.evaluate_batch(db, [user_id] * len(rows), [r["type"] for r in rows],
+                                                 [r["value"] for r in rows])
+        open_episodes = {}
+        for row, (is_abnormal, message) in zip(rows, checks):
+            row["is_abnormal"] = is_abnormal
+            episode = open_episodes.get(row["type"])
+            if is_abnormal and episode is None:
+                open_episodes[row["type"]] = {
+                    "user_id": user_id, "vital_type": row["type"], "severity": "medium", "message": message,
+                    "created_at": row["timestamp"], "last_seen_at": row["timestamp"], "occurrences": 1,
+                    "resolved": False, "resolved_at": None}
+            elif is_abnormal:
+                episode["last_seen_at"] = row["timestamp"]
+                episode["occurrences"] += 1
+            elif episode is not None:
+                episode.update(resolved=True, resolved_at=row["timestamp"])
+                alerts.append(open_episodes.pop(row["type"]))
+        alerts.extend(open_episodes.values())
+        for offset in range(0, len(rows), INSERT_CHUNK):
+            db.execute(insert(Vital), rows[offset:offset + INSERT_CHUNK])
+        upsert_latest_vitals(db, rows)
+        vitals += len(rows)
+    for offset in range(0, len(alerts), INSERT_CHUNK):
+        db.execute(insert(Alert), alerts[offset:offset + INSERT_CHUNK])
+    db.commit()
+    backfill_vital_rollups(db.get_bind())
+    return {"patients": patients, "caregivers": caregivers, "vitals": vitals, "alerts": len(alerts)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=SCALES, default="medium")
+    parser.add_argument("--patients", type=int)
+    parser.add_argument("--days", type=float)
+    parser.add_argument("--interval-minutes", type=float, default=15)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    patients, days = SCALES[args.scale]
+
+    import database
+    database.init_db()
+    start = time.perf_counter()
+    with database.SessionLocal() as db:
+        created = generate(db, args.patients or patients, args.days or days, args.interval_minutes, args.seed)
+    report("synthetic_data", seconds=round(time.perf_counter() - start, 1), **created)
+
+
+if __name__ == "__main__":
+    main()
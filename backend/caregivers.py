@@ -0,0 +1,135 @@
+"""
+COMPONENT: Caregiver Overview
+
+Everything a caregiver's overview page needs for a page of assigned
+patients, in a fixed number of queries however many patients are on it:
+
+1.  the page of patients (keyset pagination on username),
+2.  a version query over their latest_vitals and open alerts,
+3.  their latest_vitals rows (the rollup maintained by ingest),
+4.  their newest open alerts plus a per-patient count (window functions).
+
+The version query feeds the ETag. A request whose If-None-Match still
+matches stops after query 2 and gets 304 Not Modified.
+It returns each latest_vitals row's (patient, type, timestamp, value,
+unit, abnormal flag) and each open alert's (patient, id, severity, last
+seen, occurrences), and the ETag hashes those rows with full-precision
+timestamps, so any visible change (a newer reading, a reading replaced at
+the same timestamp, an alert created, escalated, seen again or resolved)
+changes the ETag.
+"""
+
+import hashlib
+from sqlalchemy import false, func, null, select, union_all
+from sqlalchemy.orm import Session
+from database import Alert, CaregiverPatient, LatestVital, User
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Newest open alerts listed per patient (the total count is always returned)
+ALERTS_PER_PATIENT = 3
+
+
+def patient_page(db: Session, caregiver_id: int, after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> tuple:
+    """([(user_id, username, full_name), ...], next_cursor) ordered by username."""
+    query = (
+        select(User.id.label("user_id"), User.username, User.full_name)
+        .join(CaregiverPatient, CaregiverPatient.patient_id == User.id)
+        .where(CaregiverPatient.caregiver_id == caregiver_id)
+        .order_by(User.username)
+        .limit(limit + 1)
+    )
+    if after:
+        query = query.where(User.username > after)
+    rows = db.execute(query).all()
+    next_cursor = rows[limit - 1].username if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def overview_etag(db: Session, caregiver_id: int, patients: list, next_cursor) -> str:
+    """Weak ETag for a page: the page itself plus one version query."""
+    user_ids = [p.user_id for p in patients]
+    version = []
+    if user_ids:
+        # Ingest replaces the latest reading on an equal timestamp too
+        vitals = select(LatestVital.user_id, null().label("id"), LatestVital.type.label("state"),
+                        LatestVital.timestamp.label("seen_at"), null().label("occurrences"),
+                        LatestVital.value.label("value"), LatestVital.unit.label("unit"),
+                        LatestVital.is_abnormal.label("is_abnormal")) \
+            .where(LatestVital.user_id.in_(user_ids))
+        alerts = select(Alert.user_id, Alert.id, Alert.severity, func.coalesce(Alert.last_seen_at, Alert.created_at),
+                        Alert.occurrences, null(), null(), null()) \
+            .where(Alert.user_id.in_(user_ids), Alert.resolved == false())
+        rows = union_all(vitals, alerts).subquery()
+        version = [tuple(row) for row in db.execute(
+            select(rows).order_by(rows.c.user_id, rows.c.id, rows.c.state))]
+    digest = hashlib.blake2b(
+        repr((caregiver_id, [tuple(p) for p in patients], next_cursor, version)).encode(),
+        digest_size=12,
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def latest_vitals_by_patient(db: Session, user_ids: list) -> dict:
+    """{user_id: {type: {value, unit, timestamp, is_abnormal}}}"""
+    latest = {}
+    rows = db.execute(
+        select(LatestVital.user_id, LatestVital.type, LatestVital.value, LatestVital.unit,
+               LatestVital.timestamp, LatestVital.is_abnormal)
+        .where(LatestVital.user_id.in_(user_ids))
+    )
+    for row in rows:
+        latest.setdefault(row.user_id, {})[row.type] = {
+            "value": row.value,
+            "unit": row.unit,
+            "timestamp": row.timestamp.isoformat() + 'Z',
+            "is_abnormal": row.is_abnormal,
+        }
+    return latest
+
+
+def open_alerts_by_patient(db: Session, user_ids: list, per_patient: int = ALERTS_PER_PATIENT) -> dict:
+    """{user_id: (open_count, [newest open alerts])}"""
+    ranked = (
+        select(
+            Alert.user_id, Alert.id, Alert.vital_type, Alert.message, Alert.severity, Alert.created_at,
+            Alert.last_seen_at, Alert.occurrences,
+            func.row_number().over(
+                partition_by=Alert.user_id, order_by=(Alert.created_at.desc(), Alert.id.desc())
+            ).label("rank"),
+            func.count().over(partition_by=Alert.user_id).label("open_count"),
+        )
+        .where(Alert.user_id.in_(user_ids), Alert.resolved == false())
+        .subquery()
+    )
+    alerts = {}
+    for row in db.execute(select(ranked).where(ranked.c.rank <= per_patient).order_by(ranked.c.rank)):
+        count, items = alerts.setdefault(row.user_id, (row.open_count, []))
+        last_seen = row.last_seen_at or row.created_at
+        items.append({
+            "id": row.id,
+            "vital_type": row.vital_type,
+            "message": row.message,
+            "severity": row.severity,
+            "created_at": row.created_at.isoformat() + 'Z' if row.created_at else None,
+            "last_seen_at": last_seen.isoformat() + 'Z' if last_seen else None,
+            "occurrences": row.occurrences or 1,
+        })
+    return alerts
+
+
+def build_overview(db: Session, patients: list) -> list:
+    user_ids = [p.user_id for p in patients]
+    latest = latest_vitals_by_patient(db, user_ids) if user_ids else {}
+    alerts = open_alerts_by_patient(db, user_ids) if user_ids else {}
+    overview = []
+    for patient in patients:
+        open_count, open_alerts = alerts.get(patient.user_id, (0, []))
+        overview.append({
+            "username": patient.username,
+            "full_name": patient.full_name,
+            "latest_vitals": latest.get(patient.user_id, {}),
+            "open_alert_count": open_count,
+            "open_alerts": open_alerts,
+        })
+    return overview
@@ -0,0 +1,177 @@
+"""
+COMPONENT: Chat Response Cache
+
+Caches Gemini replies keyed on (username, normalized message, fingerprint of
+the vitals snapshot). Entries expire after a TTL and the least recently used
+entry is evicted when the cache is full. Concurrent identical requests share
+one upstream call (single-flight). Ingest calls invalidate_user() so a new
+reading drops that user's cached answers immediately; the context
+fingerprint in the key covers requests that were already in flight.
+
+When workers share state (CLUSTER_BACKEND, cluster.py), replies are also
+written to the shared cache, and a local miss looks there before calling
+Gemini, so a question answered by one worker is not paid for again by the
+others. The key includes the vitals fingerprint, so a reading ingested on
+another worker changes the key instead of needing an invalidation.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from cluster import cluster
+
+logger = logging.getLogger(__name__)
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_message(message: str) -> str:
+    """'Is my Blood Pressure normal??' and 'is my blood pressure normal' share a key."""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", message.strip().lower()))
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600.0, shared=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared  # second tier with cache_get/cache_set (cluster.Cluster), or None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, response, upstream_seconds)
+        self._inflight = {}             # key -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.shared_hits = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(username: str, message: str, context_fingerprint) -> tuple:
+        return (username, normalize_message(message), context_fingerprint)
+
+    def get(self, key: tuple):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[1]
+
+    def put(self, key: tuple, response: str, upstream_seconds: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response, upstream_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # --- Shared tier (runs in the default executor: the backend may be a database) ---
+    @staticmethod
+    def shared_key(key: tuple) -> str:
+        return "chat:" + hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def _shared_get(self, key: tuple):
+        try:
+            value = self.shared.cache_get(self.shared_key(key))
+        except Exception as e:
+            logger.error("Shared chat cache read failed: %s", e)
+            return None
+        if value is None:
+            return None
+        response, upstream_seconds = json.loads(value)
+        with self._lock:
+            self.shared_hits += 1
+            self.saved_seconds += upstream_seconds
+        self.put(key, response, upstream_seconds)
+        return response
+
+    def _shared_put(self, key: tuple, response: str, upstream_seconds: float):
+        try:
+            self.shared.cache_set(self.shared_key(key), json.dumps([response, upstream_seconds]), self.ttl_seconds)
+        except Exception as e:
+            logger.error("Shared chat cache write failed: %s", e)
+
+    def invalidate_user(self, username: str):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == username]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    async def get_or_call(self, key: tuple, call):
+        """Return the cached response or await `call()` (a coroutine function).
+        Only one upstream call per key runs at a time; concurrent callers
+        wait for it. Failures are not cached and propagate to every waiter."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            if self.shared is not None:
+                response = await loop.run_in_executor(None, self._shared_get, key)
+                if response is not None:
+                    future.set_result(response)
+                    return response
+            started = time.monotonic()
+            response = await call()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                # The leading request went away; waiters fail over instead of being cancelled
+                e = RuntimeError("Upstream call was cancelled")
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        else:
+            upstream_seconds = time.monotonic() - started
+            self.put(key, response, upstream_seconds)
+            if self.shared is not None:
+                loop.run_in_executor(None, self._shared_put, key, response, upstream_seconds)  # not awaited
+            future.set_result(response)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+# Singleton instance
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CHAT_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("CHAT_CACHE_TTL_SECONDS", "600")),
+    shared=cluster if cluster.shared else None,
+)
@@ -0,0 +1,448 @@
+"""
+COMPONENT: Cluster Coordination
+
+Lets several workers (uvicorn --workers / WEB_CONCURRENCY, or several Cloud
+Run instances) serve one database without duplicating work or serving
+stale caches:
+
+-   Shared cache: short strings with a TTL that every worker can read (the
+    chat response cache uses it as a second tier, chat_cache.py).
+-   Broadcast: broadcast(channel, **fields) runs the channel's handler in
+    this worker right away and in every other worker a poll interval later.
+    The caches invalidated on writes (identity.py, thresholds.py) and the
+    dashboard streams (pubsub.py, PUBSUB_BACKEND=cluster) go through it.
+-   Leases: a named lock that expires unless renewed. The "leader" lease
+    decides which worker runs the periodic jobs (retention, the alert
+    resolution sweep); startup() holds the "startup" lease while it creates
+    tables and seeds, so workers starting together take turns.
+
+The backend is chosen with CLUSTER_BACKEND:
+-   local (default): the stand-in for a single worker. Nothing is shared,
+    broadcasts only run here and this worker is always the leader, which is
+    how the app behaved before.
+-   database: the cluster_cache, cluster_events and cluster_leases tables in
+    the app's database, so it works across processes sharing a SQLite file
+    and across nodes sharing PostgreSQL. Broadcasts are written by a
+    background thread (callers never wait for them) and read by every worker
+    each CLUSTER_POLL_SECONDS.
+
+The leader holds its lease for CLUSTER_LEASE_SECONDS and renews it every
+third of that. A leader that stops renewing (crash, lost database) steps
+down, and another worker takes over once the lease has expired; a worker
+that shuts down releases it at once. Expiry is compared across the
+workers' clocks, which are assumed to agree to within a few seconds.
+"""
+
+import json
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+import database
+from database import ClusterCacheEntry, ClusterEvent, ClusterLease, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = float(os.getenv("CLUSTER_POLL_SECONDS", "0.2"))
+LEASE_SECONDS = float(os.getenv("CLUSTER_LEASE_SECONDS", "15"))
+STARTUP_LEASE_SECONDS = 120.0  # longest init_db() + seeding expected
+LEADER_LEASE = "leader"
+EVENT_RETAIN_SECONDS = 60.0  # broadcasts kept for workers that fall behind
+# PostgreSQL may commit a lower event id after a higher one; a missing id is
+# waited for this long before it is taken for a rolled-back transaction
+GAP_SECONDS = 2.0
+POLL_BATCH = 1000
+_PENDING = "cluster_broadcasts"  # Session.info key, see broadcast_after_commit()
+
+
+class LocalBackend:
+    """Single-process stand-in: dicts with expiry for the cache and leases."""
+    name = "local"
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}   # key -> (expires_at, value)
+        self._leases = {}  # name -> (holder, expires_at)
+
+    def ensure_tables(self):
+        pass
+
+    def cache_get(self, key: str):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._cache.pop(key, None)
+                return None
+            return entry[1]
+
+    def cache_set(self, key: str, value: str, ttl_seconds: float):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl_seconds, value)
+
+    def acquire(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current[0] != holder and current[1] > now:
+                return False
+            self._leases[name] = (holder, now + ttl_seconds)
+            return True
+
+    def release(self, name: str, holder: str):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == holder:
+                del self._leases[name]
+
+    def publish(self, origin: str, messages: list):
+        pass  # no other workers
+
+    def poll(self) -> list:
+        return []
+
+    def prune(self):
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, (expires_at, _) in self._cache.items() if expires_at < now]:
+                del self._cache[key]
+
+
+class DatabaseBackend:
+    name = "database"
+    shared = True
+
+    def __init__(self):
+        self._cursor = None    # every event up to this id has been handled
+        self._high = 0         # highest event id handled
+        self._gaps = {}        # missing event id -> monotonic time it was noticed
+        self._handled = set()  # handled ids above the cursor
+
+    def ensure_tables(self):
+        # Workers starting together race to create them; the losers retry
+        # and find the tables there
+        tables = [ClusterCacheEntry.__table__, ClusterEvent.__table__, ClusterLease.__table__]
+        for attempt in range(3):
+            try:
+                database.Base.metadata.create_all(database.engine, tables=tables)
+                return
+            except DBAPIError:
+                if attempt == 2:
+                    raise
+                time.sleep(0.5)
+
+    # --- Cache ---
+    def cache_get(self, key: str):
+        with database.engine.connect() as conn:
+            return conn.execute(select(ClusterCacheEntry.value).where(
+                ClusterCacheEntry.key == key, ClusterCacheEntry.expires_at > datetime.utcnow())).scalar()
+
+    def cache_set(self, key: str, value: str, ttl_seconds: float):
+        with database.SessionLocal() as db:
+            stmt = dialect_insert(db)(ClusterCacheEntry).values(
+                key=key, value=value, expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds))
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[ClusterCacheEntry.key],
+                set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at}))
+            db.commit()
+
+    # --- Leases ---
+    def acquire(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """Take or renew lease `name`: one statement that only succeeds when
+        the lease is free, expired or already ours."""
+        now = datetime.utcnow()
+        with database.SessionLocal() as db:
+            stmt = dialect_insert(db)(ClusterLease).values(
+                name=name, holder=holder, expires_at=now + timedelta(seconds=ttl_seconds))
+            taken = db.execute(stmt.on_conflict_do_update(
+                index_elements=[ClusterLease.name],
+                set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+                where=(ClusterLease.holder == holder) | (ClusterLease.expires_at < now))).rowcount
+            db.commit()
+        return taken == 1
+
+    def release(self, name: str, holder: str):
+        with database.engine.begin() as conn:
+            conn.execute(delete(ClusterLease).where(ClusterLease.name == name, ClusterLease.holder == holder))
+
+    # --- Events ---
+    def publish(self, origin: str, messages: list):
+        """`messages` are (channel, message) pairs, written in one statement."""
+        now = datetime.utcnow()
+        with database.engine.begin() as conn:
+            conn.execute(insert(ClusterEvent), [
+                {"origin": origin, "channel": channel, "message": message, "created_at": now}
+                for channel, message in messages])
+
+    def poll(self) -> list:
+        """(origin, channel, message) of the events not seen yet, oldest
+        first. The first call only finds the newest id; history is not
+        replayed."""
+        with database.engine.connect() as conn:
+            if self._cursor is None:
+                self._cursor = self._high = conn.execute(
+                    select(func.coalesce(func.max(ClusterEvent.id), 0))).scalar()
+                return []
+            rows = conn.execute(
+                select(ClusterEvent.id, ClusterEvent.origin, ClusterEvent.channel, ClusterEvent.message)
+                .where(ClusterEvent.id > self._cursor).order_by(ClusterEvent.id).limit(POLL_BATCH)).all()
+        now = time.monotonic()
+        fresh = []
+        for row in rows:
+            if row.id in self._handled:
+                continue
+            self._handled.add(row.id)
+            self._gaps.pop(row.id, None)
+            if row.id > self._high:
+                for missing in range(max(self._high + 1, row.id - POLL_BATCH), row.id):
+                    self._gaps[missing] = now
+                self._high = row.id
+            fresh.append((row.origin, row.channel, row.message))
+        # Read again from the oldest id that may still commit
+        self._gaps = {id_: noticed for id_, noticed in self._gaps.items() if now - noticed < GAP_SECONDS}
+        self._cursor = min(self._gaps) - 1 if self._gaps else self._high
+        self._handled = {id_ for id_ in self._handled if id_ > self._cursor}
+        return fresh
+
+    def prune(self):
+        now = datetime.utcnow()
+        with database.engine.begin() as conn:
+            conn.execute(delete(ClusterEvent).where(
+                ClusterEvent.created_at < now - timedelta(seconds=EVENT_RETAIN_SECONDS)))
+            conn.execute(delete(ClusterCacheEntry).where(ClusterCacheEntry.expires_at < now))
+
+
+BACKENDS = {"local": LocalBackend, "database": DatabaseBackend}
+
+
+class Cluster:
+    def __init__(self, backend, poll_seconds: float = POLL_SECONDS, lease_seconds: float = LEASE_SECONDS):
+        self.backend = backend
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._handlers = {}     # channel -> handler(**fields)
+        self._leadership = []   # callback(leading: bool)
+        self._periodic = []     # [interval, next_run, fn], run by the cluster thread
+        self._outbox = deque()  # (channel, message) waiting to be written
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._tables_ready = False
+        self.leading = False
+        self.sent = 0
+        self.received = 0
+        self.leader_changes = 0
+        self.errors = 0
+        self.every(lease_seconds / 3, self._elect)
+        self.every(EVENT_RETAIN_SECONDS / 2, lambda: self.backend.prune() if self.leading else None)
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    def is_leader(self) -> bool:
+        return self.leading
+
+    # --- Shared cache ---
+    def cache_get(self, key: str):
+        return self.backend.cache_get(key)
+
+    def cache_set(self, key: str, value: str, ttl_seconds: float):
+        self.backend.cache_set(key, value, ttl_seconds)
+
+    # --- Broadcast ---
+    def on(self, channel: str, handler):
+        """Register the handler that broadcasts on `channel` call with their fields."""
+        self._handlers[channel] = handler
+
+    def broadcast(self, channel: str, /, **fields):
+        """Run the channel's handler here now and in every other worker soon.
+        Fields must be JSON-serializable. Never blocks on the backend."""
+        self._dispatch(channel, fields)
+        if self.backend.shared:
+            self._outbox.append((channel, json.dumps(fields)))
+            if self._thread is None:
+                self._flush()  # scripts without the background thread
+            else:
+                self._wake.set()
+
+    def broadcast_after_commit(self, session: Session, channel: str, /, **fields):
+        """broadcast() once `session` commits; dropped if it rolls back. For
+        invalidations, so no worker reloads the old row after handling them."""
+        session.info.setdefault(_PENDING, []).append((channel, fields))
+
+    def _dispatch(self, channel: str, fields: dict):
+        handler = self._handlers.get(channel)
+        if handler is None:
+            return
+        try:
+            handler(**fields)
+        except Exception as e:
+            self.errors += 1
+            logger.error("Cluster handler for %r failed: %s", channel, e)
+
+    def _flush(self):
+        messages = []
+        while self._outbox:
+            messages.append(self._outbox.popleft())
+        if not messages:
+            return
+        try:
+            self.backend.publish(self.node_id, messages)
+            self.sent += len(messages)
+        except Exception as e:
+            self.errors += 1
+            logger.error("Could not send %d cluster broadcasts: %s", len(messages), e)
+
+    def _receive(self):
+        for origin, channel, message in self.backend.poll():
+            if origin != self.node_id:
+                self.received += 1
+                self._dispatch(channel, json.loads(message))
+
+    # --- Leases ---
+    def on_leadership(self, callback):
+        """`callback(leading)` runs when this worker becomes or stops being
+        the leader, and once with the current state when start() runs."""
+        self._leadership.append(callback)
+
+    def every(self, seconds: float, fn):
+        """Run `fn()` every `seconds` on the cluster thread, which only runs
+        with a shared backend."""
+        self._periodic.append([seconds, time.monotonic() + seconds, fn])
+
+    @contextmanager
+    def exclusive(self, name: str, ttl_seconds: float = STARTUP_LEASE_SECONDS):
+        """Hold lease `name` for the block, waiting while another worker
+        holds it. If the holder dies, its lease expires after `ttl_seconds`."""
+        self._prepare()
+        while not self.backend.acquire(name, self.node_id, ttl_seconds):
+            time.sleep(self.poll_seconds)
+        try:
+            yield
+        finally:
+            self.backend.release(name, self.node_id)
+
+    def _elect(self):
+        try:
+            leading = self.backend.acquire(LEADER_LEASE, self.node_id, self.lease_seconds)
+        except Exception as e:
+            # A lease we cannot renew may already belong to someone else
+            self.errors += 1
+            logger.error("Leader lease check failed: %s", e)
+            leading = False
+        self._set_leading(leading)
+
+    def _set_leading(self, leading: bool, force: bool = False):
+        if leading == self.leading and not force:
+            return
+        if leading != self.leading:
+            self.leader_changes += 1
+            if self.backend.shared:
+                logger.info("Worker %s %s", self.node_id,
+                            "is now the leader" if leading else "is no longer the leader")
+        self.leading = leading
+        for callback in self._leadership:
+            try:
+                callback(leading)
+            except Exception as e:
+                self.errors += 1
+                logger.error("Leadership callback failed: %s", e)
+
+    # --- Worker ---
+    def _prepare(self):
+        if not self._tables_ready:
+            self.backend.ensure_tables()
+            self._tables_ready = True
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._prepare()
+        if not self.backend.shared:
+            self._set_leading(True, force=True)  # the only worker
+            return
+        self._elect()
+        self._set_leading(self.leading, force=True)
+        self._receive()  # finds the newest event id before requests come in
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="cluster", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Send pending broadcasts and hand the leader lease over."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self._flush()
+        if self.leading:
+            self._set_leading(False)
+            if self.backend.shared:
+                try:
+                    self.backend.release(LEADER_LEASE, self.node_id)
+                except Exception as e:
+                    logger.error("Could not release the leader lease: %s", e)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            self._flush()
+            try:
+                self._receive()
+            except Exception as e:
+                self.errors += 1
+                logger.error("Cluster poll failed: %s", e)
+            now = time.monotonic()
+            for task in self._periodic:
+                if now >= task[1]:
+                    task[1] = now + task[0]
+                    try:
+                        task[2]()
+                    except Exception as e:
+                        self.errors += 1
+                        logger.error("Cluster task failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "node_id": self.node_id,
+            "leader": self.leading,
+            "broadcasts_sent": self.sent,
+            "broadcasts_received": self.received,
+            "broadcasts_pending": len(self._outbox),
+            "leader_changes": self.leader_changes,
+            "errors": self.errors,
+        }
+
+
+def make_cluster(name: str = None) -> Cluster:
+    name = name or os.getenv("CLUSTER_BACKEND", "local")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown CLUSTER_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return Cluster(BACKENDS[name]())
+
+
+# Singleton instance
+cluster = make_cluster()
+
+
+@event.listens_for(Session, "after_commit")
+def _send_pending(session):
+    for channel, fields in session.info.pop(_PENDING, ()):
+        cluster.broadcast(channel, **fields)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(_PENDING, None)
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, event, func, insert, inspect, select, text, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -8,7 +8,63 @@ from datetime import datetime
 # Use /tmp for Cloud Run (writable directory)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:////tmp/test.db")
 
-engine = create_engine(DATABASE_URL)
+# SQLite tuning, applied on every new connection
+SQLITE_PRAGMAS = {
+    # Only takes effect on a new file (before WAL or any table is created);
+    # lets retention.py hand freed pages back to the filesystem
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",  # readers no longer wait for the writer
+    "synchronous": "NORMAL",  # durable at checkpoints; safe with WAL
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # negative = KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE_BYTES", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def make_engine(url: str = DATABASE_URL, **overrides):
+    """Create the engine with settings tuned for the backend in `url`.
+
+    SQLite: WAL journal, synchronous=NORMAL, busy timeout and cache/mmap
+    pragmas on connect; connections may be shared across threads.
+    PostgreSQL: a connection pool sized by DB_POOL_SIZE / DB_MAX_OVERFLOW,
+    with pre-ping so connections dropped by Cloud SQL are replaced.
+    """
+    for scheme in ("postgres://", "postgresql://"):
+        if url.startswith(scheme):
+            # requirements.txt ships psycopg2; newer SQLAlchemy defaults to psycopg 3
+            url = "postgresql+psycopg2://" + url[len(scheme):]
+
+    if url.startswith("sqlite"):
+        options = {
+            "connect_args": {"check_same_thread": False,
+                             "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000},
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        }
+        if ":memory:" in url or url.rstrip("/") == "sqlite:":
+            options = {"connect_args": options["connect_args"]}  # single-connection pool
+        options.update(overrides)
+        sqlite_engine = create_engine(url, **options)
+        event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+        return sqlite_engine
+
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+    options.update(overrides)
+    return create_engine(url, **options)
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -34,10 +90,21 @@ class Vital(Base):
     value = Column(Float)
     unit = Column(String)
     is_abnormal = Column(Boolean, default=False)
+    # Server time of the insert; `timestamp` can be an old device time
+    ingested_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="vitals")
 
+    __table_args__ = (
+        Index("ix_vitals_user_timestamp", "user_id", "timestamp"),
+        Index("ix_vitals_user_type_timestamp", "user_id", "type", "timestamp"),
+        Index("ix_vitals_ingested_at", "ingested_at"),
+    )
+
 class Alert(Base):
+    """One alert episode per user and vital type: repeated abnormal readings
+    update it (occurrences, last_seen_at, severity) instead of adding rows.
+    Written by the alert worker (alerts.py)."""
     __tablename__ = "alerts"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -45,9 +112,123 @@ class Alert(Base):
     severity = Column(String)
     message = Column(Text)
     resolved = Column(Boolean, default=False)
+    vital_type = Column(String, nullable=True)  # NULL on alerts from older versions
+    last_seen_at = Column(DateTime, nullable=True)
+    occurrences = Column(Integer, default=1)
+    resolved_at = Column(DateTime, nullable=True)
     
     user = relationship("User", back_populates="alerts")
 
+    __table_args__ = (
+        Index("ix_alerts_user_created_at", "user_id", "created_at"),
+        Index("ix_alerts_user_resolved_created_at", "user_id", "resolved", "created_at"),  # open alerts
+        # Open alert episodes only, for the alert worker's resolution sweep
+        Index("ix_alerts_open", "user_id", "vital_type",
+              sqlite_where=text("resolved = 0 AND vital_type IS NOT NULL"),
+              postgresql_where=text("NOT resolved AND vital_type IS NOT NULL")),
+    )
+
+class AlertEvent(Base):
+    """Abnormal readings waiting for the alert worker (ALERT_QUEUE=database).
+    Inserted in the ingest transaction, deleted once processed."""
+    __tablename__ = "alert_events"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    vital_type = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    message = Column(Text)
+
+class CaregiverPatient(Base):
+    """Assignment of a patient to a caregiver (many-to-many)."""
+    __tablename__ = "caregiver_patients"
+    caregiver_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    patient_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_caregiver_patients_patient", "patient_id"),)
+
+class LatestVital(Base):
+    """Rollup: the newest reading of each vital type per user, upserted by
+    ingest in the same transaction as the raw rows (see rollups.py)."""
+    __tablename__ = "latest_vitals"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    type = Column(String, primary_key=True)
+    timestamp = Column(DateTime, nullable=False)
+    value = Column(Float)
+    unit = Column(String)
+    is_abnormal = Column(Boolean, default=False)
+
+class VitalRollup(Base):
+    """Rollup: per-bucket aggregates ("1m", "1h", "1d") of each user's
+    vitals, upserted by ingest (see rollups.py). avg = sum / count."""
+    __tablename__ = "vital_rollups"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    type = Column(String, primary_key=True)
+    bucket = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+
+class AnomalyState(Base):
+    """Checkpoint of the anomaly detector's per-user, per-vital-type
+    baseline (see anomaly.py); restarts replay only newer vitals."""
+    __tablename__ = "anomaly_state"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    vital_type = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+    mean = Column(Float, nullable=False)
+    m2 = Column(Float, nullable=False)
+    ewma = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    # Merged checkpoints (several workers): every vital ingested up to here
+    ingested_through = Column(DateTime)
+
+class Threshold(Base):
+    __tablename__ = "thresholds"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # NULL = default for all users
+    vital_type = Column(String, nullable=False)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+
+    __table_args__ = (UniqueConstraint("user_id", "vital_type"),)
+
+class ClusterCacheEntry(Base):
+    """Shared cache entries between workers (CLUSTER_BACKEND=database, see
+    cluster.py). Expired rows are ignored and deleted by the leader."""
+    __tablename__ = "cluster_cache"
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class ClusterEvent(Base):
+    """Broadcasts between workers (CLUSTER_BACKEND=database): each worker
+    reads the ids past the last one it saw; the leader deletes old rows."""
+    __tablename__ = "cluster_events"
+    id = Column(Integer, primary_key=True)
+    origin = Column(String, nullable=False)  # node id of the sender
+    channel = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Never reuse ids: a deleted maximum id would be handed out again
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class ClusterLease(Base):
+    """Named leases (leader election, startup) held by one worker until
+    expires_at (CLUSTER_BACKEND=database)."""
+    __tablename__ = "cluster_leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -55,5 +236,54 @@ def get_db():
     finally:
         db.close()
 
+def dialect_insert(db):
+    """The dialect's insert construct, which has on_conflict_do_update()
+    (upserts on PostgreSQL and SQLite)."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"No upsert support for the '{dialect}' dialect")
+    return insert
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    migrate(engine)
+
+def migrate(bind):
+    """Idempotent upgrades for databases created by older versions.
+    create_all() skips tables that already exist, so their new columns and
+    indexes are added here; the rollup tables are backfilled once from the
+    raw vitals."""
+    existing = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            present = {column["name"] for column in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:  # new nullable columns only
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+    with bind.begin() as conn:
+        if conn.execute(select(LatestVital.user_id).limit(1)).first() is None:
+            ranked = select(
+                Vital.user_id, Vital.type, Vital.timestamp, Vital.value, Vital.unit, Vital.is_abnormal,
+                func.row_number().over(
+                    partition_by=(Vital.user_id, Vital.type),
+                    order_by=(Vital.timestamp.desc(), Vital.id.desc())
+                ).label("rank"),
+            ).where(
+                Vital.user_id.is_not(None), Vital.type.is_not(None), Vital.timestamp.is_not(None)
+            ).subquery()
+            columns = ["user_id", "type", "timestamp", "value", "unit", "is_abnormal"]
+            conn.execute(insert(LatestVital).from_select(
+                columns, select(*(ranked.c[name] for name in columns)).where(ranked.c.rank == 1)
+            ))
+
+    from rollups import backfill_vital_rollups  # rollups imports this module
+    backfill_vital_rollups(bind)
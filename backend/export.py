@@ -0,0 +1,207 @@
+"""
+COMPONENT: Vitals Export
+
+Streams full vital histories out of the database in constant memory. Rows
+are read through a server-side cursor (`yield_per`, so PostgreSQL uses a
+named cursor and SQLite steps its cursor lazily) and encoded one chunk at a
+time into CSV, NDJSON, Parquet or Arrow IPC. Nothing holds more than one
+chunk of rows, so peak memory does not grow with history size.
+
+Parquet and Arrow need the optional `pyarrow` package.
+
+Used by GET /api/v1/export/vitals and as a CLI:
+
+    cd backend && python export.py --format parquet --username grandpa_joe -o joe.parquet
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import User, Vital
+
+# pyarrow is optional and slow to import, so it is loaded on first use
+pa = pq = None
+
+
+def _load_pyarrow() -> bool:
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+CHUNK_SIZE = 10000
+COLUMNS = ["id", "username", "timestamp", "type", "value", "unit", "is_abnormal"]
+
+# format -> (media type, file extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+def check_format(fmt: str):
+    """Raise ValueError for an unknown format or a missing optional dependency."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if fmt in ("parquet", "arrow") and not _load_pyarrow():
+        raise ValueError(f"{fmt} export requires the pyarrow package")
+
+
+def iter_vital_chunks(db: Session, username: str = None, vital_type: str = None,
+                      start: datetime = None, end: datetime = None, chunk_size: int = CHUNK_SIZE):
+    """Yield lists of at most `chunk_size` rows (COLUMNS order) in id order."""
+    query = (
+        select(Vital.id, User.username, Vital.timestamp, Vital.type, Vital.value, Vital.unit, Vital.is_abnormal)
+        .join(User, User.id == Vital.user_id)
+        .order_by(Vital.id)
+    )
+    if username is not None:
+        query = query.where(User.username == username)
+    if vital_type is not None:
+        query = query.where(Vital.type == vital_type)
+    if start is not None:
+        query = query.where(Vital.timestamp >= start)
+    if end is not None:
+        query = query.where(Vital.timestamp < end)
+
+    result = db.execute(query.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield partition
+
+
+def _timestamp_text(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+def encode_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        for row in chunk:
+            writer.writerow((row[0], row[1], _timestamp_text(row[2]), row[3], row[4], row[5], bool(row[6])))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(chunks):
+    for chunk in chunks:
+        yield "".join(
+            json.dumps({"id": row[0], "username": row[1], "timestamp": _timestamp_text(row[2]),
+                        "type": row[3], "value": row[4], "unit": row[5], "is_abnormal": bool(row[6])}) + "\n"
+            for row in chunk
+        ).encode()
+
+
+class _Drain:
+    """Write-only file object for pyarrow writers; bytes are collected until
+    the encoder hands them to the client."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("username", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("type", pa.string()),
+        ("value", pa.float64()),
+        ("unit", pa.string()),
+        ("is_abnormal", pa.bool_()),
+    ])
+
+
+def _record_batch(chunk, schema):
+    columns = list(zip(*chunk))
+    columns[6] = [bool(flag) if flag is not None else None for flag in columns[6]]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+    )
+
+
+def encode_arrow(chunks, parquet: bool = False):
+    """One Arrow record batch (or Parquet row group) per chunk."""
+    _load_pyarrow()
+    schema = _arrow_schema()
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    for chunk in chunks:
+        writer.write_batch(_record_batch(chunk, schema))
+        data = sink.take()
+        if data:
+            yield data
+    writer.close()
+    yield sink.take()
+
+
+def encode(fmt: str, chunks):
+    """Byte chunks of the export file in `fmt`."""
+    if fmt == "csv":
+        return encode_csv(chunks)
+    if fmt == "ndjson":
+        return encode_ndjson(chunks)
+    return encode_arrow(chunks, parquet=(fmt == "parquet"))
+
+
+def main():
+    import argparse
+    import sys
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export vitals history")
+    parser.add_argument("--format", default="csv", choices=list(FORMATS))
+    parser.add_argument("--username", help="export one user (default: all users)")
+    parser.add_argument("--type", dest="vital_type", help="only this vital type")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, help="UTC, inclusive")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, help="UTC, exclusive")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+    try:
+        check_format(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        with SessionLocal() as db:
+            chunks = iter_vital_chunks(db, args.username, args.vital_type, args.start, args.end)
+            for data in encode(args.format, chunks):
+                out.write(data)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,140 @@
-        else:
-            print("⚠️ WARNING: No GEMINI_API_KEY found. Using fallback responses.")
-            self.use_gemini = False
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from database import SessionLocal
+from chat_cache import response_cache
+from intents import intent_matcher
+from vitals_snapshot import VitalsSnapshot, load_snapshot
+from metrics import chat_replies, llm_latency, llm_requests, llm_tokens, span
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Fallback replies keyed by intent (see intents.py), formatted with full_name.
+# Intents with several replies pick one at random.
+_FALLBACK_CHOICES = {
+    "manage_bp": (
+        "Managing blood pressure is very important, {full_name}. Here are some general tips: reduce salt intake, maintain a healthy weight, exercise regularly (like walking 30 minutes daily), limit alcohol, and manage stress. However, please discuss your specific readings with your doctor for personalized advice! 🩺",
+        "Good question about blood pressure control! Generally: eat more fruits and vegetables, reduce sodium, stay active, and avoid smoking. But since your readings show some abnormality, it's crucial to consult your doctor for a proper treatment plan. 💙",
+        "Blood pressure management typically involves lifestyle changes like eating less salt, exercising regularly, maintaining healthy weight, and reducing stress. Some people also need medication. Please talk to your doctor about the best approach for your specific situation! 🏥",
+    ),
+    "manage_hr": (
+        "To maintain a healthy heart rate, {full_name}: stay physically active with regular cardio exercise, manage stress through relaxation techniques, get adequate sleep (7-9 hours), limit caffeine and alcohol, and stay hydrated. If your heart rate is consistently abnormal, please see your doctor! ❤️",
+        "Heart rate management involves regular exercise (which actually strengthens your heart over time), stress reduction, avoiding excessive caffeine, and maintaining good sleep habits. For persistent issues, your doctor might recommend specific treatments. 💓",
+        "Good question! A healthy heart rate comes from: regular physical activity, stress management, proper hydration, limiting stimulants like caffeine, and getting enough rest. Always consult your doctor if you notice irregular patterns! 🫀",
+    ),
+    "manage_glucose": (
+        "Managing blood glucose is crucial, {full_name}. Key strategies: eat balanced meals with complex carbs and fiber, exercise regularly, maintain healthy weight, monitor your levels as advised, limit sugary foods and drinks, and take medications as prescribed. Your doctor can create a personalized plan! 🩸",
+        "Blood sugar control involves: eating at regular intervals, choosing whole grains over refined carbs, including protein and healthy fats in meals, staying active, managing stress, and monitoring your levels. Please work with your doctor for specific targets! 📊",
+        "Great question about glucose management! Focus on: balanced diet with low glycemic foods, regular physical activity, weight management, stress reduction, and consistent meal timing. If you have diabetes, follow your doctor's medication and monitoring plan closely. 🍎",
+    ),
+    "manage_spo2": (
+        "To maintain healthy oxygen levels, {full_name}: practice deep breathing exercises, stay physically active to strengthen lungs, maintain good posture, ensure good air quality in your home, and avoid smoking. If levels are consistently low, see your doctor immediately! 🫁",
+        "Oxygen saturation can be improved through: regular breathing exercises, cardiovascular exercise, maintaining healthy weight, good posture, and avoiding pollutants. Low SpO2 can be serious - always consult your doctor if readings are below 95%! 💨",
+        "Good question! Supporting healthy oxygen levels: do breathing exercises, stay active, keep airways clear, maintain good indoor air quality, and avoid smoking. Persistent low readings need immediate medical attention! 🌬️",
+    ),
+    "manage_temperature": (
+        "For managing fever or temperature, {full_name}: stay hydrated, rest adequately, use cool compresses if needed, dress in light clothing, and monitor your temperature regularly. For fever above 100.4°F or lasting more than 3 days, contact your doctor! 🌡️",
+        "Temperature management tips: drink plenty of fluids, get rest, take fever-reducing medication if recommended by your doctor, use lukewarm baths (not cold), and monitor regularly. Seek medical help for high or persistent fever! 🏥",
+        "To manage body temperature: stay hydrated, rest in a cool environment, use appropriate clothing, and monitor regularly. For fever, you can use over-the-counter fever reducers (as directed), but always consult your doctor for persistent or high fever! 💊",
+    ),
+    "exercise": (
+        "Moving your body is great for you, {full_name}! 🏃‍♂️ Simple activities like walking, light stretching, or gardening can be very beneficial. Always check with your doctor before starting a new routine!",
+        "Great question! Many people find that a daily 20-minute walk helps improve heart health and mood. 🌿 Just listen to your body and don't overdo it.",
+        "Regular gentle movement is key, {full_name}. You don't need to run a marathon—just staying active helps! Ask your doctor what types of exercise are safe for you. 🧘",
+    ),
+    "diet": (
+        "They say 'you are what you eat'! 🍎 Generally, a balanced diet with plenty of vegetables, fruits, and whole grains is recommended. But for your specific needs, a nutritionist or your doctor is the best guide.",
+        "Eating well is a huge part of staying healthy, {full_name}. 🥗 Try to stay hydrated and limit processed foods. Do you have any specific dietary restrictions your doctor mentioned?",
+        "Good nutrition is powerful medicine. 🥕 Focusing on fresh, whole foods is usually a safe bet. However, please consult your doctor for a diet plan that fits your specific health conditions.",
+    ),
+    "advice": (
+        "That's a good question, {full_name}. Generally, maintaining a healthy diet, staying hydrated, and regular gentle exercise can help. However, since every person is different, the best way to improve your specific condition is to share these readings with your doctor. 🩺",
+        "I love that you're taking charge of your health, {full_name}! 🌟 Small steps like better sleep, drinking water, and reducing stress make a big difference. Be sure to discuss these results with your doctor for a tailored plan.",
+        "Improving your health is a journey! 💙 Focusing on the basics—sleep, hydration, and movement—is a great start. But for these specific readings, your doctor's advice is the most important tool you have.",
+    ),
+}
+
+_FALLBACK_REPLIES = {
+    "how_are_you": "I'm doing well, thank you for asking, {full_name}! I'm ready to help you with your health data. How are you feeling today? 💙",
+    "identity_user": "You are {full_name}! I'm here to help you stay healthy, {full_name}. 💙",
+    "identity_bot": "I am your AI Health Companion, {full_name}. I'm here to monitor your vitals and answer your health questions. 🤝",
+    "greeting": "Hello{greeting_name}! 👋 I'm your AI Health Companion. I can help you understand your health data and answer questions about your vitals. How can I assist you today?",
+    "question": "That's a great question, {full_name}! While I can help you understand your health data, I recommend discussing specific medical concerns with your doctor. Is there anything about your recent vitals you'd like me to explain? 💙",
+    "default": "I'm here to help you understand your health data, {full_name}! You can ask me about your vitals, or add new readings in the Settings page. What would you like to know? 😊",
+}
+
+_INTERPRET_REPLIES = {
+    "no_data": "I can't tell yet, {full_name}. Please add some health readings first so I can analyze them for you. 📊",
+    "abnormal": "I see some values that are flagged as abnormal, {full_name}. It's best not to worry, but you should share these results with your doctor just to be safe. 💙",
+    "normal": "Yes, {full_name}! Based on your recent data, everything looks within the normal range. Keep up the good work! 🎉",
+    "unknown": "I'm not sure, {full_name}. I don't see enough data to give you a clear answer. Please try adding more readings.",
+}
+
+_VITALS_REPLIES = {
+    "no_data": "I don't see any health data recorded yet, {full_name}. Would you like to add some vitals in the Settings page? 📊",
+    "abnormal": "Here's your recent health data, {full_name}:\n\n{context}\n\nI noticed some values are outside the typical range. Please consult with your doctor to understand what this means for you. 💙",
+    "normal": "Here's what I found in your recent health data, {full_name}:\n\n{context}\n\nEverything looks good! Keep monitoring regularly. 💙",
+}
+
+# Specific vitals: (vital types, latest-value reply, missing-value reply, general info)
+_VITAL_REPLIES = {
+    "heart": (
+        ("heart_rate",),
+        "Your latest heart rate reading was {0}. Normal resting heart rate is typically 60-100 bpm. ❤️",
+        "I don't see a recent heart rate reading in your data, {full_name}. Please add one in the Settings page! 💓",
+        "Your heart rate is an important indicator of cardiovascular health. Normal resting heart rate is typically 60-100 bpm. If you notice anything unusual, please consult your doctor. ❤️",
+    ),
+    "blood_pressure": (
+        ("blood_pressure_sys", "blood_pressure_dia"),
+        "Your latest blood pressure was {0} (systolic) / {1} (diastolic). Normal is typically below 120/80. 🩺",
+        "I don't see a full blood pressure reading recently, {full_name}. Please update your vitals! 🩺",
+        "Blood pressure is measured as systolic/diastolic (e.g., 120/80). Normal is typically below 120/80. High blood pressure should be monitored by a healthcare professional. 🩺",
+    ),
+    "oxygen": (
+        ("spo2",),
+        "Your latest SpO2 reading was {0}. Levels below 95% may need medical attention. 🫁",
+        "I don't see a recent SpO2 reading, {full_name}. 🫁",
+        "Blood oxygen (SpO2) should typically be 95-100%. Levels below 95% may need medical attention. Make sure to measure it properly! 🫁",
+    ),
+    "glucose": (
+        ("glucose",),
+        "Your latest glucose reading was {0}. Normal fasting glucose is 70-100 mg/dL. 🩸",
+        "I don't see a recent glucose reading, {full_name}. 🩸",
+        "Normal fasting glucose is 70-100 mg/dL. After meals, it can go up to 140 mg/dL. If you have diabetes, follow your doctor's guidance on target ranges. 🩸",
+    ),
+    "temperature": (
+        ("temperature",),
+        "Your latest temperature was {0}. Normal body temperature is around 98.6°F. 🌡️",
+        "I don't see a recent temperature reading, {full_name}. 🌡️",
+        "Normal body temperature is around 98.6°F (37°C). A fever is generally 100.4°F or higher. If you have a persistent fever, contact your doctor. 🌡️",
+    ),
+}
+
+class HealthAgent:
+    def __init__(self):
+        # The Gemini SDK takes about half a second to import, so it is loaded
+        # on the first call that needs it (see `model`), not at app import
+        self._api_key = os.getenv("GEMINI_API_KEY")
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.use_gemini = bool(self._api_key)
+        if not self.use_gemini:
+            logger.warning("No GEMINI_API_KEY found. Using fallback responses.")
+
+        self.timeout = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "20"))
+        self.max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+        self._slots = None  # (event loop, its semaphore), made by the first call
+        # Small dedicated pool for context queries, so a burst of chats cannot
+        # take every DB connection away from ingest and dashboard requests
+        self._context_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("CHAT_CONTEXT_WORKERS", "4")), thread_name_prefix="chat-context")
         
         self.system_prompt = """
         You are a warm, caring, and friendly AI Health Companion. 
@@ -21,264 +155,267 @@
         6. Use emojis to add warmth and emotion to your messages. 💙 🌿
         """
 
-    def get_recent_vitals(self, username: str, limit: int = 5) -> str:
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self._api_key)
+                    self._model = genai.GenerativeModel('gemini-1.5-flash')
+                    logger.info("Gemini API configured")
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model  # e.g. a stub in benchmarks
+
+    def get_vitals_snapshot(self, username: str) -> VitalsSnapshot:
+        """Latest reading per vital type, plus the user's name, in one query."""
+        # Closed explicitly: this also runs concurrently from chat_async workers
+        with SessionLocal() as db:
+            return load_snapshot(db, username)
+
+    def get_recent_vitals(self, username: str) -> str:
         """Tool to fetch recent vitals for a user."""
-        db: Session = next(get_db())
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
-            return "User not found."
-        
-        vitals = db.query(Vital).filter(Vital.user_id == user.id).order_by(Vital.timestamp.desc()).limit(limit).all()
-        
-        if not vitals:
-            return "No recent vitals found."
-        
-        report = []
-        for v in vitals:
-            status = "⚠️ Abnormal" if v.is_abnormal else "✅ Normal"
-            report.append(f"- {v.timestamp.strftime('%Y-%m-%d %H:%M')}: {v.type} = {v.value} {v.unit} ({status})")
-        
-        return "\n".join(report)
+        return self.get_vitals_snapshot(username).render()
 
-    def chat(self, user_message: str, username: str) -> str:
-        # 1. Gather Context (Simple RAG)
-        # Fetch user details to get full name
-        db: Session = next(get_db())
-        user = db.query(User).filter(User.username == username).first()
-        full_name = user.full_name if user and user.full_name else username
-        
-        context = self.get_recent_vitals(username)
-        
-        # 2. Construct Prompt
-        full_prompt = f"""
+    def _build_prompt(self, user_message: str, snapshot: VitalsSnapshot, full_name: str) -> str:
+        # Only built when Gemini is actually called
+        return f"""
         {self.system_prompt}
         
         USER INFORMATION:
         Name: {full_name}
         
         CONTEXT (Recent Health Data):
-        {context}
+        {snapshot.render()}
         
         USER QUESTION:
         {user_message}
         
         Please provide a helpful, friendly response. Address the user by their name occasionally to be more personal.
         """
+
+    def _log_error(self, error: Exception):
+        logger.error("Error calling Gemini: %s", error)
+
+    @staticmethod
+    def _record_call(outcome: str, seconds: float, response=None):
+        llm_requests.inc(outcome)
+        llm_latency.observe(seconds)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            llm_tokens.inc("prompt", amount=getattr(usage, "prompt_token_count", 0) or 0)
+            llm_tokens.inc("completion", amount=getattr(usage, "candidates_token_count", 0) or 0)
+
+    def chat(self, user_message: str, username: str) -> str:
+        # 1. Gather Context (Simple RAG)
+        snapshot = self.get_vitals_snapshot(username)
+        full_name = snapshot.full_name or username
         
-        # 3. Call Gemini API or use fallback
+        # 2. Call Gemini API or use fallback
         try:
             if self.use_gemini:
-                print(f"🤖 Calling Gemini API for user: {username}")
-                response = self.model.generate_content(full_prompt)
-                print("✅ Gemini response received")
+                key = response_cache.make_key(username, user_message, snapshot.fingerprint())
+                cached = response_cache.get(key)
+                if cached is not None:
+                    chat_replies.inc("llm")
+                    return cached
+                started = time.monotonic()
+                try:
+                    with span("llm"):
+                        response = self.model.generate_content(self._build_prompt(user_message, snapshot, full_name))
+                except Exception:
+                    self._record_call("error", time.monotonic() - started)
+                    raise
+                self._record_call("ok", time.monotonic() - started, response)
+                response_cache.put(key, response.text, time.monotonic() - started)
+                chat_replies.inc("llm")
                 return response.text
             else:
                 # Fallback responses when no API key
-                return self._fallback_response(user_message, context, full_name)
+                return self._fallback_response(user_message, snapshot, full_name)
         except Exception as e:
-            print(f"❌ Error calling Gemini: {e}")
-            # Log error to file for debugging
-            with open("gemini_error.log", "a") as f:
-                f.write(f"{datetime.now()}: {str(e)}\n")
-            return self._fallback_response(user_message, context, full_name)
-    
-    def _fallback_response(self, user_message: str, context: str, full_name: str) -> str:
-        """Provide intelligent fallback responses without API."""
-        msg_lower = user_message.lower()
-        
-        # Personalize greeting
-        greeting_name = f" {full_name}" if full_name else ""
-        
-        # Check for "How are you"
-        if 'how are you' in msg_lower:
-            return f"I'm doing well, thank you for asking, {full_name}! I'm ready to help you with your health data. How are you feeling today? 💙"
+            self._log_error(e)
+            return self._fallback_response(user_message, snapshot, full_name)
 
-        # Check if asking about name/identity
-        if any(phrase in msg_lower for phrase in ['my name', 'who am i', 'know me']):
-            return f"You are {full_name}! I'm here to help you stay healthy, {full_name}. 💙"
-            
-        if any(phrase in msg_lower for phrase in ['who are you', "who're you", "who'r you", "your name"]):
-            return f"I am your AI Health Companion, {full_name}. I'm here to monitor your vitals and answer your health questions. 🤝"
+    # --- Async path (used by the API) ---
+    # The DB context fetch runs on _context_pool and the Gemini call uses the
+    # SDK's async API, so a slow LLM call never holds a threadpool worker.
+    # At most GEMINI_MAX_CONCURRENCY calls are in flight; a call that cannot
+    # finish (including the wait for a slot) within GEMINI_TIMEOUT_SECONDS
+    # falls back to _fallback_response. Replies are cached per user, message
+    # and vitals context, and identical concurrent requests share one call.
+    async def chat_async(self, user_message: str, username: str) -> str:
+        snapshot = await self._snapshot_async(username)
+        full_name = snapshot.full_name or username
+        if not self.use_gemini:
+            return self._fallback_response(user_message, snapshot, full_name)
+        
+        key = response_cache.make_key(username, user_message, snapshot.fingerprint())
+        try:
+            reply = await response_cache.get_or_call(
+                key, lambda: self._generate(self._build_prompt(user_message, snapshot, full_name)))
+            chat_replies.inc("llm")
+            return reply
+        except asyncio.TimeoutError:
+            self._log_error(TimeoutError(f"Gemini call exceeded {self.timeout}s"))
+        except Exception as e:
+            self._log_error(e)
+        return self._fallback_response(user_message, snapshot, full_name)
 
-        # Check for advice/improvement questions (Prioritize this over specific vitals)
-        import random
-        
-        # 1. Blood Pressure specific management
-        bp_keywords = ['blood pressure', 'bp', 'pressure']
-        management_keywords = ['manage', 'control', 'controll', 'reduce', 'lower', 'improve', 'fix', 'how to', 'what do', 'what i do', 'normalize', 'maintain']
-        
-        if any(bp in msg_lower for bp in bp_keywords) and any(mgmt in msg_lower for mgmt in management_keywords):
-            responses = [
-                f"Managing blood pressure is very important, {full_name}. Here are some general tips: reduce salt intake, maintain a healthy weight, exercise regularly (like walking 30 minutes daily), limit alcohol, and manage stress. However, please discuss your specific readings with your doctor for personalized advice! 🩺",
-                f"Good question about blood pressure control! Generally: eat more fruits and vegetables, reduce sodium, stay active, and avoid smoking. But since your readings show some abnormality, it's crucial to consult your doctor for a proper treatment plan. 💙",
-                f"Blood pressure management typically involves lifestyle changes like eating less salt, exercising regularly, maintaining healthy weight, and reducing stress. Some people also need medication. Please talk to your doctor about the best approach for your specific situation! 🏥"
-            ]
-            return random.choice(responses)
-        
-        # 2. Heart Rate specific management
-        hr_keywords = ['heart rate', 'heart', 'hr', 'pulse', 'heartbeat']
-        
-        if any(hr in msg_lower for hr in hr_keywords) and any(mgmt in msg_lower for mgmt in management_keywords):
-            responses = [
-                f"To maintain a healthy heart rate, {full_name}: stay physically active with regular cardio exercise, manage stress through relaxation techniques, get adequate sleep (7-9 hours), limit caffeine and alcohol, and stay hydrated. If your heart rate is consistently abnormal, please see your doctor! ❤️",
-                f"Heart rate management involves regular exercise (which actually strengthens your heart over time), stress reduction, avoiding excessive caffeine, and maintaining good sleep habits. For persistent issues, your doctor might recommend specific treatments. 💓",
-                f"Good question! A healthy heart rate comes from: regular physical activity, stress management, proper hydration, limiting stimulants like caffeine, and getting enough rest. Always consult your doctor if you notice irregular patterns! 🫀"
-            ]
-            return random.choice(responses)
-        
-        # 3. Glucose/Blood Sugar specific management
-        glucose_keywords = ['glucose', 'sugar', 'blood sugar', 'diabetes']
-        
-        if any(gluc in msg_lower for gluc in glucose_keywords) and any(mgmt in msg_lower for mgmt in management_keywords):
-            responses = [
-                f"Managing blood glucose is crucial, {full_name}. Key strategies: eat balanced meals with complex carbs and fiber, exercise regularly, maintain healthy weight, monitor your levels as advised, limit sugary foods and drinks, and take medications as prescribed. Your doctor can create a personalized plan! 🩸",
-                f"Blood sugar control involves: eating at regular intervals, choosing whole grains over refined carbs, including protein and healthy fats in meals, staying active, managing stress, and monitoring your levels. Please work with your doctor for specific targets! 📊",
-                f"Great question about glucose management! Focus on: balanced diet with low glycemic foods, regular physical activity, weight management, stress reduction, and consistent meal timing. If you have diabetes, follow your doctor's medication and monitoring plan closely. 🍎"
-            ]
-            return random.choice(responses)
-        
-        # 4. SpO2/Oxygen specific management
-        spo2_keywords = ['spo2', 'oxygen', 'o2', 'saturation']
-        
-        if any(spo2 in msg_lower for spo2 in spo2_keywords) and any(mgmt in msg_lower for mgmt in management_keywords):
-            responses = [
-                f"To maintain healthy oxygen levels, {full_name}: practice deep breathing exercises, stay physically active to strengthen lungs, maintain good posture, ensure good air quality in your home, and avoid smoking. If levels are consistently low, see your doctor immediately! 🫁",
-                f"Oxygen saturation can be improved through: regular breathing exercises, cardiovascular exercise, maintaining healthy weight, good posture, and avoiding pollutants. Low SpO2 can be serious - always consult your doctor if readings are below 95%! 💨",
-                f"Good question! Supporting healthy oxygen levels: do breathing exercises, stay active, keep airways clear, maintain good indoor air quality, and avoid smoking. Persistent low readings need immediate medical attention! 🌬️"
-            ]
-            return random.choice(responses)
-        
-        # 5. Temperature/Fever specific management
-        temp_keywords = ['temperature', 'temp', 'fever']
-        
-        if any(temp in msg_lower for temp in temp_keywords) and any(mgmt in msg_lower for mgmt in management_keywords):
-            responses = [
-                f"For managing fever or temperature, {full_name}: stay hydrated, rest adequately, use cool compresses if needed, dress in light clothing, and monitor your temperature regularly. For fever above 100.4°F or lasting more than 3 days, contact your doctor! 🌡️",
-                f"Temperature management tips: drink plenty of fluids, get rest, take fever-reducing medication if recommended by your doctor, use lukewarm baths (not cold), and monitor regularly. Seek medical help for high or persistent fever! 🏥",
-                f"To manage body temperature: stay hydrated, rest in a cool environment, use appropriate clothing, and monitor regularly. For fever, you can use over-the-counter fever reducers (as directed), but always consult your doctor for persistent or high fever! 💊"
-            ]
-            return random.choice(responses)
-        
-        # 6. Exercise specific
-        if any(w in msg_lower for w in ['exercise', 'excise', 'work out', 'workout', 'walk', 'run']):
-            responses = [
-                f"Moving your body is great for you, {full_name}! 🏃‍♂️ Simple activities like walking, light stretching, or gardening can be very beneficial. Always check with your doctor before starting a new routine!",
-                f"Great question! Many people find that a daily 20-minute walk helps improve heart health and mood. 🌿 Just listen to your body and don't overdo it.",
-                f"Regular gentle movement is key, {full_name}. You don't need to run a marathon—just staying active helps! Ask your doctor what types of exercise are safe for you. 🧘"
-            ]
-            return random.choice(responses)
+    async def _snapshot_async(self, username: str) -> VitalsSnapshot:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()  # keeps the request's trace
+        return await loop.run_in_executor(self._context_pool, context.run, self.get_vitals_snapshot, username)
 
-        # 3. Diet specific
-        if any(w in msg_lower for w in ['diet', 'food', 'eat', 'nutrition']):
-            responses = [
-                f"They say 'you are what you eat'! 🍎 Generally, a balanced diet with plenty of vegetables, fruits, and whole grains is recommended. But for your specific needs, a nutritionist or your doctor is the best guide.",
-                f"Eating well is a huge part of staying healthy, {full_name}. 🥗 Try to stay hydrated and limit processed foods. Do you have any specific dietary restrictions your doctor mentioned?",
-                f"Good nutrition is powerful medicine. 🥕 Focusing on fresh, whole foods is usually a safe bet. However, please consult your doctor for a diet plan that fits your specific health conditions."
-            ]
-            return random.choice(responses)
+    async def _model_async(self):
+        if self._model is None:  # the SDK import would block the event loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._context_pool, lambda: self.model)
+        return self._model
 
-        # 3. General Advice / Tips / Control
-        advice_keywords = ['how to', 'make it normal', 'improve', 'fix', 'advice', 'change', 'control', 'controll', 'tips', 'tip', 'suggestion', 'suggestions']
-        advice_phrases = ['what should i do', 'what do i do', 'what i do', 'what can i do', 'what i so', 'so what i do']
-        
-        if any(k in msg_lower for k in advice_keywords) or any(p in msg_lower for p in advice_phrases):
-            responses = [
-                f"That's a good question, {full_name}. Generally, maintaining a healthy diet, staying hydrated, and regular gentle exercise can help. However, since every person is different, the best way to improve your specific condition is to share these readings with your doctor. 🩺",
-                f"I love that you're taking charge of your health, {full_name}! 🌟 Small steps like better sleep, drinking water, and reducing stress make a big difference. Be sure to discuss these results with your doctor for a tailored plan.",
-                f"Improving your health is a journey! 💙 Focusing on the basics—sleep, hydration, and movement—is a great start. But for these specific readings, your doctor's advice is the most important tool you have."
-            ]
-            return random.choice(responses)
+    def _llm_slots(self) -> asyncio.Semaphore:
+        """The max_concurrency semaphore of the running event loop. An asyncio
+        primitive belongs to one loop, so another loop gets its own."""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots[0] is not loop:
+            self._slots = (loop, asyncio.Semaphore(self.max_concurrency))
+        return self._slots[1]
+
+    async def _acquire_slot(self, deadline: float) -> asyncio.Semaphore:
+        """Wait for an LLM slot until `deadline` (event loop time); raises
+        asyncio.TimeoutError after it. The caller releases the slot."""
+        slots = self._llm_slots()
+        loop = asyncio.get_running_loop()
+        await asyncio.wait_for(slots.acquire(), timeout=max(0.0, deadline - loop.time()))
+        return slots
+
+    async def _generate(self, full_prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.timeout
+        try:
+            with span("llm"):
+                model = await asyncio.wait_for(self._model_async(), timeout=self.timeout)
+                slots = await self._acquire_slot(deadline)
+                try:
+                    response = await asyncio.wait_for(model.generate_content_async(full_prompt),
+                                                      timeout=max(0.0, deadline - loop.time()))
+                finally:
+                    slots.release()
+            self._record_call("ok", loop.time() - started, response)
+            return response.text
+        except asyncio.TimeoutError:
+            self._record_call("timeout", loop.time() - started)
+            raise
+        except Exception:
+            self._record_call("error", loop.time() - started)
+            raise
+
+    async def chat_stream(self, user_message: str, username: str):
+        """Yield the response as text chunks as soon as Gemini produces them."""
+        snapshot = await self._snapshot_async(username)
+        full_name = snapshot.full_name or username
+        if not self.use_gemini:
+            yield self._fallback_response(user_message, snapshot, full_name)
+            return
+        
+        key = response_cache.make_key(username, user_message, snapshot.fingerprint())
+        cached = response_cache.get(key)
+        if cached is not None:
+            chat_replies.inc("llm")
+            yield cached
+            return
+        
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.timeout
+        parts = []
+        sent_any = False
+        last_chunk = None
+        try:
+            model = await asyncio.wait_for(self._model_async(), timeout=self.timeout)
+            slots = await self._acquire_slot(deadline)
+            try:
+                response = await asyncio.wait_for(
+                    model.generate_content_async(
+                        self._build_prompt(user_message, snapshot, full_name), stream=True),
+                    timeout=max(0.0, deadline - loop.time()))
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                    except StopAsyncIteration:
+                        break
+                    last_chunk = chunk  # usage metadata arrives with the last chunk
+                    if chunk.text:
+                        sent_any = True
+                        parts.append(chunk.text)
+                        yield chunk.text
+            finally:
+                slots.release()
+            self._record_call("ok", loop.time() - started, last_chunk)
+            chat_replies.inc("llm")
+            response_cache.put(key, "".join(parts), loop.time() - started)
+        except asyncio.TimeoutError:
+            self._record_call("timeout", loop.time() - started)
+            self._log_error(TimeoutError(f"Gemini stream exceeded {self.timeout}s"))
+            if not sent_any:
+                yield self._fallback_response(user_message, snapshot, full_name)
+        except Exception as e:
+            self._record_call("error", loop.time() - started)
+            self._log_error(e)
+            if not sent_any:
+                yield self._fallback_response(user_message, snapshot, full_name)
+    
+    def _fallback_response(self, user_message: str, snapshot: VitalsSnapshot, full_name: str) -> str:
+        """Provide intelligent fallback responses without API."""
+        chat_replies.inc("fallback")
+        intent, groups = intent_matcher.classify(user_message.lower())
 
-        # 4. Interpretation (Is it good/bad?)
-        if any(w in msg_lower for w in ['good', 'bad', 'normal', 'okay', 'fine', 'worry', 'dangerous', 'safe', 'indicate', 'mean']):
-            if "No recent vitals" in context:
-                return f"I can't tell yet, {full_name}. Please add some health readings first so I can analyze them for you. 📊"
-            
-            if "⚠️ Abnormal" in context:
-                return f"I see some values that are flagged as abnormal, {full_name}. It's best not to worry, but you should share these results with your doctor just to be safe. 💙"
-            elif "✅ Normal" in context:
-                return f"Yes, {full_name}! Based on your recent data, everything looks within the normal range. Keep up the good work! 🎉"
+        if intent in _FALLBACK_CHOICES:
+            return random.choice(_FALLBACK_CHOICES[intent]).format(full_name=full_name)
+        if intent in _FALLBACK_REPLIES:
+            greeting_name = f" {full_name}" if full_name else ""
+            return _FALLBACK_REPLIES[intent].format(full_name=full_name, greeting_name=greeting_name)
+
+        no_data = snapshot.user_found and not snapshot.readings
+
+        # Interpretation (Is it good/bad?)
+        if intent == "interpret":
+            if no_data:
+                status = "no_data"
+            elif snapshot.has_abnormal:
+                status = "abnormal"
+            elif snapshot.readings:
+                status = "normal"
             else:
-                return f"I'm not sure, {full_name}. I don't see enough data to give you a clear answer. Please try adding more readings."
+                status = "unknown"
+            return _INTERPRET_REPLIES[status].format(full_name=full_name)
 
-        # Check if asking about vitals (General)
-        if any(word in msg_lower for word in ['vitals', 'health', 'data', 'readings', 'condition', 'status']):
-            if "No recent vitals" in context:
-                return f"I don't see any health data recorded yet, {full_name}. Would you like to add some vitals in the Settings page? 📊"
+        # Asking about vitals (General)
+        if intent == "vitals":
+            if no_data:
+                status = "no_data"
+            elif snapshot.has_abnormal:
+                status = "abnormal"
             else:
-                if "⚠️ Abnormal" in context:
-                    return f"Here's your recent health data, {full_name}:\n\n{context}\n\nI noticed some values are outside the typical range. Please consult with your doctor to understand what this means for you. 💙"
-                else:
-                    return f"Here's what I found in your recent health data, {full_name}:\n\n{context}\n\nEverything looks good! Keep monitoring regularly. 💙"
-        
-        # Check if asking about specific vital (Value extraction or Definition)
-        import re
-        
-        def get_latest_value(vital_type, text):
-            # Regex to find lines like: - YYYY-MM-DD HH:MM: type = value unit
-            match = re.search(f"{vital_type} = ([\d\.]+) (\w+)", text)
-            if match:
-                return f"{match.group(1)} {match.group(2)}"
-            return None
+                status = "normal"
+            return _VITALS_REPLIES[status].format(full_name=full_name, context=snapshot.render())
 
-        check_keywords = ['my', 'is', 'value', 'check', 'about', 'tell']
+        # Specific vital: latest value when asking about "my ..." etc., otherwise general info
+        if intent in _VITAL_REPLIES:
+            vital_types, value_reply, missing_reply, info_reply = _VITAL_REPLIES[intent]
+            if not groups & intent_matcher.bits["check"]:
+                return info_reply
+            values = [snapshot.value_text(vital_type) for vital_type in vital_types]
+            if all(values):
+                return value_reply.format(*values)
+            return missing_reply.format(full_name=full_name)
 
-        if 'heart' in msg_lower or 'hr' in msg_lower or 'pulse' in msg_lower:
-            if any(k in msg_lower for k in check_keywords):
-                val = get_latest_value('heart_rate', context)
-                if val:
-                    return f"Your latest heart rate reading was {val}. Normal resting heart rate is typically 60-100 bpm. ❤️"
-                else:
-                    return f"I don't see a recent heart rate reading in your data, {full_name}. Please add one in the Settings page! 💓"
-            return "Your heart rate is an important indicator of cardiovascular health. Normal resting heart rate is typically 60-100 bpm. If you notice anything unusual, please consult your doctor. ❤️"
-        
-        if 'blood pressure' in msg_lower or 'bp' in msg_lower:
-            if any(k in msg_lower for k in check_keywords):
-                sys = get_latest_value('blood_pressure_sys', context)
-                dia = get_latest_value('blood_pressure_dia', context)
-                if sys and dia:
-                    return f"Your latest blood pressure was {sys} (systolic) / {dia} (diastolic). Normal is typically below 120/80. 🩺"
-                else:
-                    return f"I don't see a full blood pressure reading recently, {full_name}. Please update your vitals! 🩺"
-            return "Blood pressure is measured as systolic/diastolic (e.g., 120/80). Normal is typically below 120/80. High blood pressure should be monitored by a healthcare professional. 🩺"
-        
-        if 'oxygen' in msg_lower or 'spo2' in msg_lower:
-            if any(k in msg_lower for k in check_keywords):
-                val = get_latest_value('spo2', context)
-                if val:
-                    return f"Your latest SpO2 reading was {val}. Levels below 95% may need medical attention. 🫁"
-                else:
-                    return f"I don't see a recent SpO2 reading, {full_name}. 🫁"
-            return "Blood oxygen (SpO2) should typically be 95-100%. Levels below 95% may need medical attention. Make sure to measure it properly! 🫁"
-        
-        if 'glucose' in msg_lower or 'sugar' in msg_lower or 'diabetes' in msg_lower:
-            if any(k in msg_lower for k in check_keywords):
-                val = get_latest_value('glucose', context)
-                if val:
-                    return f"Your latest glucose reading was {val}. Normal fasting glucose is 70-100 mg/dL. 🩸"
-                else:
-                    return f"I don't see a recent glucose reading, {full_name}. 🩸"
-            return "Normal fasting glucose is 70-100 mg/dL. After meals, it can go up to 140 mg/dL. If you have diabetes, follow your doctor's guidance on target ranges. 🩸"
-        
-        if 'temperature' in msg_lower or 'fever' in msg_lower:
-            if any(k in msg_lower for k in check_keywords):
-                val = get_latest_value('temperature', context)
-                if val:
-                    return f"Your latest temperature was {val}. Normal body temperature is around 98.6°F. 🌡️"
-                else:
-                    return f"I don't see a recent temperature reading, {full_name}. 🌡️"
-            return "Normal body temperature is around 98.6°F (37°C). A fever is generally 100.4°F or higher. If you have a persistent fever, contact your doctor. 🌡️"
-        
-        # Greetings
-        if any(word in msg_lower for word in ['hello', 'hi', 'hey', 'good morning', 'good afternoon']):
-            return f"Hello{greeting_name}! 👋 I'm your AI Health Companion. I can help you understand your health data and answer questions about your vitals. How can I assist you today?"
-        
-        # General health question
-        if '?' in user_message:
-            return f"That's a great question, {full_name}! While I can help you understand your health data, I recommend discussing specific medical concerns with your doctor. Is there anything about your recent vitals you'd like me to explain? 💙"
-        
-        # Default friendly response
-        return f"I'm here to help you understand your health data, {full_name}! You can ask me about your vitals, or add new readings in the Settings page. What would you like to know? 😊"
+        return _FALLBACK_REPLIES["default"].format(full_name=full_name)
 
 # Singleton instance
 agent = HealthAgent()
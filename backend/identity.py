@@ -0,0 +1,133 @@
+"""
+COMPONENT: Identity Cache
+
+Resolves usernames and token user ids to an Identity (id, username, role,
+full_name) through an in-process LRU cache, so hot paths (ingest, dashboard,
+series, token checks) skip the users-table query after the first request.
+
+Entries are dropped whenever a User row is inserted, updated or deleted
+through the ORM (mapper events below), and the other workers drop theirs
+once the change commits (cluster.py). Code that changes users with bulk
+UPDATE/DELETE statements must call cluster.broadcast("identity", ...) itself.
+Misses are not cached, so a newly created user is found immediately.
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from cluster import cluster
+from database import User
+
+Identity = namedtuple("Identity", ["user_id", "username", "role", "full_name"])
+
+
+class IdentityCache:
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._by_username = OrderedDict()  # username -> Identity
+        self._usernames = {}               # user_id -> username
+        self._version = 0                  # bumped on every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # --- Cache management ---
+    def invalidate(self, user_id: int = None, username: str = None):
+        """Drop one user (by id and/or username), or everything when both are None."""
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            if user_id is None and username is None:
+                self._by_username.clear()
+                self._usernames.clear()
+                return
+            if user_id is not None:
+                username = self._usernames.pop(user_id, username)
+            identity = self._by_username.pop(username, None)
+            if identity is not None:
+                self._usernames.pop(identity.user_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "cached_users": len(self._by_username),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def _store(self, identities, version: int):
+        with self._lock:
+            if version != self._version:
+                return  # a user changed while we were loading; don't cache stale rows
+            for identity in identities:
+                self._by_username[identity.username] = identity
+                self._by_username.move_to_end(identity.username)
+                self._usernames[identity.user_id] = identity.username
+            while len(self._by_username) > self.max_users:
+                _, evicted = self._by_username.popitem(last=False)
+                self._usernames.pop(evicted.user_id, None)
+
+    # --- Lookups ---
+    def by_usernames(self, db: Session, usernames) -> dict:
+        """{username: Identity} for the usernames that exist; one query for all misses."""
+        found = {}
+        missing = []
+        with self._lock:
+            for username in set(usernames):
+                identity = self._by_username.get(username)
+                if identity is None:
+                    missing.append(username)
+                else:
+                    self._by_username.move_to_end(username)
+                    found[username] = identity
+            self.hits += len(found)
+            self.misses += len(missing)
+            version = self._version
+        if missing:
+            loaded = [
+                Identity(*row) for row in
+                db.query(User.id, User.username, User.role, User.full_name).filter(User.username.in_(missing)).all()
+            ]
+            if self.max_users > 0:
+                self._store(loaded, version)
+            found.update((identity.username, identity) for identity in loaded)
+        return found
+
+    def by_username(self, db: Session, username: str):
+        return self.by_usernames(db, [username]).get(username)
+
+    def by_id(self, db: Session, user_id: int):
+        with self._lock:
+            username = self._usernames.get(user_id)
+            identity = self._by_username.get(username) if username is not None else None
+            if identity is not None:
+                self._by_username.move_to_end(username)
+                self.hits += 1
+                return identity
+            self.misses += 1
+            version = self._version
+        row = db.query(User.id, User.username, User.role, User.full_name).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        if self.max_users > 0:
+            self._store([identity], version)
+        return identity
+
+
+# Singleton instance
+identity_cache = IdentityCache(max_users=int(os.getenv("IDENTITY_CACHE_SIZE", "10000")))
+cluster.on("identity", identity_cache.invalidate)
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    identity_cache.invalidate(user_id=target.id, username=target.username)
+    cluster.broadcast_after_commit(object_session(target), "identity", user_id=target.id, username=target.username)
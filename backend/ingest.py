@@ -0,0 +1,127 @@
+"""
+COMPONENT: Vital Ingestion (shared write path)
+
+Both POST /api/v1/ingest and POST /api/v1/ingest/batch go through
+store_vitals(). A call resolves every username through the identity cache
+(identity.py; one query for all misses), evaluates the whole batch against
+the cached threshold rules (thresholds.py), and writes the Vital rows with
+one bulk INSERT inside a single transaction (one commit, one fsync). The
+latest_vitals and vital_rollups tables (rollups.py) are upserted in the same
+transaction. Abnormal readings are handed to the alert pipeline (alerts.py),
+which creates, collapses and escalates alerts in a background worker.
+Every reading is also scored against the user's own baseline by the anomaly
+detector (anomaly.py), whose state is checkpointed in the same transaction
+when due.
+After the commit, each user with open dashboard streams gets one delta of
+the new vitals (pubsub.py); alert changes follow from the worker.
+"""
+
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from database import Vital
+from alerts import alert_pipeline, PendingAlert
+from anomaly import anomaly_detector
+from identity import identity_cache
+from rollups import upsert_latest_vitals, upsert_vital_rollups
+from thresholds import threshold_engine
+from chat_cache import response_cache
+from pubsub import pubsub, user_channel
+from serialization import dumps
+
+# Upper bound for a single batch request (readings per request).
+MAX_BATCH_SIZE = 10000
+
+# A delta never carries more than the dashboard shows
+DELTA_VITALS = 50
+DELTA_ALERTS = 5
+
+
+def naive_utc(timestamp: datetime) -> datetime:
+    """Columns store naive UTC, like datetime.utcnow() defaults."""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def store_vitals(db: Session, readings) -> list:
+    """Persist a list of readings (objects with username/type/value/unit and
+    an optional timestamp). Returns one result dict per reading, in order."""
+    identities = identity_cache.by_usernames(db, {r.username for r in readings})
+    user_ids = {username: identity.user_id for username, identity in identities.items()}
+
+    now = datetime.utcnow()
+    results = [None] * len(readings)
+    accepted = []
+    for index, reading in enumerate(readings):
+        user_id = user_ids.get(reading.username)
+        if user_id is None:
+            results[index] = {"status": "error", "detail": "User not found"}
+        else:
+            accepted.append((index, user_id, reading))
+
+    checks = threshold_engine.evaluate_batch(
+        db,
+        [user_id for _, user_id, _ in accepted],
+        [reading.type for _, _, reading in accepted],
+        [reading.value for _, _, reading in accepted],
+    )
+
+    vital_rows = []
+    row_indexes = []
+    abnormal = []
+    recorded_users = set()
+    for (index, user_id, reading), (is_abnormal, alert_msg) in zip(accepted, checks):
+        timestamp = naive_utc(getattr(reading, "timestamp", None) or now)
+        if is_abnormal:
+            abnormal.append(PendingAlert(user_id, reading.type, reading.value, timestamp, alert_msg))
+        vital_rows.append({
+            "user_id": user_id,
+            "timestamp": timestamp,
+            "type": reading.type,
+            "value": reading.value,
+            "unit": reading.unit,
+            "is_abnormal": is_abnormal,
+        })
+        results[index] = {"status": "recorded", "abnormal": is_abnormal}
+        row_indexes.append(index)
+        recorded_users.add(user_id)
+
+    # Flags against the user's own baseline; only present when one fired
+    for index, flags in zip(row_indexes, anomaly_detector.score_batch(vital_rows)):
+        if flags:
+            results[index]["anomalies"] = list(flags)
+
+    if vital_rows:
+        db.execute(insert(Vital), vital_rows)
+        upsert_latest_vitals(db, vital_rows)
+        upsert_vital_rollups(db, vital_rows)
+    staged_alerts = alert_pipeline.stage(db, abnormal)
+    if anomaly_detector.checkpoint_due():
+        anomaly_detector.checkpoint(db)
+    db.commit()
+    alert_pipeline.committed(staged_alerts)
+
+    # Cached chat answers for these users were based on older vitals
+    for username, user_id in user_ids.items():
+        if user_id in recorded_users:
+            response_cache.invalidate_user(username)
+    publish_deltas(vital_rows, [])
+    return results
+
+
+def publish_deltas(vital_rows: list, alerts: list):
+    """One dashboard delta per user, shaped like GET /api/v1/dashboard rows.
+    `alerts` are alert payloads (alerts.alert_payload)."""
+    by_user = {}
+    for row in vital_rows:
+        if pubsub.has_subscribers(user_channel(row["user_id"])):
+            by_user.setdefault(row["user_id"], ([], []))[0].append(row)
+    for alert in alerts:
+        if pubsub.has_subscribers(user_channel(alert["user_id"])):
+            by_user.setdefault(alert["user_id"], ([], []))[1].append(alert)
+
+    for user_id, (vitals, alerts) in by_user.items():
+        vitals = sorted(vitals, key=lambda row: row["timestamp"], reverse=True)[:DELTA_VITALS]
+        alerts = sorted(alerts, key=lambda alert: alert["created_at"], reverse=True)[:DELTA_ALERTS]
+        pubsub.publish(user_channel(user_id), dumps({"vitals": vitals, "alerts": alerts}).decode())
@@ -0,0 +1,134 @@
+"""
+COMPONENT: Intent Classifier for fallback chat responses
+
+All keyword groups used by HealthAgent._fallback_response are compiled once
+into a single trie-shaped regex. One scan of the lowercased message returns
+a bitmask of every group with a keyword anywhere in the text (the same
+answer as running `keyword in message` for each keyword), and the intent is
+the first rule in INTENT_RULES whose groups are all present.
+
+How the single scan stays exact: the pattern is a lookahead, so it is tried
+at every position and returns the longest keyword starting there. Any
+shorter keyword matching at the same position is a prefix of that longest
+one, so each keyword's mask also includes the groups of its prefix keywords.
+"""
+
+import re
+from collections import OrderedDict
+
+KEYWORD_GROUPS = OrderedDict([
+    ("how_are_you", ["how are you"]),
+    ("identity_user", ["my name", "who am i", "know me"]),
+    ("identity_bot", ["who are you", "who're you", "who'r you", "your name"]),
+    ("manage", ["manage", "control", "controll", "reduce", "lower", "improve", "fix", "how to",
+                "what do", "what i do", "normalize", "maintain"]),
+    ("bp_topic", ["blood pressure", "bp", "pressure"]),
+    ("hr_topic", ["heart rate", "heart", "hr", "pulse", "heartbeat"]),
+    ("glucose_topic", ["glucose", "sugar", "blood sugar", "diabetes"]),
+    ("spo2_topic", ["spo2", "oxygen", "o2", "saturation"]),
+    ("temp_topic", ["temperature", "temp", "fever"]),
+    ("exercise", ["exercise", "excise", "work out", "workout", "walk", "run"]),
+    ("diet", ["diet", "food", "eat", "nutrition"]),
+    ("advice", ["how to", "make it normal", "improve", "fix", "advice", "change", "control", "controll",
+                "tips", "tip", "suggestion", "suggestions",
+                "what should i do", "what do i do", "what i do", "what can i do", "what i so", "so what i do"]),
+    ("interpret", ["good", "bad", "normal", "okay", "fine", "worry", "dangerous", "safe", "indicate", "mean"]),
+    ("vitals", ["vitals", "health", "data", "readings", "condition", "status"]),
+    ("check", ["my", "is", "value", "check", "about", "tell"]),
+    ("heart", ["heart", "hr", "pulse"]),
+    ("blood_pressure", ["blood pressure", "bp"]),
+    ("oxygen", ["oxygen", "spo2"]),
+    ("glucose", ["glucose", "sugar", "diabetes"]),
+    ("temperature", ["temperature", "fever"]),
+    ("greeting", ["hello", "hi", "hey", "good morning", "good afternoon"]),
+    ("question", ["?"]),
+])
+
+# Priority order: the first rule whose groups are all present wins
+INTENT_RULES = [
+    ("how_are_you", ("how_are_you",)),
+    ("identity_user", ("identity_user",)),
+    ("identity_bot", ("identity_bot",)),
+    ("manage_bp", ("bp_topic", "manage")),
+    ("manage_hr", ("hr_topic", "manage")),
+    ("manage_glucose", ("glucose_topic", "manage")),
+    ("manage_spo2", ("spo2_topic", "manage")),
+    ("manage_temperature", ("temp_topic", "manage")),
+    ("exercise", ("exercise",)),
+    ("diet", ("diet",)),
+    ("advice", ("advice",)),
+    ("interpret", ("interpret",)),
+    ("vitals", ("vitals",)),
+    ("heart", ("heart",)),
+    ("blood_pressure", ("blood_pressure",)),
+    ("oxygen", ("oxygen",)),
+    ("glucose", ("glucose",)),
+    ("temperature", ("temperature",)),
+    ("greeting", ("greeting",)),
+    ("question", ("question",)),
+]
+
+
+def _trie_pattern(words) -> str:
+    """Regex for a set of literals, shaped as a trie so matching is one pass
+    over shared prefixes instead of one attempt per alternative."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def render(node):
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional suffix: the longest keyword at a position wins
+        return "(?:" + body + ")?" if "" in node else body
+
+    return render(trie)
+
+
+class IntentMatcher:
+    def __init__(self, groups, rules):
+        self.bits = {name: 1 << i for i, name in enumerate(groups)}
+
+        own = {}
+        for name, keywords in groups.items():
+            for keyword in keywords:
+                own[keyword] = own.get(keyword, 0) | self.bits[name]
+        # A match reports the longest keyword at a position; fold in the
+        # groups of every keyword that is a prefix of it
+        self._masks = {
+            keyword: _prefix_mask(keyword, own)
+            for keyword in own
+        }
+        self._pattern = re.compile("(?=(" + _trie_pattern(own) + "))")
+        self._rules = [(intent, sum(self.bits[g] for g in required)) for intent, required in rules]
+
+    def scan(self, text: str) -> int:
+        mask = 0
+        masks = self._masks
+        for keyword in self._pattern.findall(text):
+            mask |= masks[keyword]
+        return mask
+
+    def classify(self, text: str):
+        """Return (intent or None, group bitmask) for a lowercased message."""
+        mask = self.scan(text)
+        for intent, required in self._rules:
+            if mask & required == required:
+                return intent, mask
+        return None, mask
+
+
+def _prefix_mask(keyword: str, own: dict) -> int:
+    mask = 0
+    for end in range(1, len(keyword) + 1):
+        mask |= own.get(keyword[:end], 0)
+    return mask
+
+
+# Singleton instance
+intent_matcher = IntentMatcher(KEYWORD_GROUPS, INTENT_RULES)
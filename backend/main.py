@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, Request, Query, Header
 from fastapi.staticfiles import StaticFiles
 
 """
@@ -9,30 +9,80 @@ DESCRIPTION:
 This API serves as the central hub for the Health Companion application.
 It handles:
 1.  Health Data Ingestion: Receives vital signs (HR, BP, SpO2) from the frontend.
-2.  Data Processing: Analyzes vitals for abnormalities and triggers alerts.
+2.  Data Processing: Analyzes vitals for abnormalities and triggers alerts
+    (collapsed, escalated and resolved by a background worker, alerts.py).
 3.  AI Integration: Routes chat messages to the Gemini Health Agent.
 4.  User Management: Handles authentication for elderly users and caregivers.
+    Login returns a signed session token (tokens.py); data endpoints accept it
+    as `Authorization: Bearer <token>` and require it when REQUIRE_AUTH is set.
 
 ENDPOINTS:
 -   POST /api/v1/ingest: Process new health data.
+-   POST /api/v1/ingest/batch: Bulk-ingest buffered readings (JSON array or NDJSON).
 -   POST /api/v1/chat: Interact with the AI Health Companion.
+-   POST /api/v1/chat/stream: Same, streamed as Server-Sent Events.
+-   GET /api/v1/chat/metrics: Chat response cache statistics.
 -   GET /api/v1/dashboard/{username}: Retrieve processed health insights.
+-   GET /api/v1/dashboard/{username}/events: Live dashboard deltas (Server-Sent Events).
+-   GET /api/v1/stream/metrics: Open dashboard streams and fan-out counters.
+-   POST /api/v1/alerts/{alert_id}/resolve: Mark an alert as handled.
+-   GET /api/v1/alerts/metrics: Alert worker queue and counters.
+-   GET /api/v1/caregiver/{username}/overview: Latest vitals and open alerts of every assigned patient.
+-   PUT/DELETE /api/v1/caregiver/{username}/patients/{patient}: Assign or unassign a patient.
+-   GET /api/v1/vitals/{username}/series: Min/max/avg/count/last per time bucket.
+-   GET /api/v1/vitals/{username}/baseline: The user's learned baseline and trend per vital type.
+-   GET /api/v1/anomalies/metrics: Anomaly detector state size and flag counts.
+-   GET /api/v1/retention/metrics: Retention policy and what the compaction job removed.
+-   GET /api/v1/cluster/metrics: This worker's node id, leadership and broadcast counters.
+-   GET /api/v1/export/vitals: Stream vitals history as CSV, NDJSON, Parquet or Arrow.
+-   GET /metrics: Request, query and LLM counters and latencies (Prometheus text format, metrics.py).
+-   /api/v1/admin/thresholds: CRUD for per-user and default alert thresholds (admin token).
 """
 
+import json
+import logging
+import os
+import threading
+import anyio
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from pydantic import BaseModel, ValidationError
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 import database
-from database import get_db, User, Vital, Alert
+from database import get_db, User, Vital, Alert, Threshold, CaregiverPatient
+from ingest import store_vitals, publish_deltas, naive_utc, MAX_BATCH_SIZE
+import caregivers
+from alerts import alert_pipeline, alert_payload, ALERT_PAYLOAD_COLUMNS
+from anomaly import anomaly_detector
+from retention import retention_job
+from rollups import BUCKETS, choose_bucket, query_series, MAX_RAW_POINTS
+import export
+from thresholds import threshold_engine
+from passwords import password_hasher, hash_password
+from seed import seed_demo_data
+from rate_limit import login_user_limiter, login_ip_limiter, retry_after
+from tokens import issue_token, decode_token, InvalidToken
+from identity import identity_cache, Identity
+from chat_cache import response_cache
+from cluster import cluster
+from pubsub import pubsub, user_channel, LAGGED
 from gemini_health_agent import agent
+from metrics import MetricsMiddleware, instrument_engine, registry
+from serialization import FastJSONResponse
 
-app = FastAPI(title="AI Elderly Health Companion")
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per outgoing request
+logger = logging.getLogger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+app = FastAPI(title="AI Elderly Health Companion")
+app.add_middleware(MetricsMiddleware)
+instrument_engine(database.engine)
 
 # Allow CORS for local development
 app.add_middleware(
@@ -51,6 +101,7 @@ class VitalInput(BaseModel):
     type: str
     value: float
     unit: str
+    timestamp: Optional[datetime] = None  # Device time for buffered uploads
 
 class ChatRequest(BaseModel):
     username: str
@@ -63,7 +114,6 @@ class SignupRequest(BaseModel):
     username: str
     password: str
     full_name: str
-    role: str = "elderly"
 
 class LoginRequest(BaseModel):
     username: str
@@ -73,151 +123,708 @@ class UserResponse(BaseModel):
     username: str
     full_name: str
     role: str
+    access_token: Optional[str] = None  # send as "Authorization: Bearer <token>"
+    token_type: str = "bearer"
+
+# Dashboard payload; timestamps are UTC ISO 8601 with a trailing 'Z'
+class DashboardVital(BaseModel):
+    id: int
+    user_id: int
+    timestamp: datetime
+    type: str
+    value: float
+    unit: Optional[str]
+    is_abnormal: bool
+
+class DashboardAlert(BaseModel):
+    id: int
+    user_id: int
+    vital_type: Optional[str]
+    message: str
+    severity: str
+    created_at: datetime
+    last_seen_at: datetime
+    occurrences: int
+    resolved: bool
+    resolved_at: Optional[datetime]
+
+class DashboardResponse(BaseModel):
+    user: Optional[str]
+    vitals: List[DashboardVital]
+    alerts: List[DashboardAlert]
+
+class ThresholdInput(BaseModel):
+    username: Optional[str] = None  # None = default rule for all users
+    vital_type: str
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+class ThresholdResponse(BaseModel):
+    id: int
+    username: Optional[str]
+    vital_type: str
+    min_value: Optional[float]
+    max_value: Optional[float]
 
 # --- Startup ---
+# Cloud Run serves the first request right after startup() returns, so only
+# what requests cannot do without runs here (tables, demo users); the Gemini
+# SDK loads on the first chat (gemini_health_agent.py) and the rest warms up
+# in a background thread.
+# With several workers (CLUSTER_BACKEND, cluster.py) they create tables and
+# seed one at a time, and the periodic jobs run on the elected leader only.
+SEED_DEMO_DATA = os.getenv("SEED_DEMO_DATA", "true").lower() in ("1", "true", "yes")
+
+cluster.on_leadership(alert_pipeline.set_leading)
+cluster.on_leadership(anomaly_detector.set_leading)
+if os.getenv("RETENTION_JOB", "true").lower() in ("1", "true", "yes"):
+    cluster.on_leadership(lambda leading: retention_job.start() if leading else retention_job.stop())
+
 @app.on_event("startup")
 def startup():
-    database.init_db()
-    # Seed data if empty (simplified)
-    db = database.SessionLocal()
-    if not db.query(User).first():
-        # Create default users with hashed passwords
-        hashed_pw = pwd_context.hash("password123")
-        db.add(User(username="grandpa_joe", password_hash=hashed_pw, role="elderly", full_name="Joe Smith"))
-        db.add(User(username="nurse_sarah", password_hash=hashed_pw, role="caregiver", full_name="Sarah Jones"))
+    if cluster.shared and not os.getenv("SESSION_SECRET"):
+        # Each worker would sign tokens with its own random key
+        raise RuntimeError("SESSION_SECRET must be set when CLUSTER_BACKEND shares state between workers")
+    with cluster.exclusive("startup"):
+        database.init_db()
+        if SEED_DEMO_DATA:
+            with database.SessionLocal() as db:
+                seed_demo_data(db)
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+    cluster.start()
+    if os.getenv("ALERT_WORKER", "true").lower() in ("1", "true", "yes"):
+        alert_pipeline.start()
+
+def _warm_up():
+    # Anomaly baselines: last checkpoint plus a replay of newer vitals.
+    # Readings ingested meanwhile are scored against a partial baseline.
+    with database.SessionLocal() as db:
+        replayed = anomaly_detector.warm(db)
+    if replayed:
+        logger.info("Anomaly detector: replayed %d readings", replayed)
+
+@app.on_event("shutdown")
+def shutdown():
+    cluster.stop()  # hands leadership to another worker right away
+    alert_pipeline.stop()
+    retention_job.stop()
+    anomaly_detector.stop()
+    with database.SessionLocal() as db:
+        anomaly_detector.checkpoint(db)
         db.commit()
-    db.close()
+    password_hasher.shutdown()
 
 # --- Endpoints ---
 
 
 
+# Authentication
+# Without REQUIRE_AUTH, requests without a token keep working as before;
+# a token, when sent, is always verified and scopes access.
+REQUIRE_AUTH = os.getenv("REQUIRE_AUTH", "false").lower() in ("1", "true", "yes")
+STAFF_ROLES = ("caregiver", "admin")  # may access any user's data
+
+def current_identity(authorization: Optional[str] = Header(None), db: Session = Depends(get_db)) -> Optional[Identity]:
+    """The caller, from an `Authorization: Bearer <token>` header. Resolved
+    through the identity cache, so a warm request runs no users query."""
+    if not authorization:
+        if REQUIRE_AUTH:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Expected a Bearer token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = decode_token(token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    # Role and name come from the (invalidated-on-change) cache, not the token
+    identity = identity_cache.by_id(db, claims["user_id"])
+    if identity is None:
+        raise HTTPException(status_code=401, detail="User no longer exists", headers={"WWW-Authenticate": "Bearer"})
+    return identity
+
+def _may_access(caller: Optional[Identity], username: Optional[str]) -> bool:
+    """username=None means every user's data."""
+    return caller is None or caller.role in STAFF_ROLES or caller.username == username
+
+def _authorize(caller: Optional[Identity], username: Optional[str]):
+    if not _may_access(caller, username):
+        raise HTTPException(status_code=403, detail="Not allowed to access this user's data")
+
+def require_admin(caller: Optional[Identity] = Depends(current_identity)) -> Identity:
+    """Admin routes always need an admin token, even without REQUIRE_AUTH."""
+    if caller is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    if caller.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return caller
+
+def _resolve_user(db: Session, username: str) -> Identity:
+    identity = identity_cache.by_username(db, username)
+    if identity is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return identity
+
 # Authentication Endpoints
+def _check_login_rate(username: str, http_request: Request):
+    """Reject before any bcrypt work when a username or client IP is over its limit."""
+    client_ip = http_request.client.host if http_request.client else "unknown"
+    wait = max(login_ip_limiter.hit(f"ip:{client_ip}"), login_user_limiter.hit(f"user:{username}"))
+    if wait:
+        raise HTTPException(status_code=429, detail="Too many attempts, please try again later",
+                            headers={"Retry-After": retry_after(wait)})
+
+def _find_user(username: str):
+    with database.SessionLocal() as db:
+        return db.query(User.id, User.username, User.full_name, User.role, User.password_hash) \
+            .filter(User.username == username).first()
+
+def _create_user(request: SignupRequest, password_hash: str) -> bool:
+    with database.SessionLocal() as db:
+        db.add(User(
+            username=request.username,
+            password_hash=password_hash,
+            full_name=request.full_name,
+            role="elderly"  # staff roles are never self-assigned
+        ))
+        try:
+            db.commit()
+        except IntegrityError:  # taken while the password was being hashed
+            return False
+    return True
+
+def _update_password_hash(user_id: int, password_hash: str):
+    with database.SessionLocal() as db:
+        db.query(User).filter(User.id == user_id).update({"password_hash": password_hash})
+        db.commit()
+
 @app.post("/api/v1/auth/signup")
-def signup(request: SignupRequest, db: Session = Depends(get_db)):
+async def signup(request: SignupRequest, http_request: Request):
+    _check_login_rate(request.username, http_request)
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == request.username).first()
-    if existing_user:
+    if await run_in_threadpool(_find_user, request.username):
         raise HTTPException(status_code=400, detail="Username already exists")
     
-    # Hash password
-    hashed_password = pwd_context.hash(request.password)
+    # Hash password (process pool, off the request threads)
+    hashed_password = await password_hasher.hash(request.password)
     
     # Create new user
-    new_user = User(
-        username=request.username,
-        password_hash=hashed_password,
-        full_name=request.full_name,
-        role=request.role
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    if not await run_in_threadpool(_create_user, request, hashed_password):
+        raise HTTPException(status_code=400, detail="Username already exists")
     
-    return {"message": "User created successfully", "username": new_user.username}
+    return {"message": "User created successfully", "username": request.username}
 
 @app.post("/api/v1/auth/login", response_model=UserResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, http_request: Request):
+    _check_login_rate(request.username, http_request)
     # Find user
-    user = db.query(User).filter(User.username == request.username).first()
+    user = await run_in_threadpool(_find_user, request.username)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
     
-    # Verify password
-    if not pwd_context.verify(request.password, user.password_hash):
+    # Verify password; upgrade the stored hash if its bcrypt cost is outdated
+    valid, new_hash = await password_hasher.verify(request.password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid username or password")
+    if new_hash:
+        await run_in_threadpool(_update_password_hash, user.id, new_hash)
+    login_user_limiter.reset(f"user:{user.username}")
     
     return UserResponse(
         username=user.username,
         full_name=user.full_name,
-        role=user.role
+        role=user.role,
+        access_token=issue_token(user.id, user.username, user.role)
     )
 
 @app.post("/api/v1/ingest")
-def ingest_vital(data: VitalInput, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == data.username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+def ingest_vital(data: VitalInput, db: Session = Depends(get_db),
+                 caller: Optional[Identity] = Depends(current_identity)):
+    _authorize(caller, data.username)
+    result = store_vitals(db, [data])[0]
+    if result["status"] != "recorded":
+        raise HTTPException(status_code=404, detail=result["detail"])
     
-    # ==========================================
-    # ALERT GENERATION LOGIC
-    # ==========================================
-    # Checks thresholds for HR, BP, SpO2, Glucose, Temp
-    # Generates Alert records if abnormal
-    # ==========================================
-    # Basic Threshold Check (Mock Logic)
-    is_abnormal = False
-    alert_msg = ""
+    return result  # {"status": "recorded", "abnormal": ...} plus "anomalies" when flagged
+
+@app.post("/api/v1/ingest/batch")
+async def ingest_batch(request: Request, caller: Optional[Identity] = Depends(current_identity)):
+    """
+    Bulk ingestion for wearables uploading buffered samples.
+    Body is either a JSON array of VitalInput objects or NDJSON
+    (Content-Type: application/x-ndjson), one reading per line.
+    Returns one result per item, in request order.
+    """
+    if "ndjson" in request.headers.get("content-type", ""):
+        raw_items = await _read_ndjson(request)
+    else:
+        try:
+            raw_items = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+
+    if len(raw_items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} readings")
+
+    # Validate each item; invalid items are reported, not fatal for the batch
+    results = [None] * len(raw_items)
+    readings, positions = [], []
+    for index, item in enumerate(raw_items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Item must be a JSON object")
+            reading = VitalInput(**item)
+            if not _may_access(caller, reading.username):
+                raise ValueError("Not allowed to access this user's data")
+            readings.append(reading)
+            positions.append(index)
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results[index] = {"index": index, "status": "error", "detail": detail}
+        except ValueError as e:
+            results[index] = {"index": index, "status": "error", "detail": str(e)}
+
+    stored = await run_in_threadpool(_store_batch, readings)
+    for index, result in zip(positions, stored):
+        results[index] = {"index": index, **result}
+
+    recorded = sum(1 for r in results if r["status"] == "recorded")
+    return {
+        "status": "ok",
+        "recorded": recorded,
+        "failed": len(results) - recorded,
+        "results": results,
+    }
+
+async def _read_ndjson(request: Request) -> list:
+    """Parse an NDJSON body incrementally as chunks arrive."""
+    items = []
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            _append_ndjson_line(items, line)
+    _append_ndjson_line(items, buffer)
+    return items
+
+def _append_ndjson_line(items: list, line: bytes):
+    line = line.strip()
+    if not line:
+        return
+    try:
+        items.append(json.loads(line))
+    except ValueError:
+        # Keep the position so the client sees which line was rejected
+        items.append(None)
+
+def _store_batch(readings: list) -> list:
+    db = database.SessionLocal()
+    try:
+        return store_vitals(db, readings)
+    finally:
+        db.close()
+
+@app.post("/api/v1/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, caller: Optional[Identity] = Depends(current_identity)):
+    _authorize(caller, request.username)
+    response_text = await agent.chat_async(request.message, request.username)
+    return {"response": response_text}
+
+@app.post("/api/v1/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, caller: Optional[Identity] = Depends(current_identity)):
+    """
+    Server-Sent Events version of /api/v1/chat. Each text chunk is sent as
+    `data: {"delta": "..."}` as soon as it arrives, then `event: done`.
+    """
+    _authorize(caller, request.username)
+    async def events():
+        async for delta in agent.chat_stream(request.message, request.username):
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/v1/chat/metrics")
+def chat_metrics():
+    """Response cache effectiveness: hit rate, coalesced calls, upstream seconds saved."""
+    return response_cache.stats()
+
+DASHBOARD_VITAL_COLUMNS = (Vital.id, Vital.user_id, Vital.timestamp, Vital.type, Vital.value, Vital.unit,
+                           Vital.is_abnormal)
+
+# DashboardResponse documents the payload only (responses=): it is not a
+# response_model, because the handler returns the response itself
+@app.get("/api/v1/dashboard/{username}", response_class=FastJSONResponse,
+         responses={200: {"model": DashboardResponse}})
+def get_dashboard(username: str, db: Session = Depends(get_db),
+                  caller: Optional[Identity] = Depends(current_identity)):
+    # Column tuples straight into the encoder: no ORM instances to build and
+    # walk, no response-model validation of rows the database already typed
+    _authorize(caller, username)
+    user = _resolve_user(db, username)
     
-    if data.type == "heart_rate" and (data.value < 50 or data.value > 100):
-        is_abnormal = True
-        alert_msg = f"Abnormal HR detected ({data.value} bpm)"
-    elif data.type == "blood_pressure_sys" and (data.value < 90 or data.value > 140):
-        is_abnormal = True
-        alert_msg = f"Abnormal BP (Sys) detected ({data.value} mmHg)"
-    elif data.type == "blood_pressure_dia" and (data.value < 60 or data.value > 90):
-        is_abnormal = True
-        alert_msg = f"Abnormal BP (Dia) detected ({data.value} mmHg)"
-    elif data.type == "spo2" and data.value < 95:
-        is_abnormal = True
-        alert_msg = f"Low SpO2 detected ({data.value}%)"
-    elif data.type == "glucose" and data.value > 140:
-        is_abnormal = True
-        alert_msg = f"High Glucose detected ({data.value} mg/dL)"
-    elif data.type == "temperature" and data.value > 99.5:
-        is_abnormal = True
-        alert_msg = f"High Temperature detected ({data.value}°F)"
-
-    if is_abnormal:
-        alert = Alert(
-            user_id=user.id, 
-            severity="medium", 
-            message=alert_msg
-        )
-        db.add(alert)
+    recent_vitals = db.execute(select(*DASHBOARD_VITAL_COLUMNS).where(Vital.user_id == user.user_id)
+                               .order_by(Vital.timestamp.desc()).limit(50))
+    recent_alerts = db.execute(select(*ALERT_PAYLOAD_COLUMNS).where(Alert.user_id == user.user_id)
+                               .order_by(Alert.created_at.desc()).limit(5))
     
-    new_vital = Vital(
-        user_id=user.id,
-        type=data.type,
-        value=data.value,
-        unit=data.unit,
-        is_abnormal=is_abnormal
+    return FastJSONResponse({
+        "user": user.full_name,
+        "vitals": [row._asdict() for row in recent_vitals],
+        "alerts": [row._asdict() for row in recent_alerts],
+    })
+
+@app.post("/api/v1/alerts/{alert_id}/resolve")
+def resolve_alert(alert_id: int, db: Session = Depends(get_db),
+                  caller: Optional[Identity] = Depends(current_identity)):
+    """Mark an alert as handled (e.g. by a caregiver) before its vital recovers."""
+    alert = db.get(Alert, alert_id)
+    owner = identity_cache.by_id(db, alert.user_id) if alert is not None else None
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    _authorize(caller, owner.username)
+    if not alert.resolved:
+        alert.resolved = True
+        alert.resolved_at = datetime.utcnow()
+        db.commit()
+    payload = alert_payload(alert)
+    publish_deltas([], [payload])
+    return payload
+
+@app.get("/api/v1/alerts/metrics")
+def alert_metrics():
+    """Alert worker: backend, queued events, processed and resolved counts."""
+    return alert_pipeline.stats()
+
+# Comment line every so often so proxies keep an idle stream open
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+@app.get("/api/v1/dashboard/{username}/events")
+def dashboard_events(username: str, db: Session = Depends(get_db),
+                     caller: Optional[Identity] = Depends(current_identity)):
+    """
+    Server-Sent Events stream of dashboard changes for one user:
+    `event: ready` once subscribed (load the dashboard then), `event: delta`
+    with {"vitals": [...], "alerts": [...]} after every ingest, and
+    `event: resync` if deltas were dropped because the client fell behind.
+    """
+    _authorize(caller, username)
+    user = _resolve_user(db, username)
+    db.close()  # the stream may stay open for hours; do not hold a connection
+
+    async def events():
+        subscription = pubsub.subscribe(user_channel(user.user_id))
+        try:
+            yield "event: ready\ndata: {}\n\n"
+            while True:
+                message = await subscription.get(STREAM_HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": ping\n\n"
+                elif message is LAGGED:
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    yield f"event: delta\ndata: {message}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    db.add(new_vital)
+
+@app.get("/api/v1/stream/metrics")
+def dashboard_stream_metrics():
+    """Open dashboard streams and delta fan-out counters."""
+    return pubsub.stats()
+
+# Caregiver overview
+def _resolve_caregiver(db: Session, username: str, caller: Optional[Identity]) -> Identity:
+    """The caregiver themself or an admin (or anyone without REQUIRE_AUTH)."""
+    if caller is not None and caller.role != "admin" and caller.username != username:
+        raise HTTPException(status_code=403, detail="Not allowed to access this caregiver's patients")
+    caregiver = _resolve_user(db, username)
+    if caregiver.role not in STAFF_ROLES:
+        raise HTTPException(status_code=400, detail=f"{username} is not a caregiver")
+    return caregiver
+
+@app.get("/api/v1/caregiver/{username}/overview")
+def caregiver_overview(
+    username: str,
+    limit: int = Query(caregivers.DEFAULT_PAGE_SIZE, ge=1, le=caregivers.MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    caller: Optional[Identity] = Depends(current_identity),
+):
+    """
+    Latest vitals and open alerts for a page of the caregiver's patients,
+    ordered by username. Pass `next` back as `after` for the following page.
+    Four queries per page whatever its size; send the ETag as If-None-Match
+    to get 304 after two when nothing on the page has changed.
+    """
+    caregiver = _resolve_caregiver(db, username, caller)
+    patients, next_cursor = caregivers.patient_page(db, caregiver.user_id, after, limit)
+    etag = caregivers.overview_etag(db, caregiver.user_id, patients, next_cursor)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({
+        "caregiver": caregiver.username,
+        "patients": caregivers.build_overview(db, patients),
+        "next": next_cursor,
+    }, headers=headers)
+
+@app.put("/api/v1/caregiver/{username}/patients/{patient}")
+def assign_patient(username: str, patient: str, db: Session = Depends(get_db),
+                   caller: Optional[Identity] = Depends(current_identity)):
+    caregiver = _resolve_caregiver(db, username, caller)
+    patient_id = _resolve_user(db, patient).user_id
+    if db.get(CaregiverPatient, (caregiver.user_id, patient_id)) is None:
+        db.add(CaregiverPatient(caregiver_id=caregiver.user_id, patient_id=patient_id))
+        try:
+            db.commit()
+        except IntegrityError:  # assigned concurrently
+            db.rollback()
+    return {"status": "assigned", "caregiver": username, "patient": patient}
+
+@app.delete("/api/v1/caregiver/{username}/patients/{patient}")
+def unassign_patient(username: str, patient: str, db: Session = Depends(get_db),
+                     caller: Optional[Identity] = Depends(current_identity)):
+    caregiver = _resolve_caregiver(db, username, caller)
+    patient_id = _resolve_user(db, patient).user_id
+    assignment = db.get(CaregiverPatient, (caregiver.user_id, patient_id))
+    if assignment is None:
+        raise HTTPException(status_code=404, detail="Patient is not assigned to this caregiver")
+    db.delete(assignment)
     db.commit()
-    
-    return {"status": "recorded", "abnormal": is_abnormal}
+    return {"status": "unassigned", "caregiver": username, "patient": patient}
 
-@app.post("/api/v1/chat", response_model=ChatResponse)
-def chat_endpoint(request: ChatRequest):
-    response_text = agent.chat(request.message, request.username)
-    return {"response": response_text}
+@app.get("/api/v1/vitals/{username}/series")
+def get_vital_series(
+    username: str,
+    type: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: str = "auto",
+    db: Session = Depends(get_db),
+    caller: Optional[Identity] = Depends(current_identity),
+):
+    """Aggregates per time bucket for one vital type. `from` defaults to 24h
+    before `to` (default now). `bucket` is raw, 1m, 1h, 1d or auto."""
+    if bucket not in ("auto", "raw") and bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: auto, raw, {', '.join(BUCKETS)}")
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'")
+
+    _authorize(caller, username)
+    user_id = _resolve_user(db, username).user_id
+
+    if bucket == "auto":
+        bucket = choose_bucket(start, end)
+    points = query_series(db, user_id, type, start, end, bucket)
+    for point in points:
+        point["start"] = point["start"].isoformat() + 'Z'
+    return {
+        "username": username,
+        "type": type,
+        "bucket": bucket,
+        "from": start.isoformat() + 'Z',
+        "to": end.isoformat() + 'Z',
+        "truncated": bucket == "raw" and len(points) == MAX_RAW_POINTS,
+        "points": points,
+    }
+
+@app.get("/api/v1/vitals/{username}/baseline")
+def get_vital_baseline(username: str, db: Session = Depends(get_db),
+                       caller: Optional[Identity] = Depends(current_identity)):
+    """The anomaly detector's learned baseline per vital type: mean, std,
+    EWMA and how far the recent level has drifted (trend_sigmas)."""
+    _authorize(caller, username)
+    user_id = _resolve_user(db, username).user_id
+    return {"username": username, "baseline": anomaly_detector.baseline(user_id)}
+
+@app.get("/api/v1/anomalies/metrics")
+def anomaly_metrics():
+    """Anomaly detector: tracked keys, readings scored/replayed, flag counts."""
+    return anomaly_detector.stats()
+
+@app.get("/api/v1/retention/metrics")
+def retention_metrics():
+    """Retention windows in days, and rows/partitions removed so far."""
+    return retention_job.stats()
+
+@app.get("/api/v1/cluster/metrics")
+def cluster_metrics():
+    """Which worker answered, whether it is the leader, and its broadcast counters."""
+    return cluster.stats()
+
+@app.get("/api/v1/export/vitals")
+def export_vitals(
+    format: str = "csv",
+    username: Optional[str] = None,
+    type: Optional[str] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+    caller: Optional[Identity] = Depends(current_identity),
+):
+    """Full history for one user (or everyone), streamed in constant memory."""
+    _authorize(caller, username)
+    try:
+        export.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if username is not None:
+        _resolve_user(db, username)
+    start = naive_utc(start) if start else None
+    end = naive_utc(end) if end else None
+
+    def body():
+        # Own session: the request's session is closed before the body is streamed
+        with database.SessionLocal() as export_db:
+            chunks = export.iter_vital_chunks(export_db, username, type, start, end)
+            yield from export.encode(format, chunks)
 
-@app.get("/api/v1/dashboard/{username}")
-def get_dashboard(username: str, db: Session = Depends(get_db)):
+    media_type, extension = export.FORMATS[format]
+    filename = f"vitals-{username or 'all'}.{extension}"
+    return StreamingResponse(body(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+# Admin: Threshold Rules
+def _threshold_response(rule: Threshold, username: Optional[str]) -> ThresholdResponse:
+    return ThresholdResponse(
+        id=rule.id,
+        username=username,
+        vital_type=rule.vital_type,
+        min_value=rule.min_value,
+        max_value=rule.max_value
+    )
+
+def _validate_bounds(request: ThresholdInput):
+    if request.min_value is None and request.max_value is None:
+        raise HTTPException(status_code=400, detail="Set min_value, max_value or both")
+    if request.min_value is not None and request.max_value is not None and request.min_value > request.max_value:
+        raise HTTPException(status_code=400, detail="min_value must not exceed max_value")
+
+def _resolve_rule_owner(username: Optional[str], db: Session) -> Optional[int]:
+    if username is None:
+        return None
     user = db.query(User).filter(User.username == username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    recent_vitals = db.query(Vital).filter(Vital.user_id == user.id).order_by(Vital.timestamp.desc()).limit(50).all()
-    recent_alerts = db.query(Alert).filter(Alert.user_id == user.id).order_by(Alert.created_at.desc()).limit(5).all()
-    
-    # Format alerts with proper UTC timestamps
-    formatted_alerts = []
-    for alert in recent_alerts:
-        formatted_alerts.append({
-            "id": alert.id,
-            "message": alert.message,
-            "severity": alert.severity,
-            "created_at": alert.created_at.isoformat() + 'Z' if alert.created_at else None,  # Add 'Z' for UTC
-            "resolved": alert.resolved
-        })
-    
-    return {
-        "user": user.full_name,
-        "vitals": recent_vitals,
-        "alerts": formatted_alerts
-    }
+    return user.id
+
+@app.get("/api/v1/admin/thresholds", response_model=List[ThresholdResponse], dependencies=[Depends(require_admin)])
+def list_thresholds(username: Optional[str] = None, db: Session = Depends(get_db)):
+    query = db.query(Threshold, User.username).outerjoin(User, Threshold.user_id == User.id)
+    if username is not None:
+        query = query.filter(Threshold.user_id == _resolve_rule_owner(username, db))
+    return [_threshold_response(rule, owner) for rule, owner in query.order_by(Threshold.id).all()]
+
+@app.post("/api/v1/admin/thresholds", response_model=ThresholdResponse, dependencies=[Depends(require_admin)])
+def create_threshold(request: ThresholdInput, db: Session = Depends(get_db)):
+    _validate_bounds(request)
+    user_id = _resolve_rule_owner(request.username, db)
+    # Checked explicitly: UNIQUE(user_id, vital_type) does not apply to NULL user_id
+    existing = db.query(Threshold).filter(
+        Threshold.user_id == user_id if user_id is not None else Threshold.user_id.is_(None),
+        Threshold.vital_type == request.vital_type
+    ).first()
+    if existing:
+        raise HTTPException(status_code=409, detail="Threshold already exists for this vital type")
+
+    rule = Threshold(
+        user_id=user_id,
+        vital_type=request.vital_type,
+        min_value=request.min_value,
+        max_value=request.max_value
+    )
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    cluster.broadcast("thresholds", user_id=user_id)
+    return _threshold_response(rule, request.username)
+
+@app.put("/api/v1/admin/thresholds/{threshold_id}", response_model=ThresholdResponse, dependencies=[Depends(require_admin)])
+def update_threshold(threshold_id: int, request: ThresholdInput, db: Session = Depends(get_db)):
+    _validate_bounds(request)
+    rule = db.query(Threshold).filter(Threshold.id == threshold_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Threshold not found")
+    if rule.vital_type != request.vital_type or rule.user_id != _resolve_rule_owner(request.username, db):
+        raise HTTPException(status_code=400, detail="username and vital_type of a rule cannot change")
+
+    rule.min_value = request.min_value
+    rule.max_value = request.max_value
+    db.commit()
+    cluster.broadcast("thresholds", user_id=rule.user_id)
+    return _threshold_response(rule, request.username)
+
+@app.delete("/api/v1/admin/thresholds/{threshold_id}", dependencies=[Depends(require_admin)])
+def delete_threshold(threshold_id: int, db: Session = Depends(get_db)):
+    rule = db.query(Threshold).filter(Threshold.id == threshold_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Threshold not found")
+    user_id = rule.user_id
+    db.delete(rule)
+    db.commit()
+    cluster.broadcast("thresholds", user_id=user_id)
+    return {"message": "Threshold deleted", "id": threshold_id}
+
+@app.get("/api/v1/admin/thresholds/cache", dependencies=[Depends(require_admin)])
+def threshold_cache_stats():
+    return threshold_engine.stats()
+
+
+# Metrics
+def _threadpool_stats() -> tuple:
+    # The limiter belongs to the event loop, so this runs in async /metrics
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return limiter.borrowed_tokens, limiter.statistics().tasks_waiting
+
+def _alert_queue_pending():
+    pending = alert_pipeline.queue.pending()
+    return pending if pending >= 0 else None  # the database queue is not counted in-process
+
+registry.gauge("threadpool_busy_threads", "Threadpool workers running sync endpoints.",
+               lambda: _threadpool_stats()[0])
+registry.gauge("threadpool_waiting_tasks", "Sync endpoint calls waiting for a threadpool worker.",
+               lambda: _threadpool_stats()[1])
+registry.gauge("db_pool_checked_out", "Database connections in use.",
+               lambda: getattr(database.engine.pool, "checkedout", lambda: None)())
+registry.gauge("chat_cache_hits_total", "Chat response cache hits.", lambda: response_cache.hits, "counter")
+registry.gauge("chat_cache_misses_total", "Chat response cache misses.", lambda: response_cache.misses, "counter")
+registry.gauge("stream_subscribers", "Open dashboard event streams.", lambda: pubsub.stats()["subscribers"])
+registry.gauge("stream_dropped_total", "Dashboard deltas dropped for slow streams.", lambda: pubsub.dropped, "counter")
+registry.gauge("alert_queue_pending", "Readings waiting for the alert worker.", _alert_queue_pending)
+registry.gauge("alert_events_processed_total", "Readings evaluated by the alert worker.",
+               lambda: alert_pipeline.processed, "counter")
+registry.gauge("cluster_leader", "1 on the worker that runs the periodic jobs.", lambda: int(cluster.leading))
+registry.gauge("cluster_broadcasts_sent_total", "Cache invalidations and deltas sent to other workers.",
+               lambda: cluster.sent, "counter")
+registry.gauge("cluster_broadcasts_received_total", "Broadcasts received from other workers.",
+               lambda: cluster.received, "counter")
+registry.gauge("retention_vitals_deleted_total", "Raw vitals removed by the retention job.",
+               lambda: retention_job.vitals_deleted, "counter")
+registry.gauge("retention_rollups_deleted_total", "Rollup rows removed by the retention job.",
+               lambda: retention_job.rollups_deleted, "counter")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # Mount static files (Frontend)
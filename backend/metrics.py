@@ -0,0 +1,294 @@
+"""
+COMPONENT: Metrics and Request Tracing
+
+In-process counters and histograms, served in the Prometheus text format by
+GET /metrics (no client library needed):
+
+-   http_requests_total / http_request_duration_seconds per method and route
+    template (MetricsMiddleware, a plain ASGI middleware)
+-   db_queries_total / db_query_duration_seconds per statement kind
+    (SQLAlchemy cursor events, instrument_engine)
+-   llm_requests_total by outcome, llm_request_duration_seconds and
+    llm_tokens_total (gemini_health_agent.py), chat_replies_total by source
+    (llm or fallback; fallback / total is the fallback-hit rate)
+-   gauges read at scrape time: threadpool busy/waiting, DB pool checkouts,
+    and counters of the caches and queues that already keep stats
+
+Recording is a lock, a bisect and a few additions, so it stays on in
+production (METRICS_ENABLED=false turns it off).
+
+Tracing (TRACE_REQUESTS=true) is optional: each request collects time spent
+per segment ("db", "llm") through span() and the DB events, returns it in a
+Server-Timing header, and logs the breakdown of requests slower than
+TRACE_SLOW_MS.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "false").lower() in ("1", "true", "yes")
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "500"))
+
+# Seconds; request and query latencies
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield self.name, self.labels, label_values, value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def count(self, *label_values) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(label_values, list(counts), total) for label_values, (counts, total) in self._series.items()]
+        bucket_labels = self.labels + ("le",)
+        for label_values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield self.name + "_bucket", bucket_labels, label_values + (le,), cumulative
+            yield self.name + "_sum", self.labels, label_values, total
+            yield self.name + "_count", self.labels, label_values, cumulative
+
+
+class Gauge:
+    """Read at scrape time from `read`, a callable returning a number."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read, kind: str = "gauge"):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.kind = kind  # "counter" for monotonic totals kept elsewhere
+
+    def samples(self):
+        try:
+            value = self.read()
+        except Exception as e:  # a broken reader must not break the scrape
+            logger.warning("metric %s: %s", self.name, e)
+            return
+        if value is not None:
+            yield self.name, (), (), value
+
+
+class Registry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name: str, help_text: str, read, kind: str = "gauge") -> Gauge:
+        return self._add(Gauge(name, help_text, read, kind))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, label_names, label_values, value in metric.samples():
+                lines.append(f"{name}{_label_text(label_names, label_values)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+registry = Registry(enabled=ENABLED)
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route template and status.",
+                                 ("method", "route", "status"))
+http_latency = registry.histogram("http_request_duration_seconds", "HTTP request latency (until the body is sent).",
+                                  ("method", "route"))
+db_queries = registry.counter("db_queries_total", "SQL statements executed.", ("operation",))
+db_latency = registry.histogram("db_query_duration_seconds", "SQL statement execution time.", ("operation",))
+llm_requests = registry.counter("llm_requests_total", "Gemini calls by outcome (ok, error, timeout).", ("outcome",))
+llm_latency = registry.histogram("llm_request_duration_seconds", "Gemini call latency.", buckets=LLM_BUCKETS)
+llm_tokens = registry.counter("llm_tokens_total", "Gemini tokens by kind (prompt, completion).", ("kind",))
+chat_replies = registry.counter("chat_replies_total", "Chat replies by source (llm, fallback).", ("source",))
+
+
+# --- Tracing ---
+class Trace:
+    __slots__ = ("segments",)
+
+    def __init__(self):
+        self.segments = {}  # name -> [count, seconds]
+
+    def add(self, name: str, seconds: float):
+        segment = self.segments.get(name)
+        if segment is None:
+            self.segments[name] = [1, seconds]
+        else:
+            segment[0] += 1
+            segment[1] += seconds
+
+    def server_timing(self, total: float) -> str:
+        parts = [f'{name};dur={seconds * 1000:.2f};desc="{count}x"'
+                 for name, (count, seconds) in self.segments.items()]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time a segment of the current request's trace (no-op when not tracing)."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started)
+
+
+# --- Database ---
+def _operation(context) -> str:
+    if context is not None:
+        if context.isinsert:
+            return "insert"
+        if context.isupdate:
+            return "update"
+        if context.isdelete:
+            return "delete"
+    return "select"
+
+
+def instrument_engine(engine):
+    """Count and time every statement on `engine` (and add it to the trace)."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if registry.enabled:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        operation = _operation(context)
+        db_queries.inc(operation)
+        db_latency.observe(seconds, operation)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add("db", seconds)
+
+    @event.listens_for(engine, "handle_error")
+    def failed(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+# --- HTTP ---
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not registry.enabled:
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+        trace = Trace() if TRACE_REQUESTS else None
+        token = current_trace.set(trace) if trace is not None else None
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trace is not None:
+                    timing = trace.server_timing(time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(scope["method"], path, str(status))
+            http_latency.observe(seconds, scope["method"], path)
+            if trace is not None:
+                current_trace.reset(token)
+                if seconds * 1000 >= TRACE_SLOW_MS:
+                    logger.warning("slow request %s %s %d: %s", scope["method"], scope["path"], status,
+                                   trace.server_timing(seconds))
@@ -0,0 +1,91 @@
+"""
+COMPONENT: Password Hashing Pool
+
+bcrypt costs 100-300 ms of CPU per hash or verify. Running it inline in the
+request threadpool let a login surge occupy every worker thread and starve
+ingest and dashboard requests. Password work now runs in a small, dedicated
+process pool (PASSWORD_WORKERS processes, at a lower CPU priority), and the
+async auth handlers simply await it.
+
+Logins also upgrade hashes whose bcrypt cost differs from BCRYPT_ROUNDS
+(verify_and_update), so changing the cost takes effect as users sign in.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# min/max = default, so any hash with another cost is flagged for rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> tuple:
+    """(valid, new_hash); new_hash is set when the stored hash should be upgraded."""
+    try:
+        return pwd_context.verify_and_update(password, password_hash)
+    except ValueError:  # malformed or unknown hash
+        return False, None
+
+
+def _lower_priority(nice: int):
+    if nice:
+        os.nice(nice)
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, nice: int = 0):
+        self.workers = workers
+        self.nice = nice
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # Created on first use so importing the app does not start processes
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn: forking a process that already runs threads is unsafe
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=get_context("spawn"),
+                        initializer=_lower_priority, initargs=(self.nice,),
+                    )
+        return self._pool
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        # PASSWORD_WORKERS=0 keeps hashing in-process (default threadpool)
+        executor = self._executor() if self.workers > 0 else None
+        return await loop.run_in_executor(executor, fn, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> tuple:
+        return await self._run(verify_password, password, password_hash)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Singleton instance
+password_hasher = PasswordHasher(
+    workers=int(os.getenv("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))),
+    nice=int(os.getenv("PASSWORD_WORKER_NICE", "5")),
+)
@@ -0,0 +1,211 @@
+"""
+COMPONENT: Dashboard Pub/Sub
+
+Fan-out of dashboard updates to live subscribers. store_vitals() publishes
+one delta per user after each commit, and GET /api/v1/dashboard/{username}/events
+relays it to every open stream for that user, so dashboards no longer re-fetch
+after each ingest.
+
+The backend is chosen with PUBSUB_BACKEND. "local" delivers within this
+process only, which is enough for a single worker. "cluster" also relays
+every delta through cluster.py to the other workers, so a stream gets the
+readings ingested by any of them; it is the default when CLUSTER_BACKEND
+shares state between workers.
+
+Messages are encoded once by the publisher and the same string is handed to
+every subscriber. Each subscriber has a bounded queue; a subscriber that
+falls PUBSUB_QUEUE_SIZE messages behind is marked lagged and told to reload
+instead of holding memory for a client that is not reading.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+# Returned by Subscription.get() after the subscriber's queue overflowed
+LAGGED = object()
+
+
+class Subscription:
+    def __init__(self, hub, channel: str, loop, max_queue: int):
+        self.hub = hub
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.lagged = False
+
+    def _deliver(self, message: str):
+        # Runs on the subscriber's event loop
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagged = True
+            self.hub.dropped += 1
+
+    async def get(self, timeout: float):
+        """Next message, None after `timeout` seconds without one, or LAGGED
+        once if messages were dropped (the queue is then emptied and delivery
+        resumes)."""
+        if self.lagged:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.lagged = False
+            return LAGGED
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        # A timer handle rather than wait_for(), which starts a task per call
+        timer = self.loop.call_later(timeout, self._timeout)
+        try:
+            return await self.queue.get()
+        finally:
+            timer.cancel()
+
+    def _timeout(self):
+        if self.queue.empty():
+            self.queue.put_nowait(None)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class LocalPubSub:
+    """In-process backend. publish() may be called from any thread (ingest
+    runs in the request threadpool); delivery happens on the loop that owns
+    each subscription, with one wake-up per loop per message."""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._channels = {}  # channel -> set of Subscription
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Call from the event loop that will read the subscription."""
+        subscription = Subscription(self, channel, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def has_subscribers(self, channel: str) -> bool:
+        """Lets publishers skip encoding a message nobody will read."""
+        return channel in self._channels
+
+    def publish(self, channel: str, message: str):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        self.published += 1
+        if not subscribers:
+            return
+        by_loop = {}
+        for subscription in subscribers:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._fanout, group, message)
+            except RuntimeError:  # loop already closed
+                pass
+
+    def _fanout(self, group: list, message: str):
+        for subscription in group:
+            subscription._deliver(message)
+        self.delivered += len(group)
+
+    def stats(self) -> dict:
+        with self._lock:
+            channels = len(self._channels)
+            subscribers = sum(len(s) for s in self._channels.values())
+        return {
+            "backend": "local",
+            "channels": channels,
+            "subscribers": subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+class ClusterPubSub(LocalPubSub):
+    """LocalPubSub for this worker's streams, with every publish broadcast
+    to the other workers, which deliver it to theirs.
+
+    Each worker announces the channels it has streams for (on the first
+    subscription, then every INTEREST_SECONDS), so publishers still skip
+    users that nobody watches on any worker. A worker that just started
+    learns the others' channels within INTEREST_SECONDS."""
+
+    INTEREST_SECONDS = 10.0
+
+    def __init__(self, max_queue: int = 100):
+        super().__init__(max_queue)
+        from cluster import cluster
+        self.cluster = cluster
+        self._remote = {}  # channel -> monotonic time its announcement expires
+        cluster.on("pubsub", super().publish)
+        cluster.on("pubsub_interest", self._interest)
+        cluster.every(self.INTEREST_SECONDS, self._announce)
+
+    def subscribe(self, channel: str) -> Subscription:
+        announce = channel not in self._channels
+        subscription = super().subscribe(channel)
+        if announce:
+            self.cluster.broadcast("pubsub_interest", channels=[channel])
+        return subscription
+
+    def has_subscribers(self, channel: str) -> bool:
+        return channel in self._channels or self._remote.get(channel, 0.0) > time.monotonic()
+
+    def publish(self, channel: str, message: str):
+        self.cluster.broadcast("pubsub", channel=channel, message=message)
+
+    def _interest(self, channels: list):
+        expires_at = time.monotonic() + 3 * self.INTEREST_SECONDS
+        for channel in channels:
+            self._remote[channel] = expires_at
+
+    def _announce(self):
+        now = time.monotonic()
+        for channel, expires_at in list(self._remote.items()):
+            if expires_at < now:
+                self._remote.pop(channel, None)
+        with self._lock:
+            channels = list(self._channels)
+        if channels:
+            self.cluster.broadcast("pubsub_interest", channels=channels)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["backend"] = "cluster"
+        stats["remote_channels"] = len(self._remote)
+        return stats
+
+
+BACKENDS = {"local": LocalPubSub, "cluster": ClusterPubSub}
+
+
+def make_pubsub(name: str = None):
+    default = "local" if os.getenv("CLUSTER_BACKEND", "local") == "local" else "cluster"
+    name = name or os.getenv("PUBSUB_BACKEND", default)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PUBSUB_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](max_queue=int(os.getenv("PUBSUB_QUEUE_SIZE", "100")))
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+# Singleton instance
+pubsub = make_pubsub()
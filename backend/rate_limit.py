@@ -0,0 +1,63 @@
+"""
+COMPONENT: Rate Limiter
+
+In-memory token buckets keyed by an arbitrary string (e.g. "user:joe" or
+"ip:10.0.0.7"). Each key may spend `limit` requests per `window_seconds`,
+refilled continuously. Used by the auth endpoints so that repeated login or
+signup attempts are rejected before any bcrypt work is done.
+"""
+
+import math
+import os
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, limit: int, window_seconds: float, max_keys: int = 100000):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.rate = limit / window_seconds  # tokens per second
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated_at)
+        self.rejected = 0
+
+    def hit(self, key: str) -> float:
+        """Spend one token for `key`. Returns 0 if allowed, otherwise the
+        seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.limit, now))
+            tokens = min(self.limit, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.rejected += 1
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0.0
+
+    def _prune(self, now: float):
+        # A bucket that has refilled completely carries no state
+        full = [key for key, (tokens, updated) in self._buckets.items()
+                if tokens + (now - updated) * self.rate >= self.limit]
+        for key in full:
+            del self._buckets[key]
+
+    def reset(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+def retry_after(seconds: float) -> str:
+    """Value for a Retry-After header."""
+    return str(max(1, math.ceil(seconds)))
+
+
+_WINDOW = float(os.getenv("LOGIN_WINDOW_SECONDS", "60"))
+
+# Attempts per username, and per client IP (care homes share one address)
+login_user_limiter = RateLimiter(int(os.getenv("LOGIN_USERNAME_LIMIT", "10")), _WINDOW)
+login_ip_limiter = RateLimiter(int(os.getenv("LOGIN_IP_LIMIT", "300")), _WINDOW)
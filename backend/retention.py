@@ -0,0 +1,277 @@
+"""
+COMPONENT: Data Retention
+
+Keeps the vitals history bounded. Ingest already folds every reading into
+vital_rollups (rollups.py) in the same transaction, so raw rows older than
+the raw window are represented by their 1m/1h/1d aggregates and can simply
+be deleted; the rollups in turn have their own windows:
+
+    RETENTION_RAW_DAYS   30   raw vitals
+    RETENTION_1M_DAYS    30   1-minute rollups
+    RETENTION_1H_DAYS   730   1-hour rollups (2 years)
+    RETENTION_1D_DAYS     0   1-day rollups (0 = keep forever)
+
+A background thread runs a pass every RETENTION_INTERVAL_SECONDS. Deletes go
+per user (and vital type) through the existing composite indexes, at most
+RETENTION_BATCH_SIZE rows per transaction with a short pause in between, so
+ingest never waits behind a long delete. latest_vitals is never trimmed,
+so the dashboard keeps each patient's last reading however old it is.
+
+PostgreSQL: when vitals is range-partitioned by month (database/migrations/
+006_vitals_partitions.sql), each pass first creates the partitions for the
+next PARTITIONS_AHEAD months and drops whole months that are past the raw
+window; only the boundary month is deleted row by row.
+
+SQLite: new database files use auto_vacuum=INCREMENTAL (database.py), and
+each pass returns freed pages to the filesystem in small steps, so the file
+in /tmp shrinks instead of only stopping to grow.
+
+Run one pass by hand with:
+
+    cd backend && python retention.py
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select, text
+import database
+from database import LatestVital, Vital, VitalRollup
+from rollups import BUCKETS
+
+logger = logging.getLogger(__name__)
+
+RAW_DAYS = float(os.getenv("RETENTION_RAW_DAYS", "30"))
+ROLLUP_DAYS = {
+    "1m": float(os.getenv("RETENTION_1M_DAYS", "30")),
+    "1h": float(os.getenv("RETENTION_1H_DAYS", "730")),
+    "1d": float(os.getenv("RETENTION_1D_DAYS", "0")),
+}
+BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "2000"))
+PAUSE_SECONDS = float(os.getenv("RETENTION_PAUSE_SECONDS", "0.05"))
+INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+FIRST_RUN_DELAY = 60.0  # keep the first pass out of the cold start
+PARTITIONS_AHEAD = 2  # months
+VACUUM_PAGES = 1000  # SQLite pages released per step
+
+PARTITION_NAME = re.compile(r"^vitals_y(\d{4})m(\d{2})$")
+PARTITIONS_SQL = text("""
+    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass('vitals')
+""")
+
+
+def _month_start(year: int, month: int) -> datetime:
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return datetime(year, month, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"vitals_y{month.year:04d}m{month.month:02d}"
+
+
+class RetentionJob:
+    def __init__(self, raw_days: float = RAW_DAYS, rollup_days: dict = None, batch_size: int = BATCH_SIZE,
+                 pause_seconds: float = PAUSE_SECONDS, interval_seconds: float = INTERVAL_SECONDS):
+        self.raw_days = raw_days
+        self.rollup_days = dict(ROLLUP_DAYS if rollup_days is None else rollup_days)
+        unknown = set(self.rollup_days) - set(BUCKETS)
+        if unknown:
+            raise ValueError(f"Unknown rollup buckets: {', '.join(sorted(unknown))}")
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.interval_seconds = interval_seconds
+        self._thread = None
+        self._stopping = threading.Event()
+        self.runs = 0
+        self.vitals_deleted = 0
+        self.rollups_deleted = 0
+        self.partitions_dropped = 0
+        self.pages_released = 0
+        self.errors = 0
+        self.last_run = None
+        self.last_duration = None
+
+    # --- Worker ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop after the current batch."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        delay = min(FIRST_RUN_DELAY, self.interval_seconds)
+        while not self._stopping.wait(delay):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                logger.error("Retention pass failed: %s", e)
+            delay = self.interval_seconds
+
+    def run_once(self, now: datetime = None) -> dict:
+        """One full pass. Returns what it removed."""
+        now = now or datetime.utcnow()
+        started = time.monotonic()
+        result = {"vitals": 0, "rollups": 0, "partitions_dropped": 0, "pages_released": 0}
+        with database.SessionLocal() as db:
+            keys = db.execute(select(LatestVital.user_id, LatestVital.type)
+                              .order_by(LatestVital.user_id, LatestVital.type)).all()
+        dialect = database.engine.dialect.name
+
+        if self.raw_days > 0:
+            cutoff = now - timedelta(days=self.raw_days)
+            if dialect == "postgresql":
+                result["partitions_dropped"] = self._maintain_partitions(now, cutoff)
+            for user_id in sorted({user_id for user_id, _ in keys}):
+                result["vitals"] += self._delete_vitals(user_id, cutoff)
+        for bucket, days in self.rollup_days.items():
+            if days > 0:
+                cutoff = now - timedelta(days=days)
+                for user_id, vital_type in keys:
+                    result["rollups"] += self._delete_rollups(user_id, vital_type, bucket, cutoff)
+        if dialect == "sqlite":
+            result["pages_released"] = self._release_pages()
+
+        self.runs += 1
+        self.vitals_deleted += result["vitals"]
+        self.rollups_deleted += result["rollups"]
+        self.partitions_dropped += result["partitions_dropped"]
+        self.pages_released += result["pages_released"]
+        self.last_run = now
+        self.last_duration = time.monotonic() - started
+        if any(result.values()):
+            logger.info("Retention: %s in %.1fs", result, self.last_duration)
+        return result
+
+    # --- Deletes, one short transaction per batch ---
+    def _batches(self, step) -> int:
+        """Run `step(db)`, which returns (rows removed, more to do), until
+        it is done or the job is stopping."""
+        total = 0
+        while not self._stopping.is_set():
+            with database.SessionLocal() as db:
+                removed, more = step(db)
+                db.commit()
+            total += removed
+            if not more:
+                break
+            if removed >= self.batch_size:  # only full batches need to make way for ingest
+                time.sleep(self.pause_seconds)
+        return total
+
+    def _delete_vitals(self, user_id: int, cutoff: datetime) -> int:
+        def step(db):
+            expired = (select(Vital.id)
+                       .where(Vital.user_id == user_id, Vital.timestamp < cutoff)
+                       .limit(self.batch_size))
+            removed = db.execute(delete(Vital).where(Vital.id.in_(expired.scalar_subquery()))
+                                 .execution_options(synchronize_session=False)).rowcount
+            return removed, removed == self.batch_size
+        return self._batches(step)
+
+    def _delete_rollups(self, user_id: int, vital_type: str, bucket: str, cutoff: datetime) -> int:
+        # A key has at most one row per bucket width, so a window of
+        # batch_size widths bounds the batch without needing LIMIT on DELETE
+        width = BUCKETS[bucket][0]
+        key = (VitalRollup.user_id == user_id, VitalRollup.type == vital_type, VitalRollup.bucket == bucket)
+
+        def step(db):
+            oldest = db.execute(select(func.min(VitalRollup.bucket_start)).where(*key)).scalar()
+            if oldest is None or oldest >= cutoff:
+                return 0, False
+            end = min(cutoff, oldest + width * self.batch_size)
+            removed = db.execute(delete(VitalRollup).where(*key, VitalRollup.bucket_start < end)
+                                 .execution_options(synchronize_session=False)).rowcount
+            return removed, end < cutoff
+        return self._batches(step)
+
+    # --- PostgreSQL partitions ---
+    def _maintain_partitions(self, now: datetime, cutoff: datetime) -> int:
+        """Create upcoming monthly partitions and drop the expired ones.
+        Does nothing when vitals is not partitioned."""
+        with database.engine.connect() as conn:
+            names = [row[0] for row in conn.execute(PARTITIONS_SQL)]
+        if not names:
+            return 0
+        for ahead in range(PARTITIONS_AHEAD + 1):
+            start = _month_start(now.year, now.month + ahead)
+            end = _month_start(start.year, start.month + 1)
+            if partition_name(start) in names:
+                continue
+            try:
+                with database.engine.begin() as conn:
+                    conn.exec_driver_sql(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF vitals "
+                        f"FOR VALUES FROM ('{start:%Y-%m-%d} 00:00:00+00') TO ('{end:%Y-%m-%d} 00:00:00+00')")
+            except Exception as e:  # e.g. the default partition already holds rows of that month
+                logger.error("Could not create partition %s: %s", partition_name(start), e)
+        dropped = 0
+        for name in names:
+            match = PARTITION_NAME.match(name)
+            if not match or _month_start(int(match.group(1)), int(match.group(2)) + 1) > cutoff:
+                continue
+            with database.engine.begin() as conn:
+                # Dropping needs a brief exclusive lock on vitals; give up
+                # rather than queue ingest behind a long-running query
+                conn.exec_driver_sql("SET LOCAL lock_timeout = '2s'")
+                conn.exec_driver_sql(f"DROP TABLE {name}")
+            dropped += 1
+        return dropped
+
+    # --- SQLite file size ---
+    def _release_pages(self) -> int:
+        released = 0
+        connection = database.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # 2 = INCREMENTAL
+                return 0
+            while not self._stopping.is_set():
+                free = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free:
+                    break
+                step = min(free, VACUUM_PAGES)
+                # execute() would release a single page; a script runs the pragma to completion
+                connection.dbapi_connection.executescript(f"PRAGMA incremental_vacuum({step});")
+                released += step
+                time.sleep(self.pause_seconds)
+        finally:
+            connection.close()
+        return released
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "policy_days": {"raw": self.raw_days, **self.rollup_days},
+            "runs": self.runs,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "vitals_deleted": self.vitals_deleted,
+            "rollups_deleted": self.rollups_deleted,
+            "partitions_dropped": self.partitions_dropped,
+            "pages_released": self.pages_released,
+            "errors": self.errors,
+        }
+
+
+# Singleton instance
+retention_job = RetentionJob()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    database.init_db()
+    print(retention_job.run_once())
@@ -0,0 +1,183 @@
+"""
+COMPONENT: Vital Rollups
+
+Incrementally maintained summary tables written by ingest (ingest.py) in the
+same transaction as the raw rows, so reads of "current status" and of long
+trends never scan the vitals history.
+
+-   latest_vitals: the newest reading per (user, vital type).
+-   vital_rollups: count/sum/min/max/last per (user, vital type) for 1-minute,
+    1-hour and 1-day buckets. A 90-day chart reads 90 daily rows.
+
+Upserts use the dialect's native INSERT ... ON CONFLICT (SQLite and
+PostgreSQL). A row is only replaced by a reading with an equal or newer
+timestamp, so back-filled or out-of-order batches cannot roll it back.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from database import LatestVital, Vital, VitalRollup, dialect_insert
+
+# Bucket name -> (width, function that floors a timestamp to its bucket)
+BUCKETS = {
+    "1m": (timedelta(minutes=1), lambda ts: ts.replace(second=0, microsecond=0)),
+    "1h": (timedelta(hours=1), lambda ts: ts.replace(minute=0, second=0, microsecond=0)),
+    "1d": (timedelta(days=1), lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0)),
+}
+
+# Windows up to this long are served from raw vitals when bucket="auto"
+RAW_WINDOW = timedelta(hours=1)
+MAX_RAW_POINTS = 5000
+# bucket="auto" picks the finest rollup that stays under this many points
+MAX_POINTS = 500
+
+
+def latest_rows(vital_rows) -> list:
+    """Collapse vital rows to the newest one per (user_id, type). On equal
+    timestamps the later row wins, matching insertion order."""
+    latest = {}
+    for row in vital_rows:
+        key = (row["user_id"], row["type"])
+        current = latest.get(key)
+        if current is None or row["timestamp"] >= current["timestamp"]:
+            latest[key] = row
+    return [
+        {"user_id": row["user_id"], "type": row["type"], "timestamp": row["timestamp"],
+         "value": row["value"], "unit": row["unit"], "is_abnormal": row["is_abnormal"]}
+        for row in latest.values()
+    ]
+
+
+def upsert_latest_vitals(db: Session, vital_rows):
+    """Fold a batch of vital rows (dicts as inserted into `vitals`) into
+    latest_vitals. Does not commit; the caller owns the transaction."""
+    rows = latest_rows(vital_rows)
+    if not rows:
+        return
+    insert = dialect_insert(db)
+    stmt = insert(LatestVital)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LatestVital.user_id, LatestVital.type],
+        set_={name: stmt.excluded[name] for name in ("timestamp", "value", "unit", "is_abnormal")},
+        where=stmt.excluded.timestamp >= LatestVital.timestamp,
+    )
+    db.execute(stmt, rows)
+
+
+def rollup_rows(vital_rows) -> list:
+    """Aggregate vital rows into one row per (user_id, type, bucket, bucket_start)."""
+    groups = {}
+    for row in vital_rows:
+        timestamp, value = row["timestamp"], row["value"]
+        for bucket, (_, floor) in BUCKETS.items():
+            key = (row["user_id"], row["type"], bucket, floor(timestamp))
+            agg = groups.get(key)
+            if agg is None:
+                groups[key] = [1, value, value, value, value, timestamp]
+                continue
+            agg[0] += 1
+            agg[1] += value
+            if value < agg[2]:
+                agg[2] = value
+            if value > agg[3]:
+                agg[3] = value
+            if timestamp >= agg[5]:
+                agg[4], agg[5] = value, timestamp
+    return [
+        {"user_id": user_id, "type": vital_type, "bucket": bucket, "bucket_start": start,
+         "count": count, "sum": total, "min": low, "max": high,
+         "last_value": last_value, "last_timestamp": last_timestamp}
+        for (user_id, vital_type, bucket, start), (count, total, low, high, last_value, last_timestamp)
+        in groups.items()
+    ]
+
+
+def upsert_vital_rollups(db: Session, vital_rows):
+    """Merge a batch of vital rows into vital_rollups. Does not commit."""
+    rows = rollup_rows(vital_rows)
+    if not rows:
+        return
+    insert = dialect_insert(db)
+    # Two-argument min/max are scalar in SQLite; PostgreSQL spells them LEAST/GREATEST
+    if db.get_bind().dialect.name == "postgresql":
+        smaller, larger = func.least, func.greatest
+    else:
+        smaller, larger = func.min, func.max
+    stmt = insert(VitalRollup)
+    newer = stmt.excluded.last_timestamp >= VitalRollup.last_timestamp
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[VitalRollup.user_id, VitalRollup.type, VitalRollup.bucket, VitalRollup.bucket_start],
+        set_={
+            "count": VitalRollup.count + stmt.excluded.count,
+            "sum": VitalRollup.sum + stmt.excluded.sum,
+            "min": smaller(VitalRollup.min, stmt.excluded.min),
+            "max": larger(VitalRollup.max, stmt.excluded.max),
+            "last_value": case((newer, stmt.excluded.last_value), else_=VitalRollup.last_value),
+            "last_timestamp": case((newer, stmt.excluded.last_timestamp), else_=VitalRollup.last_timestamp),
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def backfill_vital_rollups(bind, chunk_size: int = 50000):
+    """Build vital_rollups from existing vitals if it is empty. Streams the
+    history in id order and merges it chunk by chunk with the ingest upsert."""
+    with Session(bind=bind) as db:
+        if db.execute(select(VitalRollup.user_id).limit(1)).first() is not None:
+            return
+        rows = db.execute(
+            select(Vital.user_id, Vital.type, Vital.timestamp, Vital.value)
+            .where(Vital.user_id.is_not(None), Vital.type.is_not(None),
+                   Vital.timestamp.is_not(None), Vital.value.is_not(None))
+            .order_by(Vital.id)
+            .execution_options(yield_per=chunk_size)
+        ).mappings()
+        for chunk in rows.partitions():
+            upsert_vital_rollups(db, chunk)
+        db.commit()
+
+
+def choose_bucket(start: datetime, end: datetime) -> str:
+    """Pick the resolution for bucket="auto"."""
+    window = end - start
+    if window <= RAW_WINDOW:
+        return "raw"
+    for bucket, (width, _) in BUCKETS.items():
+        if window / width <= MAX_POINTS:
+            return bucket
+    return "1d"
+
+
+def query_series(db: Session, user_id: int, vital_type: str, start: datetime, end: datetime, bucket: str) -> list:
+    """Points in [start, end) as dicts with start/min/max/avg/count/last.
+    bucket is "raw" (one point per reading, at most MAX_RAW_POINTS) or a
+    BUCKETS key; rollup buckets overlapping `start` are included whole."""
+    if bucket == "raw":
+        rows = db.execute(
+            select(Vital.timestamp, Vital.value)
+            .where(Vital.user_id == user_id, Vital.type == vital_type,
+                   Vital.timestamp >= start, Vital.timestamp < end)
+            .order_by(Vital.timestamp)
+            .limit(MAX_RAW_POINTS)
+        ).all()
+        return [
+            {"start": row.timestamp, "min": row.value, "max": row.value, "avg": row.value,
+             "count": 1, "last": row.value}
+            for row in rows
+        ]
+
+    _, floor = BUCKETS[bucket]
+    rows = db.execute(
+        select(VitalRollup.bucket_start, VitalRollup.count, VitalRollup.sum,
+               VitalRollup.min, VitalRollup.max, VitalRollup.last_value)
+        .where(VitalRollup.user_id == user_id, VitalRollup.type == vital_type,
+               VitalRollup.bucket == bucket,
+               VitalRollup.bucket_start >= floor(start), VitalRollup.bucket_start < end)
+        .order_by(VitalRollup.bucket_start)
+    ).all()
+    return [
+        {"start": row.bucket_start, "min": row.min, "max": row.max, "avg": row.sum / row.count,
+         "count": row.count, "last": row.last_value}
+        for row in rows
+    ]
@@ -0,0 +1,98 @@
+"""
+COMPONENT: Demo Data
+
+Creates the demo accounts on an empty database: grandpa_joe (elderly) and
+nurse_sarah (caregiver, assigned to Joe), both with password "password123".
+
+The app runs this on startup when SEED_DEMO_DATA is set (the default; the
+Cloud Run demo keeps SQLite in /tmp, which is empty on every cold start).
+It used to bcrypt-hash the password there, about 250 ms of CPU before the
+first request; the hash is now precomputed. A deployment with a managed
+database sets SEED_DEMO_DATA=false and, if wanted, seeds once by hand:
+
+    cd backend && python seed.py
+
+Signup only creates elderly accounts, so admins (who manage the alert
+thresholds) are created here too. The password is prompted for, or read
+from ADMIN_PASSWORD for scripted deployments:
+
+    cd backend && python seed.py --admin alice --full-name "Alice Admin"
+"""
+
+import os
+from sqlalchemy.orm import Session
+from database import CaregiverPatient, User
+
+DEMO_PASSWORD = "password123"
+# bcrypt (12 rounds) of DEMO_PASSWORD. Logins rehash it when BCRYPT_ROUNDS
+# differs (passwords.verify_password), like any other stored hash.
+DEMO_PASSWORD_HASH = "$2b$12$F947l0p.OO4ExAqzHSVxz.yf/M/VWzn4hxUYOCREKQZ9uPtsUVWHm"
+
+# (username, role, full_name)
+DEMO_USERS = [
+    ("grandpa_joe", "elderly", "Joe Smith"),
+    ("nurse_sarah", "caregiver", "Sarah Jones"),
+]
+
+
+def seed_demo_data(db: Session) -> bool:
+    """Create the demo users if the users table is empty. Returns True if
+    anything was created."""
+    if db.query(User.id).first() is not None:
+        return False
+    users = {username: User(username=username, password_hash=DEMO_PASSWORD_HASH, role=role, full_name=full_name)
+             for username, role, full_name in DEMO_USERS}
+    db.add_all(users.values())
+    db.flush()
+    db.add(CaregiverPatient(caregiver_id=users["nurse_sarah"].id, patient_id=users["grandpa_joe"].id))
+    db.commit()
+    return True
+
+
+def create_admin(db: Session, username: str, password: str, full_name: str = None) -> User:
+    """Create an admin account. Raises ValueError if the username is taken."""
+    from passwords import hash_password
+
+    if db.query(User.id).filter(User.username == username).first() is not None:
+        raise ValueError(f"User {username!r} already exists")
+    admin = User(username=username, password_hash=hash_password(password), role="admin",
+                 full_name=full_name or username)
+    db.add(admin)
+    db.commit()
+    return admin
+
+
+def main():
+    import argparse
+    import getpass
+    import database
+
+    parser = argparse.ArgumentParser(description="Create the demo users, or an admin account")
+    parser.add_argument("--admin", metavar="USERNAME", help="create this admin instead of the demo users")
+    parser.add_argument("--full-name", help="the admin's display name (default: the username)")
+    args = parser.parse_args()
+
+    database.init_db()
+    if not args.admin:
+        with database.SessionLocal() as session:
+            created = seed_demo_data(session)
+        print("Demo users created" if created else "Database already has users; nothing to do")
+        return
+
+    password = os.getenv("ADMIN_PASSWORD")
+    if not password:
+        password = getpass.getpass("Password: ")
+        if password != getpass.getpass("Repeat password: "):
+            parser.error("passwords do not match")
+    if len(password) < 8:
+        parser.error("the password needs at least 8 characters")
+    with database.SessionLocal() as session:
+        try:
+            create_admin(session, args.admin, password, args.full_name)
+        except ValueError as e:
+            parser.error(str(e))
+    print(f"Admin {args.admin} created")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+COMPONENT: Response Serialization
+
+JSON for the hot read paths (the dashboard and its live deltas) without
+FastAPI's jsonable_encoder walk: handlers build plain dicts from column
+tuples and FastJSONResponse encodes them with orjson when it is installed,
+or with the standard json module otherwise.
+
+Timestamps are stored as naive UTC. Both encoders write them as ISO 8601
+with a trailing 'Z' (2026-10-17T13:00:00Z, like alerts.alert_payload), so
+every timestamp the dashboard receives says which zone it is in.
+"""
+
+import json
+from datetime import datetime
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the standard library
+    orjson = None
+
+
+def utc_iso(value: datetime) -> str:
+    return value.isoformat() + "Z" if value.tzinfo is None else value.isoformat()
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return utc_iso(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Returned directly by a handler, it skips response-model validation
+    and jsonable_encoder; `content` must already be plain dicts/lists."""
+    def render(self, content) -> bytes:
+        return dumps(content)
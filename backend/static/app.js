@@ -8,6 +8,28 @@ if (!username) {
 const API_BASE_URL = ""; // Relative path for production deployment
 const USERNAME = (username || "grandpa_joe").toLowerCase();
 
+// Session token from login, sent with every API call
+function authHeaders(headers = {}) {
+    const token = localStorage.getItem('token');
+    if (token) headers['Authorization'] = `Bearer ${token}`;
+    return headers;
+}
+
+// Expired or revoked session: sign in again
+function handleUnauthorized(response) {
+    if (response.status === 401) {
+        localStorage.clear();
+        window.location.href = 'auth.html';
+        return true;
+    }
+    return false;
+}
+
+// API timestamps are UTC; older payloads left off the 'Z'
+function parseUtc(timestamp) {
+    return new Date(timestamp.endsWith('Z') || timestamp.includes('+') ? timestamp : timestamp + 'Z');
+}
+
 // --- Navigation ---
 function showSection(sectionId) {
     document.querySelectorAll('.section').forEach(el => el.classList.remove('active'));
@@ -20,7 +42,9 @@ function showSection(sectionId) {
     if (navBtn) navBtn.classList.add('active');
 
     if (sectionId === 'dashboard') {
-        loadDashboard();
+        // Kept current by the live stream; fetch only when it is not connected
+        if (dashboardLive && dashboardData) renderDashboard();
+        else loadDashboard();
     }
 }
 
@@ -54,18 +78,45 @@ async function sendMessage() {
     chatWindow.scrollTop = chatWindow.scrollHeight;
 
     try {
-        const response = await fetch(`${API_BASE_URL}/api/v1/chat`, {
+        // Stream the reply (Server-Sent Events) so text appears as it is generated
+        const response = await fetch(`${API_BASE_URL}/api/v1/chat/stream`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: authHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify({ username: USERNAME, message: text })
         });
-        const data = await response.json();
-
-        // Remove thinking message
-        const thinkingMsg = document.getElementById(thinkingId);
-        if (thinkingMsg) thinkingMsg.remove();
-
-        addMessage(data.response, 'bot');
+        if (handleUnauthorized(response)) return;
+        if (!response.ok || !response.body) throw new Error(`Chat failed: ${response.status}`);
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let reply = '';
+        let bubble = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const event of events) {
+                const dataLine = event.split('\n').find(line => line.startsWith('data: '));
+                if (!dataLine || event.startsWith('event: done')) continue;
+                reply += JSON.parse(dataLine.slice(6)).delta;
+
+                if (!bubble) {
+                    // First chunk: replace the thinking message
+                    const thinkingMsg = document.getElementById(thinkingId);
+                    if (thinkingMsg) thinkingMsg.remove();
+                    addMessage('', 'bot');
+                    bubble = chatWindow.lastElementChild.querySelector('.bubble');
+                }
+                bubble.innerHTML = reply;
+                chatWindow.scrollTop = chatWindow.scrollHeight;
+            }
+        }
+        if (!bubble) throw new Error('Empty chat response');
     } catch (error) {
         // Remove thinking message
         const thinkingMsg = document.getElementById(thinkingId);
@@ -82,11 +133,86 @@ userInput.addEventListener('keypress', (e) => {
 });
 
 // --- Dashboard ---
+// Last dashboard response, updated in place by live deltas
+let dashboardData = null;
+let dashboardLive = false;
+const DASHBOARD_VITALS = 50;
+const DASHBOARD_ALERTS = 5;
+
 async function loadDashboard() {
     try {
-        const response = await fetch(`${API_BASE_URL}/api/v1/dashboard/${USERNAME}`);
-        const data = await response.json();
+        const response = await fetch(`${API_BASE_URL}/api/v1/dashboard/${USERNAME}`, { headers: authHeaders() });
+        if (handleUnauthorized(response)) return;
+        dashboardData = await response.json();
+        renderDashboard();
+    } catch (error) {
+        console.error("Failed to load dashboard", error);
+    }
+}
+
+// Merge a pushed delta ({vitals, alerts}, newest first) into the loaded dashboard
+function applyDashboardDelta(delta) {
+    if (!dashboardData) return;
+    const byTimeDesc = (field) => (a, b) => (a[field] < b[field] ? 1 : a[field] > b[field] ? -1 : 0);
+    // A delta can overlap a full load that raced with it
+    const merge = (pushed, current, key) => {
+        const seen = new Set(current.map(key));
+        return pushed.filter(row => !seen.has(key(row))).concat(current);
+    };
+    dashboardData.vitals = merge(delta.vitals, dashboardData.vitals || [], v => `${v.type}|${v.timestamp}|${v.value}`)
+        .sort(byTimeDesc('timestamp')).slice(0, DASHBOARD_VITALS);
+    // Alerts are episodes that get updated (count, severity, resolved): replace by id
+    const pushedIds = new Set(delta.alerts.map(a => a.id));
+    dashboardData.alerts = delta.alerts.concat((dashboardData.alerts || []).filter(a => !pushedIds.has(a.id)))
+        .sort(byTimeDesc('created_at')).slice(0, DASHBOARD_ALERTS);
+    renderDashboard();
+}
+
+// Live updates over Server-Sent Events; reconnects with backoff
+async function subscribeDashboard(retryDelay = 1000) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/v1/dashboard/${USERNAME}/events`, { headers: authHeaders() });
+        if (handleUnauthorized(response)) return;
+        if (!response.ok || !response.body) throw new Error(`Dashboard stream failed: ${response.status}`);
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const event of events) {
+                const lines = event.split('\n');
+                const typeLine = lines.find(line => line.startsWith('event: '));
+                const dataLine = lines.find(line => line.startsWith('data: '));
+                const type = typeLine ? typeLine.slice(7) : null;
+
+                if (type === 'ready' || type === 'resync') {
+                    // Subscribed (or deltas were dropped): start from a full load
+                    retryDelay = 1000;
+                    dashboardLive = true;
+                    await loadDashboard();
+                } else if (type === 'delta' && dataLine) {
+                    applyDashboardDelta(JSON.parse(dataLine.slice(6)));
+                }
+            }
+        }
+    } catch (error) {
+        console.error("Dashboard stream interrupted", error);
+    }
+    dashboardLive = false;
+    if (!dashboardData) loadDashboard();  // stream unavailable: show a snapshot meanwhile
+    setTimeout(() => subscribeDashboard(Math.min(retryDelay * 2, 30000)), retryDelay);
+}
 
+function renderDashboard() {
+    const data = dashboardData;
+    try {
         // Update Vitals (Simplified mapping)
         if (data.vitals && data.vitals.length > 0) {
             // Find latest of each type
@@ -131,18 +257,7 @@ async function loadDashboard() {
                 li.className = 'alert-item warning';
 
                 // Format time - Backend sends UTC, need to handle timezone
-                let alertTime;
-                try {
-                    const timestamp = alert.created_at;
-                    // Add 'Z' if not present to indicate UTC
-                    if (!timestamp.endsWith('Z') && !timestamp.includes('+')) {
-                        alertTime = new Date(timestamp + 'Z');
-                    } else {
-                        alertTime = new Date(timestamp);
-                    }
-                } catch (e) {
-                    alertTime = new Date(alert.created_at);
-                }
+                const alertTime = parseUtc(alert.last_seen_at || alert.created_at);
 
                 const now = new Date();
                 const diffMs = now - alertTime;
@@ -163,9 +278,14 @@ async function loadDashboard() {
                     timeDisplay = alertTime.toLocaleDateString() + ' ' + alertTime.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
                 }
 
+                // Repeated readings are collapsed into one alert with a count
+                const repeats = alert.occurrences > 1 ? ` (×${alert.occurrences})` : '';
+                const severity = ['high', 'critical'].includes(alert.severity) ? `${alert.severity.toUpperCase()}: ` : '';
+                if (alert.resolved) li.style.opacity = '0.5';
+
                 li.innerHTML = `
                     <span class="icon">!</span>
-                    <div class="msg">${alert.message}</div>
+                    <div class="msg">${severity}${alert.message}${repeats}${alert.resolved ? ' (resolved)' : ''}</div>
                     <div class="time">${timeDisplay}</div>
                 `;
                 alertsList.appendChild(li);
@@ -178,7 +298,7 @@ async function loadDashboard() {
         createTrendsChart(data.vitals);
 
     } catch (error) {
-        console.error("Failed to load dashboard", error);
+        console.error("Failed to render dashboard", error);
     }
 }
 
@@ -208,7 +328,7 @@ function createTrendsChart(vitals) {
     };
 
     vitals.forEach(v => {
-        const vitalDate = new Date(v.timestamp + 'Z'); // Add Z for UTC
+        const vitalDate = parseUtc(v.timestamp);
         const daysDiff = Math.floor((today - vitalDate) / (1000 * 60 * 60 * 24));
 
         if (daysDiff >= 0 && daysDiff < 7) {
@@ -367,7 +487,7 @@ async function sendVital(type, value, unit) {
         console.log(`Sending ${type} for user ${USERNAME}...`);
         const response = await fetch(`${API_BASE_URL}/api/v1/ingest`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: authHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify({
                 username: USERNAME,
                 type: type,
@@ -376,6 +496,7 @@ async function sendVital(type, value, unit) {
             })
         });
 
+        if (handleUnauthorized(response)) return;
         if (!response.ok) {
             const errorData = await response.json();
             throw new Error(errorData.detail || `Server error: ${response.status} `);
@@ -399,7 +520,8 @@ async function simulateData() {
         await sendVital(v.type, v.value, v.unit);
     }
     alert("Random simulated data sent!");
-    loadDashboard();
+    // Without a live stream, refresh by hand
+    if (!dashboardLive) loadDashboard();
 }
 
 // Improvement 4: Clear All Inputs Function
@@ -441,7 +563,7 @@ async function submitManualData() {
     // Use the new clear function
     clearAllInputs();
 
-    loadDashboard();
+    if (!dashboardLive) loadDashboard();
 }
 
 // Improvement 3: Dynamic Date Display
@@ -454,8 +576,8 @@ function updateDate() {
     }
 }
 
-// Initial Load
-loadDashboard();
+// Initial Load (the stream loads the dashboard once subscribed)
+subscribeDashboard();
 updateDate();
 
 // Update user profile from localStorage
@@ -0,0 +1,121 @@
+"""
+Fixtures shared by the tests: several uvicorn workers on one fresh SQLite
+file (CLUSTER_BACKEND=database) and an admin token for them.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import pytest
+from sqlalchemy import create_engine, text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKERS = 3
+LEASE_SECONDS = 3.0
+SECRET = "test-cluster-secret"
+
+
+def free_ports(count: int) -> list:
+    """Ports the OS has just handed out (bound to port 0, then released)."""
+    sockets = [socket.socket() for _ in range(count)]
+    try:
+        for sock in sockets:
+            sock.bind(("127.0.0.1", 0))
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+class Cluster:
+    """Worker processes, their URLs and an engine on their database."""
+
+    lease_seconds = LEASE_SECONDS
+
+    def __init__(self, workers: list, urls: list, engine):
+        self.workers = workers
+        self.urls = urls
+        self.engine = engine
+
+    @staticmethod
+    def wait_for(condition, timeout: float, interval: float = 0.02) -> float:
+        """Seconds until condition() is true, or None after `timeout`."""
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            if condition():
+                return time.perf_counter() - start
+            time.sleep(interval)
+        return None
+
+    def states(self, urls: list = None) -> list:
+        """Each worker's /api/v1/cluster/metrics, or None if it is down."""
+        states = []
+        for url in urls or self.urls:
+            try:
+                states.append(httpx.get(url + "/api/v1/cluster/metrics", timeout=1.0).json())
+            except httpx.HTTPError:
+                states.append(None)
+        return states
+
+    def leaders(self, urls: list = None) -> int:
+        return sum(bool(state and state["leader"]) for state in self.states(urls))
+
+    def wait_ready(self, timeout: float = 60.0):
+        pending = list(self.urls)
+        start = time.perf_counter()
+        while pending:
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"Workers did not start: {pending}")
+            try:
+                httpx.get(pending[0] + "/api/v1/cluster/metrics", timeout=1.0).raise_for_status()
+                pending.pop(0)
+            except httpx.HTTPError:
+                time.sleep(0.1)
+
+
+@pytest.fixture(scope="module")
+def cluster():
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='hc-test-'), 'cluster.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, CLUSTER_BACKEND="database",
+               CLUSTER_LEASE_SECONDS=str(LEASE_SECONDS), SESSION_SECRET=SECRET, REQUIRE_AUTH="false",
+               ANOMALY_CHECKPOINT_SECONDS="0.5", ANOMALY_SETTLE_SECONDS="0.5", LOG_LEVEL="WARNING")
+    env.pop("GEMINI_API_KEY", None)
+    env.pop("PUBSUB_BACKEND", None)
+    ports = free_ports(WORKERS)
+    workers = [subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                                 "--log-level", "warning", "--timeout-graceful-shutdown", "5"],
+                                cwd=BACKEND_DIR, env=env)
+               for port in ports]
+    engine = create_engine(database_url)
+    running = Cluster(workers, [f"http://127.0.0.1:{port}" for port in ports], engine)
+    try:
+        running.wait_ready()
+        yield running
+    finally:
+        engine.dispose()
+        for worker in workers:
+            if worker.poll() is None:
+                worker.kill()
+            worker.wait(15)
+
+
+@pytest.fixture
+def admin_headers(cluster, monkeypatch) -> dict:
+    """Authorization headers for an admin user of the cluster's database."""
+    with cluster.engine.begin() as conn:
+        admin_id = conn.execute(text("SELECT id FROM users WHERE username = 'test_admin'")).scalar()
+        if admin_id is None:
+            admin_id = conn.execute(text(
+                "INSERT INTO users (username, password_hash, role, full_name) "
+                "VALUES ('test_admin', '', 'admin', 'Test Admin') RETURNING id")).scalar()
+    monkeypatch.setenv("SESSION_SECRET", SECRET)
+    monkeypatch.syspath_prepend(BACKEND_DIR)
+    import tokens
+    monkeypatch.setattr(tokens, "SECRET", SECRET.encode())  # in case it was imported with another key
+    return {"Authorization": f"Bearer {tokens.issue_token(admin_id, 'test_admin', 'admin')}"}
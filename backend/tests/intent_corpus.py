@@ -0,0 +1,63 @@
+"""
+Golden-test corpus for the fallback intent classifier: vitals contexts and
+messages, hand-written plus generated from the keyword groups. Used by
+test_intents.py and benchmarks/bench_intents.py.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+
+def _snapshot(*readings):
+    from vitals_snapshot import VitalReading, VitalsSnapshot
+    return VitalsSnapshot(True, "Joe Smith", tuple(
+        VitalReading(vital_type, value, unit, datetime(2026, 1, 2, 10, 0) - timedelta(minutes=i), abnormal)
+        for i, (vital_type, value, unit, abnormal) in enumerate(readings)))
+
+
+# Units are single words: the old code re-parsed them from the text report
+# with (\w+), which truncated "mg/dL" and dropped "%" and "°F" entirely.
+def contexts():
+    from vitals_snapshot import VitalsSnapshot
+    return [
+        _snapshot(),
+        VitalsSnapshot(False, None, ()),
+        _snapshot(("heart_rate", 72.0, "bpm", False), ("blood_pressure_sys", 118.0, "mmHg", False),
+                  ("blood_pressure_dia", 76.0, "mmHg", False), ("spo2", 98.0, "pct", False),
+                  ("glucose", 95.0, "mgdL", False)),
+        _snapshot(("heart_rate", 120.0, "bpm", True), ("temperature", 101.2, "F", True),
+                  ("spo2", 91.0, "pct", True)),
+        _snapshot(("blood_pressure_sys", 150.0, "mmHg", True), ("temperature", 98.4, "F", False)),
+    ]
+
+
+MESSAGES = [
+    "How are you?", "what's my name", "Who am I", "do you know me", "Who are you?", "what is your name",
+    "How do I lower my blood pressure?", "how to control bp", "my pressure is high what do i do",
+    "how can I improve my heart rate", "reduce pulse", "heartbeat fix", "how to manage diabetes",
+    "lower my blood sugar", "improve oxygen saturation", "how to maintain spo2", "reduce fever",
+    "normalize temperature", "what exercise should I do", "can I go for a walk", "I want to run",
+    "what should I eat", "diet plan", "food advice", "give me some tips", "any suggestions?",
+    "what should i do", "so what i do", "is that good", "is it bad?", "should I worry", "is this normal",
+    "what does this mean", "show my vitals", "health status", "my readings", "how is my condition",
+    "what is my heart rate", "heart rate", "tell me about my bp", "blood pressure", "check my oxygen",
+    "spo2", "what is my glucose", "sugar", "my temperature", "fever", "hello", "hi there", "hey",
+    "good morning", "good afternoon", "what time is it?", "thanks", "", "HR", "three cheers",
+    "whatever", "I feel tired", "the weather is nice", "my hr and bp", "shrub", "this is it",
+]
+
+FILLERS = ["", "please", "today", "the", "doctor", "feeling", "really", "?", "!", "and"]
+
+
+def corpus(extra: int = 3000):
+    from intents import KEYWORD_GROUPS
+    keywords = sorted({k for words in KEYWORD_GROUPS.values() for k in words})
+    rng = random.Random(7)
+    messages = list(MESSAGES)
+    for _ in range(extra):
+        words = rng.sample(keywords, rng.randint(1, 3)) + rng.sample(FILLERS, 2)
+        rng.shuffle(words)
+        # Glue some words together so keywords also appear inside other words
+        joiner = rng.choice([" ", "", " "])
+        messages.append(joiner.join(words))
+    return messages
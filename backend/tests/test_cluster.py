@@ -0,0 +1,85 @@
+"""
+Several workers on one database (CLUSTER_BACKEND=database), as real
+uvicorn processes against a fresh SQLite file (the `cluster` fixture in
+conftest.py):
+
+    cd backend && python -m pytest -q tests
+
+benchmarks/bench_cluster.py times the same paths; these tests only check
+the behaviour.
+"""
+
+import signal
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import text
+
+
+def ingest(url: str, username: str, value: float, timestamp: str = None) -> dict:
+    response = httpx.post(url + "/api/v1/ingest", timeout=5.0,
+                          json={"username": username, "type": "heart_rate", "value": value, "unit": "bpm",
+                                "timestamp": timestamp})
+    response.raise_for_status()
+    return response.json()
+
+
+def test_seeded_once_with_one_leader(cluster):
+    assert cluster.wait_for(lambda: cluster.leaders() == 1, 10) is not None
+    with cluster.engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM users")).scalar() == 2
+        assert conn.execute(text("SELECT count(*) FROM caregiver_patients")).scalar() == 1
+
+
+def test_threshold_change_reaches_every_worker(cluster, admin_headers):
+    urls = cluster.urls
+    # Every worker caches the default rule (max 100) first
+    assert all(ingest(url, "grandpa_joe", 120)["abnormal"] for url in urls)
+    rule = {"vital_type": "heart_rate", "min_value": 50, "max_value": 130}
+    assert httpx.post(urls[0] + "/api/v1/admin/thresholds", json=rule, timeout=5.0).status_code == 401
+    httpx.post(urls[0] + "/api/v1/admin/thresholds", json=rule, timeout=5.0,
+               headers=admin_headers).raise_for_status()
+    for url in urls[1:]:
+        assert cluster.wait_for(lambda url=url: not ingest(url, "grandpa_joe", 120)["abnormal"], 10) is not None
+
+
+def test_anomaly_checkpoint_merges_every_worker(cluster):
+    urls = cluster.urls
+    httpx.post(urls[0] + "/api/v1/auth/signup", timeout=30.0, json={
+        "username": "round_robin", "password": "password123", "full_name": "Round Robin"}).raise_for_status()
+    readings = 30
+    for i in range(readings):
+        ingest(urls[i % len(urls)], "round_robin", 70 + i % 5)
+
+    def checkpointed():
+        with cluster.engine.connect() as conn:
+            return conn.execute(text(
+                "SELECT s.count FROM anomaly_state s JOIN users u ON u.id = s.user_id "
+                "WHERE u.username = 'round_robin' AND s.vital_type = 'heart_rate'")).scalar()
+
+    # Each worker saw a third of the readings; the checkpoint has all of them
+    assert cluster.wait_for(lambda: checkpointed() == readings, 15, interval=0.2) is not None
+
+    # Late uploads with old device times still reach the checkpoint
+    late = (datetime.utcnow() - timedelta(days=2)).isoformat()
+    for url in urls:
+        ingest(url, "round_robin", 72, timestamp=late)
+    readings += len(urls)
+    assert cluster.wait_for(lambda: checkpointed() == readings, 15, interval=0.2) is not None
+
+    # and every worker reloads the merged baseline
+    def samples(url):
+        response = httpx.get(url + "/api/v1/vitals/round_robin/baseline", timeout=5.0)
+        return response.json()["baseline"]["heart_rate"]["samples"]
+
+    for url in urls:
+        assert cluster.wait_for(lambda url=url: samples(url) == readings, 15, interval=0.2) is not None
+
+
+def test_leader_failover(cluster):
+    urls, workers = cluster.urls, cluster.workers
+    leader = next(i for i, state in enumerate(cluster.states()) if state and state["leader"])
+    workers[leader].send_signal(signal.SIGKILL)
+    workers[leader].wait(15)
+    alive = [url for i, url in enumerate(urls) if i != leader]
+    assert cluster.wait_for(lambda: cluster.leaders(alive) == 1, cluster.lease_seconds * 3, interval=0.05) is not None
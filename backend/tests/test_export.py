@@ -0,0 +1,98 @@
+"""
+The vitals export reads rows in chunks (`yield_per`) and encodes each chunk
+as it arrives. benchmarks/bench_export.py measures the memory this saves.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROWS = 25
+CHUNK_SIZE = 10
+START = datetime(2026, 1, 1, 8, 0)
+
+
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'export.db'}")
+    monkeypatch.syspath_prepend(BACKEND_DIR)
+    import export
+    return export
+
+
+@pytest.fixture
+def db(export, tmp_path):
+    from sqlalchemy.orm import Session
+    from database import Base, User, Vital, make_engine
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(username="grandpa_joe", password_hash="", role="elderly", full_name="Joe Smith")
+        session.add(user)
+        session.flush()
+        session.add_all(Vital(user_id=user.id, timestamp=START + timedelta(minutes=i), type="heart_rate",
+                              value=60.0 + i, unit="bpm", is_abnormal=i % 7 == 0)
+                        for i in range(ROWS))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def expected_rows() -> list:
+    return [[i + 1, "grandpa_joe", (START + timedelta(minutes=i)).isoformat() + 'Z', "heart_rate",
+             60.0 + i, "bpm", i % 7 == 0] for i in range(ROWS)]
+
+
+class Counted:
+    """The chunks, counting how many the encoder has pulled so far."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pulled = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.pulled += 1
+            yield chunk
+
+
+def stream(export, db, fmt: str) -> bytes:
+    """Encode the export, checking that output starts before every chunk is read."""
+    chunks = Counted(export.iter_vital_chunks(db, "grandpa_joe", chunk_size=CHUNK_SIZE))
+    output = export.encode(fmt, chunks)
+    first = next(output)
+    assert chunks.pulled == 1
+    return first + b"".join(output)
+
+
+def test_rows_are_read_in_chunks(export, db):
+    chunks = list(export.iter_vital_chunks(db, "grandpa_joe", chunk_size=CHUNK_SIZE))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+
+
+def test_csv(export, db):
+    reader = csv.reader(io.StringIO(stream(export, db, "csv").decode()))
+    assert next(reader) == export.COLUMNS
+    assert list(reader) == [[str(field) for field in row] for row in expected_rows()]
+
+
+def test_ndjson(export, db):
+    lines = stream(export, db, "ndjson").decode().splitlines()
+    assert [json.loads(line) for line in lines] == [dict(zip(export.COLUMNS, row)) for row in expected_rows()]
+
+
+def test_parquet(export, db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(stream(export, db, "parquet")))
+    assert table.num_rows == ROWS
+    assert table.column_names == export.COLUMNS
+    assert table.column("value").to_pylist() == [row[4] for row in expected_rows()]
+    assert table.column("is_abnormal").to_pylist() == [row[6] for row in expected_rows()]
+    assert table.column("timestamp")[0].as_py().replace(tzinfo=None) == START
@@ -0,0 +1,39 @@
+"""
+Golden test for the fallback intent classifier: every message in the
+corpus (intent_corpus.py) gets the same reply from
+HealthAgent._fallback_response as from the frozen pre-classifier
+implementation (legacy_fallback.py), with the same random seed.
+"""
+
+import itertools
+import os
+import random
+
+import pytest
+
+from intent_corpus import contexts, corpus
+from legacy_fallback import legacy_fallback_response
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'intents.db'}")
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.syspath_prepend(BACKEND_DIR)
+    from gemini_health_agent import HealthAgent
+    return HealthAgent()
+
+
+def test_fallback_replies_match_legacy(agent):
+    cases = list(itertools.product(corpus(), contexts(), ["Joe Smith", ""]))
+    mismatches = []
+    for seed, (message, snapshot, name) in enumerate(cases):
+        random.seed(seed)
+        expected = legacy_fallback_response(message, snapshot.render(), name)
+        random.seed(seed)
+        if agent._fallback_response(message, snapshot, name) != expected:
+            mismatches.append((message, snapshot.render()[:30], name))
+    assert len(cases) == 30630
+    assert mismatches == []
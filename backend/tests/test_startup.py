@@ -0,0 +1,23 @@
+"""
+`import main` must not load the optional heavy modules; each is imported on
+first use. benchmarks/bench_startup.py times the import and first response.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# Same list as benchmarks/bench_startup.py
+LAZY_MODULES = ("google.generativeai", "google.cloud.aiplatform", "litellm", "pyarrow", "numpy")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_main_loads_no_lazy_module(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}")
+    check = f"import json, sys, main; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", check], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1]) == []
@@ -0,0 +1,176 @@
+"""
+COMPONENT: Threshold Rule Engine
+
+Replaces the hardcoded if/elif alert chain with rules from the `thresholds`
+table. Rows with user_id = NULL override the built-in defaults for everyone;
+rows with a user_id override them for that user only.
+
+Rules are cached in-process as one merged {vital_type: Rule} table per user,
+so evaluating a reading is a dict lookup plus two comparisons. Every rule
+change bumps a version number: a change to a default rule invalidates every
+cached table, a change to a user rule drops only that user's table. Rule
+changes are announced with cluster.broadcast("thresholds", user_id=...) so
+every worker drops the same tables.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy.orm import Session
+from cluster import cluster
+from database import Threshold
+
+# label is used in alert messages, unit_suffix is appended to the value
+Rule = namedtuple("Rule", ["min_value", "max_value", "label", "unit_suffix"])
+
+# Built-in defaults (the values the ingest endpoint has always used)
+DEFAULT_RULES = {
+    "heart_rate": Rule(50, 100, "HR", " bpm"),
+    "blood_pressure_sys": Rule(90, 140, "BP (Sys)", " mmHg"),
+    "blood_pressure_dia": Rule(60, 90, "BP (Dia)", " mmHg"),
+    "spo2": Rule(95, None, "SpO2", "%"),
+    "glucose": Rule(None, 140, "Glucose", " mg/dL"),
+    "temperature": Rule(None, 99.5, "Temperature", "°F"),
+}
+
+NORMAL = (False, "")
+
+
+def alert_message(rule: Rule, value: float) -> str:
+    if rule.min_value is None:
+        prefix = "High"
+    elif rule.max_value is None:
+        prefix = "Low"
+    else:
+        prefix = "Abnormal"
+    return f"{prefix} {rule.label} detected ({value}{rule.unit_suffix})"
+
+
+def check_rule(rule: Rule, value: float):
+    """Return (is_abnormal, alert_message) for one reading."""
+    if rule is None:
+        return NORMAL
+    if (rule.min_value is not None and value < rule.min_value) or \
+       (rule.max_value is not None and value > rule.max_value):
+        return True, alert_message(rule, value)
+    return NORMAL
+
+
+def _rule_from_row(row: Threshold, base: Rule = None) -> Rule:
+    label = base.label if base else row.vital_type
+    unit_suffix = base.unit_suffix if base else ""
+    return Rule(row.min_value, row.max_value, label, unit_suffix)
+
+
+class ThresholdEngine:
+    def __init__(self, max_users: int = 10000):
+        self._lock = threading.Lock()
+        self._max_users = max_users
+        self._version = 0              # bumped on every rule change
+        self._defaults_version = 0     # bumped when a default rule changes
+        self._defaults = None          # (defaults_version, {vital_type: Rule})
+        self._users = OrderedDict()    # user_id -> (defaults_version, {vital_type: Rule})
+        self.hits = 0
+        self.misses = 0
+
+    # --- Cache management ---
+    def invalidate(self, user_id: int = None):
+        """Call after any rule change. user_id=None means a default rule changed."""
+        with self._lock:
+            self._version += 1
+            if user_id is None:
+                self._defaults_version += 1
+                self._defaults = None
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "version": self._version,
+            "cached_users": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _default_rules(self, db: Session) -> dict:
+        defaults_version = self._defaults_version
+        cached = self._defaults
+        if cached is not None and cached[0] == defaults_version:
+            return cached[1]
+        rules = dict(DEFAULT_RULES)
+        for row in db.query(Threshold).filter(Threshold.user_id.is_(None)).all():
+            rules[row.vital_type] = _rule_from_row(row, DEFAULT_RULES.get(row.vital_type))
+        with self._lock:
+            if defaults_version == self._defaults_version:
+                self._defaults = (defaults_version, rules)
+        return rules
+
+    def preload(self, db: Session, user_ids) -> dict:
+        """Return {user_id: rule table}, loading every uncached user with a
+        single query."""
+        version = self._version
+        defaults_version = self._defaults_version
+        tables = {}
+        missing = []
+        with self._lock:
+            for uid in set(user_ids):
+                table = self._cached(uid, defaults_version)
+                if table is None:
+                    missing.append(uid)
+                else:
+                    tables[uid] = table
+        self.hits += len(tables)
+        self.misses += len(missing)
+        if not missing:
+            return tables
+
+        defaults = self._default_rules(db)
+        loaded = {uid: dict(defaults) for uid in missing}
+        for row in db.query(Threshold).filter(Threshold.user_id.in_(missing)).all():
+            loaded[row.user_id][row.vital_type] = _rule_from_row(row, defaults.get(row.vital_type))
+        with self._lock:
+            for uid, table in loaded.items():
+                self._store(uid, version, defaults_version, table)
+        tables.update(loaded)
+        return tables
+
+    def rules_for(self, db: Session, user_id: int) -> dict:
+        return self.preload(db, [user_id])[user_id]
+
+    def _cached(self, user_id: int, defaults_version: int):
+        # Caller holds the lock. A hit becomes the most recently used entry.
+        entry = self._users.get(user_id)
+        if entry is None or entry[0] != defaults_version:
+            return None
+        self._users.move_to_end(user_id)
+        return entry[1]
+
+    def _store(self, user_id: int, version: int, defaults_version: int, table: dict):
+        # Caller holds the lock. A rule change since the load started means
+        # the table may be stale, so it is not cached.
+        if version != self._version:
+            return
+        self._users[user_id] = (defaults_version, table)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self._max_users:
+            self._users.popitem(last=False)
+
+    # --- Evaluation ---
+    def evaluate(self, db: Session, user_id: int, vital_type: str, value: float):
+        return check_rule(self.rules_for(db, user_id).get(vital_type), value)
+
+    def evaluate_batch(self, db: Session, user_ids, vital_types, values) -> list:
+        """Evaluate parallel lists of readings. Rule tables are resolved once
+        per distinct user, then every reading is a lookup and a compare."""
+        tables = self.preload(db, user_ids)
+        return [
+            check_rule(tables[uid].get(vital_type), value)
+            for uid, vital_type, value in zip(user_ids, vital_types, values)
+        ]
+
+
+# Singleton instance
+threshold_engine = ThresholdEngine()
+cluster.on("thresholds", threshold_engine.invalidate)
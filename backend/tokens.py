@@ -0,0 +1,74 @@
+"""
+COMPONENT: Session Tokens
+
+Login issues a signed token carrying the user id, username and role. The
+format is a standard HS256 JWT built with the standard library (hmac +
+hashlib), so no extra dependency is needed and any JWT tool can read it.
+
+The signing key is SESSION_SECRET. Without it a random key is generated at
+startup: tokens then stop working on restart and are not shared between
+workers, so production deployments must set it.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+
+logger = logging.getLogger(__name__)
+
+TOKEN_TTL_SECONDS = int(os.getenv("SESSION_TOKEN_TTL_SECONDS", str(12 * 3600)))
+
+_secret = os.getenv("SESSION_SECRET")
+if not _secret:
+    logger.warning("No SESSION_SECRET found. Using a random key; sessions end on restart.")
+    _secret = secrets.token_urlsafe(32)
+SECRET = _secret.encode()
+
+_HEADER = base64.urlsafe_b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}).encode()).rstrip(b"=")
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _sign(signing_input: bytes) -> bytes:
+    return _b64encode(hmac.new(SECRET, signing_input, hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, username: str, role: str, ttl_seconds: int = TOKEN_TTL_SECONDS) -> str:
+    now = int(time.time())
+    payload = {"sub": str(user_id), "name": username, "role": role, "iat": now, "exp": now + ttl_seconds}
+    signing_input = _HEADER + b"." + _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return (signing_input + b"." + _sign(signing_input)).decode()
+
+
+def decode_token(token: str) -> dict:
+    """Return the claims of a valid, unexpired token or raise InvalidToken."""
+    try:
+        header, payload, signature = token.encode().split(b".")
+    except ValueError:
+        raise InvalidToken("Malformed token")
+    if header != _HEADER or not hmac.compare_digest(signature, _sign(header + b"." + payload)):
+        raise InvalidToken("Bad signature")
+    try:
+        claims = json.loads(_b64decode(payload))
+        user_id = int(claims["sub"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidToken("Malformed token")
+    if claims.get("exp", 0) < time.time():
+        raise InvalidToken("Token expired")
+    claims["user_id"] = user_id
+    return claims
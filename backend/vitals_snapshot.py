@@ -0,0 +1,74 @@
+"""
+COMPONENT: Vitals Snapshot
+
+A compact, typed view of a user's current health data for the agent: the
+latest reading of each vital type plus abnormal flags, read from the
+latest_vitals rollup. It is rendered to prompt text only when Gemini is
+actually called; the fallback responder works on the fields directly.
+"""
+
+from collections import namedtuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import LatestVital
+from identity import identity_cache
+
+VitalReading = namedtuple("VitalReading", ["type", "value", "unit", "timestamp", "is_abnormal"])
+
+
+class VitalsSnapshot:
+    __slots__ = ("user_found", "full_name", "readings", "_by_type")
+
+    def __init__(self, user_found: bool, full_name: str, readings: tuple):
+        self.user_found = user_found
+        self.full_name = full_name
+        self.readings = readings  # newest first, one per vital type
+        self._by_type = {r.type: r for r in readings}
+
+    @property
+    def has_abnormal(self) -> bool:
+        return any(r.is_abnormal for r in self.readings)
+
+    def get(self, vital_type: str):
+        return self._by_type.get(vital_type)
+
+    def value_text(self, vital_type: str):
+        """'72.0 bpm' for the latest reading of a type, or None."""
+        reading = self._by_type.get(vital_type)
+        return f"{reading.value} {reading.unit}" if reading else None
+
+    def fingerprint(self) -> tuple:
+        """Hashable summary that changes whenever any latest reading changes."""
+        return self.readings
+
+    def render(self) -> str:
+        """The text report used in prompts."""
+        if not self.user_found:
+            return "User not found."
+        if not self.readings:
+            return "No recent vitals found."
+        report = []
+        for v in self.readings:
+            status = "⚠️ Abnormal" if v.is_abnormal else "✅ Normal"
+            report.append(f"- {v.timestamp.strftime('%Y-%m-%d %H:%M')}: {v.type} = {v.value} {v.unit} ({status})")
+        return "\n".join(report)
+
+
+def load_snapshot(db: Session, username: str) -> VitalsSnapshot:
+    """Latest reading per vital type for a user. The user comes from the
+    identity cache and the readings from the latest_vitals rollup, so a warm
+    call is one O(vital types) query."""
+    identity = identity_cache.by_username(db, username)
+    if identity is None:
+        return VitalsSnapshot(False, None, ())
+    rows = db.execute(
+        select(LatestVital.type, LatestVital.value, LatestVital.unit,
+               LatestVital.timestamp, LatestVital.is_abnormal)
+        .where(LatestVital.user_id == identity.user_id)
+        .order_by(LatestVital.timestamp.desc())
+    ).all()
+    readings = tuple(
+        VitalReading(row.type, row.value, row.unit, row.timestamp, bool(row.is_abnormal))
+        for row in rows
+    )
+    return VitalsSnapshot(True, identity.full_name, readings)
@@ -0,0 +1,25 @@
+-- Composite indexes for per-user history reads and the latest_vitals rollup.
+-- Safe to run more than once. The backend applies the same change on
+-- startup (database.migrate); this file is for databases managed by hand.
+
+CREATE INDEX IF NOT EXISTS ix_vitals_user_timestamp ON vitals (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS ix_vitals_user_type_timestamp ON vitals (user_id, type, timestamp);
+CREATE INDEX IF NOT EXISTS ix_alerts_user_created_at ON alerts (user_id, created_at);
+
+-- Newest reading per user and vital type, maintained by ingest
+CREATE TABLE IF NOT EXISTS latest_vitals (
+    user_id UUID REFERENCES users(id),
+    type VARCHAR(50) NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    value NUMERIC(10, 2),
+    unit VARCHAR(20),
+    is_abnormal BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (user_id, type)
+);
+
+INSERT INTO latest_vitals (user_id, type, timestamp, value, unit, is_abnormal)
+SELECT DISTINCT ON (user_id, type) user_id, type, timestamp, value, unit, is_abnormal
+FROM vitals
+WHERE user_id IS NOT NULL AND timestamp IS NOT NULL
+ORDER BY user_id, type, timestamp DESC
+ON CONFLICT (user_id, type) DO NOTHING;
@@ -0,0 +1,27 @@
+-- Pre-aggregated vitals per 1-minute, 1-hour and 1-day bucket, maintained
+-- by ingest (backend/rollups.py) and read by GET /api/v1/vitals/{username}/series.
+-- Safe to run more than once; the backfill only fills an empty table.
+
+CREATE TABLE IF NOT EXISTS vital_rollups (
+    user_id UUID REFERENCES users(id),
+    type VARCHAR(50) NOT NULL,
+    bucket VARCHAR(4) NOT NULL CHECK (bucket IN ('1m', '1h', '1d')),
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    count INTEGER NOT NULL,
+    sum DOUBLE PRECISION NOT NULL,
+    min DOUBLE PRECISION NOT NULL,
+    max DOUBLE PRECISION NOT NULL,
+    last_value DOUBLE PRECISION NOT NULL,
+    last_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (user_id, type, bucket, bucket_start)
+);
+
+INSERT INTO vital_rollups
+SELECT user_id, type, b.bucket, date_trunc(b.unit, timestamp) AS bucket_start,
+       count(*), sum(value), min(value), max(value),
+       (array_agg(value ORDER BY timestamp DESC))[1], max(timestamp)
+FROM vitals
+CROSS JOIN (VALUES ('1m', 'minute'), ('1h', 'hour'), ('1d', 'day')) AS b(bucket, unit)
+WHERE user_id IS NOT NULL AND timestamp IS NOT NULL AND value IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM vital_rollups)
+GROUP BY user_id, type, b.bucket, date_trunc(b.unit, timestamp);
@@ -0,0 +1,19 @@
+-- Caregiver-to-patient assignments for GET /api/v1/caregiver/{username}/overview,
+-- and an index for each patient's open alerts.
+-- Safe to run more than once. The backend applies the same change on
+-- startup (database.init_db); this file is for databases managed by hand.
+
+CREATE TABLE IF NOT EXISTS caregiver_patients (
+    caregiver_id UUID REFERENCES users(id),
+    patient_id UUID REFERENCES users(id),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (caregiver_id, patient_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_caregiver_patients_patient ON caregiver_patients (patient_id);
+CREATE INDEX IF NOT EXISTS ix_alerts_user_resolved_created_at ON alerts (user_id, resolved, created_at);
+
+INSERT INTO caregiver_patients (caregiver_id, patient_id)
+SELECT c.id, p.id FROM users c, users p
+WHERE c.username = 'nurse_sarah' AND p.username = 'grandpa_joe'
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,23 @@
+-- Alert episodes: repeated abnormal readings update one alert per user and
+-- vital type (backend/alerts.py), plus the alert_events queue table used
+-- with ALERT_QUEUE=database.
+-- Safe to run more than once. The backend applies the same change on
+-- startup (database.migrate); this file is for databases managed by hand.
+
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS vital_type VARCHAR(50);
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS occurrences INTEGER DEFAULT 1;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS resolved_at TIMESTAMP WITH TIME ZONE;
+
+-- Open episodes only, for the worker's resolution sweep
+CREATE INDEX IF NOT EXISTS ix_alerts_open ON alerts (user_id, vital_type)
+    WHERE NOT resolved AND vital_type IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS alert_events (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES users(id),
+    vital_type VARCHAR(50) NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    message TEXT
+);
@@ -0,0 +1,17 @@
+-- Checkpoints of the streaming anomaly detector's per-user baselines
+-- (backend/anomaly.py). Written by ingest every ANOMALY_CHECKPOINT_SECONDS;
+-- on startup only vitals newer than these rows are replayed.
+-- Safe to run more than once. The backend creates the same table on startup.
+
+CREATE TABLE IF NOT EXISTS anomaly_state (
+    user_id UUID REFERENCES users(id),
+    vital_type VARCHAR(50) NOT NULL,
+    count INTEGER NOT NULL,
+    mean DOUBLE PRECISION NOT NULL,
+    m2 DOUBLE PRECISION NOT NULL,
+    ewma DOUBLE PRECISION NOT NULL,
+    last_value DOUBLE PRECISION NOT NULL,
+    last_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, vital_type)
+);
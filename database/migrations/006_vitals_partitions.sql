@@ -0,0 +1,52 @@
+-- Range-partition vitals by month (PostgreSQL 11+), so the retention job
+-- (backend/retention.py) drops an expired month with DROP TABLE instead of
+-- deleting it row by row. The job also creates the partitions for the next
+-- two months on every pass; vitals_default catches readings outside every
+-- partition (very old uploads) and is trimmed by the job's batched delete.
+-- Safe to run more than once; does nothing once vitals is partitioned.
+-- Rewrites the table: run it in a maintenance window.
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'vitals'::regclass) THEN
+        RETURN;
+    END IF;
+    SET LOCAL timezone = 'UTC';  -- partition bounds are UTC months
+
+    ALTER TABLE vitals RENAME TO vitals_unpartitioned;
+    ALTER INDEX IF EXISTS ix_vitals_user_timestamp RENAME TO ix_vitals_unpartitioned_user_timestamp;
+    ALTER INDEX IF EXISTS ix_vitals_user_type_timestamp RENAME TO ix_vitals_unpartitioned_user_type_timestamp;
+
+    -- The partition key has to be part of the primary key
+    CREATE TABLE vitals (
+        id UUID NOT NULL DEFAULT uuid_generate_v4(),
+        user_id UUID REFERENCES users(id),
+        timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        type VARCHAR(50) NOT NULL,
+        value NUMERIC(10, 2) NOT NULL,
+        unit VARCHAR(20),
+        is_abnormal BOOLEAN DEFAULT FALSE,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+    CREATE INDEX ix_vitals_user_timestamp ON vitals (user_id, timestamp);
+    CREATE INDEX ix_vitals_user_type_timestamp ON vitals (user_id, type, timestamp);
+    CREATE TABLE vitals_default PARTITION OF vitals DEFAULT;
+
+    -- Named vitals_yYYYYmMM, from the oldest reading to two months ahead
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', coalesce((SELECT min(timestamp) FROM vitals_unpartitioned), now())),
+            date_trunc('month', now()) + interval '2 months',
+            interval '1 month')::date
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF vitals FOR VALUES FROM (%L) TO (%L)',
+                       to_char(month, '"vitals_y"YYYY"m"MM'), month, month + interval '1 month');
+    END LOOP;
+
+    INSERT INTO vitals (id, user_id, timestamp, type, value, unit, is_abnormal)
+    SELECT id, user_id, coalesce(timestamp, now()), type, value, unit, is_abnormal
+    FROM vitals_unpartitioned;
+    DROP TABLE vitals_unpartitioned;
+END $$;
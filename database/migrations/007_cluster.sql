@@ -0,0 +1,27 @@
+-- Shared state for running several workers or instances against one
+-- database (CLUSTER_BACKEND=database, backend/cluster.py): a cache with
+-- expiry, broadcasts between workers (cache invalidation, dashboard
+-- deltas) and named leases (leader election, startup).
+-- Safe to run more than once. The backend creates the same tables on startup.
+
+CREATE TABLE IF NOT EXISTS cluster_cache (
+    key VARCHAR PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cluster_cache_expires_at ON cluster_cache (expires_at);
+
+CREATE TABLE IF NOT EXISTS cluster_events (
+    id BIGSERIAL PRIMARY KEY,
+    origin VARCHAR NOT NULL,
+    channel VARCHAR NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_cluster_events_created_at ON cluster_events (created_at);
+
+CREATE TABLE IF NOT EXISTS cluster_leases (
+    name VARCHAR PRIMARY KEY,
+    holder VARCHAR NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
@@ -0,0 +1,13 @@
+-- When each vital reached the server, and how far the merged anomaly
+-- checkpoints have read (backend/anomaly.py). With several workers the
+-- leader folds new vitals into the checkpoints by ingested_at, so readings
+-- uploaded late with old device timestamps are still counted.
+-- Safe to run more than once. The backend adds the same columns on startup.
+-- The default is set separately so existing rows keep NULL and the table is
+-- not rewritten.
+
+ALTER TABLE vitals ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE vitals ALTER COLUMN ingested_at SET DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX IF NOT EXISTS ix_vitals_ingested_at ON vitals (ingested_at);
+
+ALTER TABLE anomaly_state ADD COLUMN IF NOT EXISTS ingested_through TIMESTAMP WITH TIME ZONE;
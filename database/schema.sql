@@ -10,15 +10,79 @@ CREATE TABLE users (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
--- Health Vitals Table
+-- Health Vitals Table, one partition per UTC month (vitals_yYYYYmMM).
+-- The backend retention job (backend/retention.py) creates upcoming months
+-- and drops the ones past the raw retention window.
 CREATE TABLE vitals (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     user_id UUID REFERENCES users(id),
-    timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
     type VARCHAR(50) NOT NULL, -- e.g., 'heart_rate', 'blood_pressure_sys', 'blood_pressure_dia', 'spo2', 'glucose'
     value NUMERIC(10, 2) NOT NULL,
     unit VARCHAR(20),
-    is_abnormal BOOLEAN DEFAULT FALSE
+    is_abnormal BOOLEAN DEFAULT FALSE,
+    ingested_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, -- server time; timestamp may be device time
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE INDEX ix_vitals_user_timestamp ON vitals (user_id, timestamp);
+CREATE INDEX ix_vitals_user_type_timestamp ON vitals (user_id, type, timestamp);
+CREATE INDEX ix_vitals_ingested_at ON vitals (ingested_at);
+CREATE TABLE vitals_default PARTITION OF vitals DEFAULT;
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    SET LOCAL timezone = 'UTC';
+    FOR month IN
+        SELECT generate_series(date_trunc('month', now()), date_trunc('month', now()) + interval '2 months',
+                               interval '1 month')::date
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF vitals FOR VALUES FROM (%L) TO (%L)',
+                       to_char(month, '"vitals_y"YYYY"m"MM'), month, month + interval '1 month');
+    END LOOP;
+END $$;
+
+-- Latest reading per user and vital type (rollup maintained by ingest)
+CREATE TABLE latest_vitals (
+    user_id UUID REFERENCES users(id),
+    type VARCHAR(50) NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    value NUMERIC(10, 2),
+    unit VARCHAR(20),
+    is_abnormal BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (user_id, type)
+);
+
+-- Per-bucket aggregates of vitals (1m, 1h, 1d), maintained by ingest
+CREATE TABLE vital_rollups (
+    user_id UUID REFERENCES users(id),
+    type VARCHAR(50) NOT NULL,
+    bucket VARCHAR(4) NOT NULL CHECK (bucket IN ('1m', '1h', '1d')),
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    count INTEGER NOT NULL,
+    sum DOUBLE PRECISION NOT NULL,
+    min DOUBLE PRECISION NOT NULL,
+    max DOUBLE PRECISION NOT NULL,
+    last_value DOUBLE PRECISION NOT NULL,
+    last_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (user_id, type, bucket, bucket_start)
+);
+
+-- Anomaly detector baselines, checkpointed by the backend (backend/anomaly.py)
+CREATE TABLE anomaly_state (
+    user_id UUID REFERENCES users(id),
+    vital_type VARCHAR(50) NOT NULL,
+    count INTEGER NOT NULL,
+    mean DOUBLE PRECISION NOT NULL,
+    m2 DOUBLE PRECISION NOT NULL,
+    ewma DOUBLE PRECISION NOT NULL,
+    last_value DOUBLE PRECISION NOT NULL,
+    last_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    ingested_through TIMESTAMP WITH TIME ZONE, -- merged checkpoints: every vital ingested up to here
+    PRIMARY KEY (user_id, vital_type)
 );
 
 -- Alerts Table
@@ -29,9 +93,36 @@ CREATE TABLE alerts (
     severity VARCHAR(20) CHECK (severity IN ('low', 'medium', 'high', 'critical')),
     message TEXT NOT NULL,
     resolved BOOLEAN DEFAULT FALSE,
-    resolved_at TIMESTAMP WITH TIME ZONE
+    resolved_at TIMESTAMP WITH TIME ZONE,
+    vital_type VARCHAR(50),
+    last_seen_at TIMESTAMP WITH TIME ZONE,
+    occurrences INTEGER DEFAULT 1
+);
+
+CREATE INDEX ix_alerts_user_created_at ON alerts (user_id, created_at);
+CREATE INDEX ix_alerts_user_resolved_created_at ON alerts (user_id, resolved, created_at);
+CREATE INDEX ix_alerts_open ON alerts (user_id, vital_type) WHERE NOT resolved AND vital_type IS NOT NULL;
+
+-- Abnormal readings waiting for the alert worker (ALERT_QUEUE=database)
+CREATE TABLE alert_events (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES users(id),
+    vital_type VARCHAR(50) NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    message TEXT
+);
+
+-- Patients assigned to each caregiver
+CREATE TABLE caregiver_patients (
+    caregiver_id UUID REFERENCES users(id),
+    patient_id UUID REFERENCES users(id),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (caregiver_id, patient_id)
 );
 
+CREATE INDEX ix_caregiver_patients_patient ON caregiver_patients (patient_id);
+
 -- Thresholds Configuration (Simple rules)
 CREATE TABLE thresholds (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -42,6 +133,29 @@ CREATE TABLE thresholds (
     UNIQUE(user_id, vital_type)
 );
 
+-- Shared state between workers (CLUSTER_BACKEND=database, backend/cluster.py)
+CREATE TABLE cluster_cache (
+    key VARCHAR PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+CREATE INDEX ix_cluster_cache_expires_at ON cluster_cache (expires_at);
+
+CREATE TABLE cluster_events (
+    id BIGSERIAL PRIMARY KEY,
+    origin VARCHAR NOT NULL,
+    channel VARCHAR NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX ix_cluster_events_created_at ON cluster_events (created_at);
+
+CREATE TABLE cluster_leases (
+    name VARCHAR PRIMARY KEY,
+    holder VARCHAR NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
 -- Seed Data
 INSERT INTO users (username, role, full_name) VALUES 
 ('grandpa_joe', 'elderly', 'Joe Smith'),
@@ -53,3 +167,8 @@ SELECT id, 'heart_rate', 50, 100 FROM users WHERE username = 'grandpa_joe';
 
 INSERT INTO thresholds (user_id, vital_type, min_value, max_value) 
 SELECT id, 'spo2', 90, 100 FROM users WHERE username = 'grandpa_joe';
+
+-- Nurse Sarah looks after Joe
+INSERT INTO caregiver_patients (caregiver_id, patient_id)
+SELECT c.id, p.id FROM users c, users p
+WHERE c.username = 'nurse_sarah' AND p.username = 'grandpa_joe';
@@ -35,6 +35,7 @@ async function handleLogin() {
             localStorage.setItem('username', data.username);
             localStorage.setItem('fullName', data.full_name);
             localStorage.setItem('role', data.role);
+            localStorage.setItem('token', data.access_token);
 
             showMessage('success', 'Login successful! Redirecting...');
 